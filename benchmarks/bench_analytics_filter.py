@@ -0,0 +1,117 @@
+"""Latency of GET /product-views/filter/ as product_analytics grows.
+
+    python -m benchmarks.bench_analytics_filter --sizes 100000,1000000,10000000
+
+Events are spread over 2023 across --products products. For each size the
+filtered query is timed against the rollups plus raw edges, next to the old
+strftime() filter, which has to scan every event.
+"""
+
+import argparse
+import asyncio
+import datetime
+import random
+import sqlite3
+import time
+
+from benchmarks.common import summarize, time_async, use_temporary_database
+
+DB_PATH = use_temporary_database("analytics")
+
+from catalog_api.database import database  # noqa: E402
+from catalog_api.utils.view_rollups import count_views_between  # noqa: E402
+
+YEAR_START = datetime.datetime(2023, 1, 1)
+SECONDS_IN_YEAR = 365 * 24 * 3600
+INSERT_BATCH = 50_000
+
+
+def grow_events(connection: sqlite3.Connection, count: int, products: int):
+    last_id = connection.execute(
+        "SELECT COALESCE(MAX(id), 0) FROM product_analytics"
+    ).fetchone()[0]
+    for offset in range(0, count, INSERT_BATCH):
+        rows = []
+        for _ in range(min(INSERT_BATCH, count - offset)):
+            moment = YEAR_START + datetime.timedelta(
+                seconds=random.randrange(SECONDS_IN_YEAR),
+                microseconds=random.randrange(1_000_000),
+            )
+            rows.append(
+                (random.randint(1, products), moment.strftime("%Y-%m-%d %H:%M:%S.%f"))
+            )
+        connection.executemany(
+            "INSERT INTO product_analytics (product_id, view_date) VALUES (?, ?)", rows
+        )
+
+    # Same rollups the app maintains on ingestion, built in bulk for speed
+    for table, bucket in (
+        ("product_views_hourly", "substr(view_date, 1, 13) || ':00:00.000000'"),
+        ("product_views_daily", "substr(view_date, 1, 10)"),
+    ):
+        connection.execute(
+            f"INSERT INTO {table} (product_id, bucket, count) "
+            f"SELECT product_id, {bucket}, COUNT(*) FROM product_analytics "
+            f"WHERE id > ? GROUP BY 1, 2 "
+            f"ON CONFLICT (product_id, bucket) DO UPDATE SET count = count + excluded.count",
+            (last_id,),
+        )
+    connection.commit()
+
+
+def legacy_filter(connection: sqlite3.Connection):
+    connection.execute(
+        "SELECT product_id, COUNT(*) AS count FROM product_analytics "
+        "WHERE strftime('%Y', view_date) = '2023' AND strftime('%m', view_date) = '03' "
+        "GROUP BY product_id"
+    ).fetchall()
+
+
+async def run(sizes: list[int], products: int, repeat: int):
+    connection = sqlite3.connect(DB_PATH)
+    await database.connect()
+    scenarios = {
+        "one product, 3 months": (
+            datetime.datetime(2023, 3, 3, 10, 17),
+            datetime.datetime(2023, 6, 9, 16, 42),
+            1,
+        ),
+        "all products, 1 month": (
+            datetime.datetime(2023, 3, 1, 7, 30),
+            datetime.datetime(2023, 4, 1, 7, 30),
+            None,
+        ),
+    }
+
+    print(f"{'events':>12}  {'scenario':<24} {'p50 ms':>8} {'p95 ms':>8}")
+    total = 0
+    for size in sizes:
+        grow_events(connection, size - total, products)
+        total = size
+        for name, args in scenarios.items():
+            stats = summarize(
+                await time_async(count_views_between, *args, repeat=repeat)
+            )
+            print(f"{size:>12}  {name:<24} {stats['p50']:>8.2f} {stats['p95']:>8.2f}")
+
+        started = time.perf_counter()
+        legacy_filter(connection)
+        legacy = (time.perf_counter() - started) * 1000
+        print(f"{size:>12}  {'strftime() full scan':<24} {legacy:>8.2f}")
+
+    await database.disconnect()
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    asyncio.run(run(sizes, args.products, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
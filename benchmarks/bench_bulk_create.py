@@ -0,0 +1,87 @@
+"""Per-item throughput of POST /products/bulk against one POST /products per item.
+
+python -m benchmarks.bench_bulk_create --products 2000 --batch 1000
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import use_temporary_database
+
+use_temporary_database("bulk_create")
+
+from httpx import ASGITransport, AsyncClient  # noqa: E402
+
+from catalog_api.config import config  # noqa: E402
+from catalog_api.database import database  # noqa: E402
+from catalog_api.main import app  # noqa: E402
+from catalog_api.security import create_access_token, create_default_admin  # noqa: E402
+
+
+def make_products(prefix: str, count: int) -> list[dict]:
+    return [
+        {
+            "name": f"Product {i}",
+            "sku": f"{prefix}-{i}",
+            "price": 9.99,
+            "brand": "Bench",
+        }
+        for i in range(count)
+    ]
+
+
+async def one_by_one(client: AsyncClient, products: list[dict], headers: dict):
+    for product in products:
+        response = await client.post("/products", json=product, headers=headers)
+        assert response.status_code == 201
+
+
+async def bulk(client: AsyncClient, products: list[dict], headers: dict, batch: int):
+    for start in range(0, len(products), batch):
+        response = await client.post(
+            "/products/bulk", json=products[start : start + batch], headers=headers
+        )
+        assert response.status_code == 200
+
+
+async def run(count: int, batch: int):
+    await database.connect()
+    await create_default_admin()
+    headers = {"Authorization": f"Bearer {create_access_token(config.DB_ADMIN_EMAIL)}"}
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await one_by_one(client, make_products("single", count), headers)
+        single = count / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await bulk(client, make_products("bulk", count), headers, batch)
+        created = count / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await bulk(client, make_products("bulk", count), headers, batch)
+        updated = count / (time.perf_counter() - started)
+
+    print(f"{'mode':<28} {'products/s':>12} {'speedup':>8}")
+    print(f"{'POST /products':<28} {single:>12.0f} {1:>8.1f}")
+    print(
+        f"{'POST /products/bulk create':<28} {created:>12.0f} {created / single:>8.1f}"
+    )
+    print(
+        f"{'POST /products/bulk update':<28} {updated:>12.0f} {updated / single:>8.1f}"
+    )
+    await database.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args.products, args.batch))
+
+
+if __name__ == "__main__":
+    main()
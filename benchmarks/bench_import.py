@@ -0,0 +1,92 @@
+"""Throughput and memory of a streamed CSV import.
+
+    python -m benchmarks.bench_import --rows 1000000
+
+Writes a synthetic CSV file with --rows products, streams it from disk to
+PUT /products/imports/{id} in 64KB chunks and reports rows per second and how
+much the process' peak RSS grew during the import.
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import tempfile
+import time
+
+from benchmarks.common import use_temporary_database
+
+use_temporary_database("import")
+
+from httpx import ASGITransport, AsyncClient  # noqa: E402
+
+from catalog_api.config import config  # noqa: E402
+from catalog_api.database import database  # noqa: E402
+from catalog_api.main import app  # noqa: E402
+from catalog_api.security import create_access_token, create_default_admin  # noqa: E402
+
+READ_SIZE = 64 * 1024
+
+
+def write_csv(rows: int) -> str:
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(fd, "w") as file:
+        file.write("name,sku,price,brand\n")
+        for i in range(rows):
+            file.write(f"Product {i},sku-{i},{i % 1000 + 0.99},Brand {i % 50}\n")
+    return path
+
+
+async def read_file(path: str):
+    with open(path, "rb") as file:
+        while chunk := file.read(READ_SIZE):
+            yield chunk
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def run(rows: int, chunk_size: int):
+    path = write_csv(rows)
+    size_mb = os.path.getsize(path) / 1024 / 1024
+    await database.connect()
+    await create_default_admin()
+    headers = {"Authorization": f"Bearer {create_access_token(config.DB_ADMIN_EMAIL)}"}
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        import_id = (await client.post("/products/imports", headers=headers)).json()[
+            "id"
+        ]
+        rss_before = peak_rss_mb()
+        started = time.perf_counter()
+        response = await client.put(
+            f"/products/imports/{import_id}",
+            params={"format": "csv", "chunk_size": chunk_size},
+            content=read_file(path),
+            headers=headers,
+        )
+        elapsed = time.perf_counter() - started
+
+    result = response.json()
+    print(f"file: {rows} rows, {size_mb:.1f} MB")
+    print(f"status: {result['status']}, created: {result['created']}")
+    print(f"throughput: {rows / elapsed:.0f} rows/s ({elapsed:.1f} s)")
+    print(f"peak RSS: {rss_before:.1f} MB before, {peak_rss_mb():.1f} MB after")
+    await database.disconnect()
+    os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.chunk_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""p99 latency of GET /products/{id} while POST /token is being hammered.
+
+    python -m benchmarks.bench_login_storm --logins 200 --concurrency 20
+
+Runs the app in-process through httpx's ASGITransport. Reads are measured
+once on their own and once during a login storm, both with bcrypt in the
+bounded executor and, for comparison, with bcrypt called inline on the event
+loop as it used to be.
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import summarize, use_temporary_database
+
+use_temporary_database("login_storm")
+
+from httpx import ASGITransport, AsyncClient  # noqa: E402
+
+from catalog_api import security  # noqa: E402
+from catalog_api.config import config  # noqa: E402
+from catalog_api.database import database, products_table  # noqa: E402
+from catalog_api.main import app  # noqa: E402
+from catalog_api.utils.view_buffer import view_buffer  # noqa: E402
+
+
+async def inline_verify_password(plain_password: str, hashed_password: str) -> bool:
+    return security.verify_password(plain_password, hashed_password)
+
+
+async def read_products(client: AsyncClient, product_id: int, stop: asyncio.Event):
+    samples = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get(f"/products/{product_id}")
+        samples.append(time.perf_counter() - started)
+        assert response.status_code == 200
+        await asyncio.sleep(0.005)
+    return samples
+
+
+async def login_storm(client: AsyncClient, logins: int, concurrency: int) -> int:
+    credentials = {"email": config.DB_ADMIN_EMAIL, "password": config.DB_ADMIN_PWD}
+    remaining = iter(range(logins))
+    rejected = 0
+
+    async def worker():
+        nonlocal rejected
+        for _ in remaining:
+            response = await client.post("/token", json=credentials)
+            rejected += response.status_code == 503
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return rejected
+
+
+async def measure(client, product_id, logins, concurrency, readers=4, quiet=1.0):
+    stop = asyncio.Event()
+    reads = [
+        asyncio.create_task(read_products(client, product_id, stop))
+        for _ in range(readers)
+    ]
+    rejected = 0
+    if logins:
+        rejected = await login_storm(client, logins, concurrency)
+    else:
+        await asyncio.sleep(quiet)
+    stop.set()
+    samples = [sample for task in reads for sample in await task]
+    return summarize(samples), rejected
+
+
+async def run(logins: int, concurrency: int):
+    await database.connect()
+    await security.create_default_admin()
+    await view_buffer.start()
+    product_id = await database.execute(
+        products_table.insert().values(
+            name="Bench", sku="bench-1", price=1.0, brand="Bench"
+        )
+    )
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        results = {"no logins": await measure(client, product_id, 0, concurrency)}
+        results["login storm, executor"] = await measure(
+            client, product_id, logins, concurrency
+        )
+        executor_verify = security.verify_password_async
+        security.verify_password_async = inline_verify_password
+        results["login storm, inline"] = await measure(
+            client, product_id, logins, concurrency
+        )
+        security.verify_password_async = executor_verify
+
+    await view_buffer.stop()
+
+    print(f"{'scenario':<24} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'503s':>6}")
+    for name, (stats, rejected) in results.items():
+        print(
+            f"{name:<24} {stats['p50']:>8.2f} {stats['p95']:>8.2f} "
+            f"{stats['p99']:>8.2f} {rejected:>6}"
+        )
+    await database.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.logins, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Database round trips and throughput of the product mutation routes.
+
+    python -m benchmarks.bench_mutation_round_trips --products 500
+
+Each route is called directly, once per product, next to the statement
+sequence it used before switching to RETURNING: a SKU probe before inserts,
+a read before every write and a second read after a PATCH. Both run the same
+version bump and audit insert, in one transaction per mutation.
+"""
+
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+from benchmarks.common import use_temporary_database
+
+use_temporary_database("round_trips")
+
+from catalog_api.database import database, products_table  # noqa: E402
+from catalog_api.models.products import (  # noqa: E402
+    ProductCreate,
+    ProductUpdatePatch,
+    ProductUpdatePut,
+)
+from catalog_api.models.users import User  # noqa: E402
+from catalog_api.routers import products  # noqa: E402
+from catalog_api.utils.audit import audited_transaction  # noqa: E402
+from catalog_api.utils.versions import bump_product_version  # noqa: E402
+
+USER = User(id=1, email="admin@bench.local", password="")
+QUERY_METHODS = ["execute", "fetch_one", "fetch_all", "fetch_val"]
+statements = Counter()
+
+
+def count_statements():
+    for name in QUERY_METHODS:
+        method = getattr(database, name)
+
+        async def counted(*args, method=method, **kwargs):
+            statements["total"] += 1
+            return await method(*args, **kwargs)
+
+        setattr(database, name, counted)
+
+
+def product(i: int, version: str = "") -> dict:
+    return {
+        "name": f"Product {i}{version}",
+        "sku": f"SKU-{i}",
+        "price": 1.0,
+        "brand": "B",
+    }
+
+
+def by_id(product_id: int):
+    return products_table.select().where(products_table.c.id == product_id)
+
+
+async def legacy_mutation(i: int, action: str, *queries):
+    async with audited_transaction() as audit:
+        for query in queries:
+            await database.execute(query)
+        await bump_product_version(i)
+        audit.add(i, action, USER.id)
+
+
+async def legacy_create(i: int):
+    probe = products_table.select().where(products_table.c.sku == f"SKU-{i}")
+    await database.fetch_one(probe)
+    await legacy_mutation(i, "ADDED", products_table.insert().values(product(i)))
+
+
+async def legacy_put(i: int):
+    update = products_table.update().where(products_table.c.id == i)
+    await legacy_mutation(i, "UPDATED", by_id(i), update.values(product(i, "b")))
+
+
+async def legacy_patch(i: int):
+    update = products_table.update().where(products_table.c.id == i)
+    await legacy_mutation(i, "UPDATED", by_id(i), update.values(price=2.0), by_id(i))
+
+
+async def legacy_delete(i: int):
+    delete = products_table.delete().where(products_table.c.id == i)
+    await legacy_mutation(i, "DELETED", by_id(i), delete)
+
+
+async def returning_create(i: int):
+    await products.create_product(ProductCreate(**product(i)), USER)
+
+
+async def returning_put(i: int):
+    await products.complete_update_product(ProductUpdatePut(**product(i, "b")), i, USER)
+
+
+async def returning_patch(i: int):
+    await products.partially_update_product(ProductUpdatePatch(price=2.0), i, USER)
+
+
+async def returning_delete(i: int):
+    await products.delete_product(i, USER)
+
+
+async def measure(flow, count: int):
+    statements.clear()
+    started = time.perf_counter()
+    for i in range(1, count + 1):
+        await flow(i)
+    elapsed = time.perf_counter() - started
+    return statements["total"] / count, count / elapsed
+
+
+async def run(count: int):
+    await database.connect()
+    count_statements()
+
+    print(f"{'mutation':<10} {'flow':<10} {'statements':>10} {'mutations/s':>12}")
+    for flows in ("legacy", "returning"):
+        for name in ("create", "put", "patch", "delete"):
+            flow = globals()[f"{flows}_{name}"]
+            per_mutation, rate = await measure(flow, count)
+            print(f"{name:<10} {flows:<10} {per_mutation:>10.1f} {rate:>12.0f}")
+    await database.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run(args.products))
+
+
+if __name__ == "__main__":
+    main()
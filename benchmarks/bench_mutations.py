@@ -0,0 +1,98 @@
+"""Product mutation throughput with and without transactional audit writes.
+
+    python -m benchmarks.bench_mutations --mutations 2000 --batch 100
+
+Every mutation updates a product price, bumps its version and writes an audit
+entry. "separate" is how the routes used to do it, one commit per statement;
+"transactional" puts the three statements of a mutation in one transaction;
+"outbox" groups --batch mutations per transaction with one audit insert.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.common import use_temporary_database
+
+use_temporary_database("mutations")
+
+from catalog_api.database import database, products_table  # noqa: E402
+from catalog_api.utils.audit import audited_transaction  # noqa: E402
+from catalog_api.utils.db_utils import add_audit_entry  # noqa: E402
+from catalog_api.utils.versions import bump_product_version  # noqa: E402
+
+
+def price_update(product_id: int):
+    return (
+        products_table.update()
+        .where(products_table.c.id == product_id)
+        .values(price=round(random.uniform(1, 100), 2))
+    )
+
+
+async def separate(product_ids: list[int], batch: int):
+    for product_id in product_ids:
+        await database.execute(price_update(product_id))
+        await bump_product_version(product_id)
+        await add_audit_entry(
+            {
+                "product_id": product_id,
+                "action": "UPDATED",
+                "previous_data": None,
+                "new_data": None,
+                "changed_by": 1,
+            }
+        )
+
+
+async def transactional(product_ids: list[int], batch: int):
+    for product_id in product_ids:
+        async with audited_transaction() as audit:
+            await database.execute(price_update(product_id))
+            await bump_product_version(product_id)
+            audit.add(product_id, "UPDATED", 1)
+
+
+async def outbox(product_ids: list[int], batch: int):
+    for start in range(0, len(product_ids), batch):
+        async with audited_transaction() as audit:
+            for product_id in product_ids[start : start + batch]:
+                await database.execute(price_update(product_id))
+                await bump_product_version(product_id)
+                audit.add(product_id, "UPDATED", 1)
+
+
+async def run(mutations: int, products: int, batch: int):
+    await database.connect()
+    await database.execute(
+        products_table.insert().values(
+            [
+                {"name": f"Product {i}", "sku": f"SKU-{i}", "price": 1.0, "brand": "B"}
+                for i in range(products)
+            ]
+        )
+    )
+    product_ids = [random.randint(1, products) for _ in range(mutations)]
+
+    print(f"{'mode':<14} {'seconds':>8} {'mutations/s':>12}")
+    for mode in (separate, transactional, outbox):
+        started = time.perf_counter()
+        await mode(product_ids, batch)
+        elapsed = time.perf_counter() - started
+        print(f"{mode.__name__:<14} {elapsed:>8.2f} {mutations / elapsed:>12.0f}")
+
+    await database.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mutations", type=int, default=2000)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args.mutations, args.products, args.batch))
+
+
+if __name__ == "__main__":
+    main()
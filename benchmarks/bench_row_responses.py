@@ -0,0 +1,82 @@
+"""Cost of returning 10k database rows, validated or dumped as trusted rows.
+
+    python -m benchmarks.bench_row_responses --rows 10000 --repeat 20
+
+The same endpoint, returning --rows product Records read once from the
+database, is mounted on a plain APIRouter and on one with TrustedRowsRoute,
+and called in-process (ASGITransport), so the timings are the serialization
+plus the request overhead, without the query. FastAPI validates each Record
+against Product before dumping it; TrustedRowsRoute reads the values by
+position and dumps them with orjson.
+"""
+
+import argparse
+import asyncio
+from typing import List
+
+from benchmarks.common import summarize, time_async, use_temporary_database
+
+use_temporary_database("row_responses")
+
+import httpx  # noqa: E402
+from fastapi import APIRouter, FastAPI  # noqa: E402
+
+from catalog_api.database import database, products_table  # noqa: E402
+from catalog_api.models.products import Product  # noqa: E402
+from catalog_api.utils.row_responses import TrustedRowsRoute  # noqa: E402
+
+
+def create_app(records: list) -> FastAPI:
+    app = FastAPI()
+    for prefix, router in (
+        ("/validated", APIRouter()),
+        ("/trusted", APIRouter(route_class=TrustedRowsRoute)),
+    ):
+
+        @router.get("/products", response_model=List[Product])
+        async def read_products():
+            return records
+
+        app.include_router(router, prefix=prefix)
+    return app
+
+
+async def run(rows: int, repeat: int):
+    await database.connect()
+    await database.execute(
+        products_table.insert().values(
+            [
+                {"name": f"Pillow {i}", "sku": f"S-{i}", "price": 9.99, "brand": "B"}
+                for i in range(rows)
+            ]
+        )
+    )
+    records = await database.fetch_all(products_table.select())
+    await database.disconnect()
+
+    transport = httpx.ASGITransport(app=create_app(records))
+    async with httpx.AsyncClient(transport=transport, base_url="http://b") as client:
+        bodies = {}
+        for mode in ("validated", "trusted"):
+            bodies[mode] = (await client.get(f"/{mode}/products")).json()
+        assert bodies["validated"] == bodies["trusted"]
+
+        print(f"{rows} rows")
+        print(f"{'mode':<10} {'p50 ms':>8} {'p95 ms':>8}")
+        for mode in ("validated", "trusted"):
+            stats = summarize(
+                await time_async(client.get, f"/{mode}/products", repeat=repeat)
+            )
+            print(f"{mode:<10} {stats['p50']:>8.2f} {stats['p95']:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Latency of GET /products/search on a large catalog.
+
+    python -m benchmarks.bench_search --products 1000000
+
+Product names are three words drawn from a vocabulary of --vocabulary
+synthetic words, so a one-word query matches roughly
+3 * products / vocabulary products.
+"""
+
+import argparse
+import asyncio
+import random
+import sqlite3
+import string
+
+from benchmarks.common import summarize, time_async, use_temporary_database
+
+DB_PATH = use_temporary_database("search")
+
+from catalog_api.database import database  # noqa: E402
+from catalog_api.utils.product_search import (  # noqa: E402
+    build_match_expression,
+    search_products,
+)
+
+INSERT_BATCH = 50_000
+
+
+def make_vocabulary(size: int) -> list[str]:
+    words = set()
+    while len(words) < size:
+        words.add(
+            "".join(random.choices(string.ascii_lowercase, k=random.randint(4, 9)))
+        )
+    return sorted(words)
+
+
+def populate(count: int, vocabulary: list[str]):
+    connection = sqlite3.connect(DB_PATH)
+    for start in range(0, count, INSERT_BATCH):
+        rows = [
+            (
+                " ".join(random.choices(vocabulary, k=3)),
+                f"sku-{i}",
+                random.randint(1, 1000) + 0.99,
+                f"brand{i % 200}",
+            )
+            for i in range(start, min(start + INSERT_BATCH, count))
+        ]
+        connection.executemany(
+            "INSERT INTO products (name, sku, price, brand) VALUES (?, ?, ?, ?)", rows
+        )
+    connection.commit()
+    connection.close()
+
+
+async def run(count: int, vocabulary_size: int, repeat: int):
+    vocabulary = make_vocabulary(vocabulary_size)
+    populate(count, vocabulary)
+    await database.connect()
+
+    name = await database.fetch_val("SELECT name FROM products WHERE id = 4242")
+    word, other, _ = name.split()
+    queries = {
+        "one word": word,
+        "word prefix (3 chars)": word[:3],
+        "two word prefixes": f"{word[:4]} {other[:4]}",
+        "sku": "sku-4242",
+    }
+    print(f"{count} products")
+    print(f"{'query':<24} {'matches':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, search in queries.items():
+        match = build_match_expression(search)
+        matches = len(await search_products(match, count))
+        stats = summarize(await time_async(search_products, match, 50, repeat=repeat))
+        print(f"{name:<24} {matches:>8} {stats['p50']:>8.2f} {stats['p95']:>8.2f}")
+    await database.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--vocabulary", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.products, args.vocabulary, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
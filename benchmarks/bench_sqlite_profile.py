@@ -0,0 +1,96 @@
+"""Mixed read/write throughput with and without the SQLite production profile.
+
+    python -m benchmarks.bench_sqlite_profile --profile production
+    python -m benchmarks.bench_sqlite_profile --profile default
+
+--tasks concurrent tasks each run --operations operations, one in
+--write-every being a transactional price update and the rest product reads.
+Failed operations (e.g. "database is locked") are counted, not retried.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+from benchmarks.common import summarize, use_temporary_database
+
+use_temporary_database("sqlite_profile")
+# The profile is read from the config at import time
+if "production" in " ".join(sys.argv[1:]):
+    os.environ["DEV_DB_PRODUCTION_PROFILE"] = "true"
+
+from catalog_api.database import database, products_table  # noqa: E402
+
+PRODUCTS = 1000
+
+
+async def worker(operations: int, write_every: int, samples: list, errors: Counter):
+    for i in range(operations):
+        product_id = random.randint(1, PRODUCTS)
+        started = time.perf_counter()
+        try:
+            if i % write_every == 0:
+                async with database.transaction():
+                    await database.execute(
+                        products_table.update()
+                        .where(products_table.c.id == product_id)
+                        .values(price=random.uniform(1, 100))
+                    )
+            else:
+                await database.fetch_one(
+                    products_table.select().where(products_table.c.id == product_id)
+                )
+        except Exception as e:
+            errors[str(e)] += 1
+            continue
+        samples.append(time.perf_counter() - started)
+
+
+async def run(tasks: int, operations: int, write_every: int):
+    await database.connect()
+    await database.execute(
+        products_table.insert().values(
+            [
+                {"name": f"Product {i}", "sku": f"SKU-{i}", "price": 1.0, "brand": "B"}
+                for i in range(PRODUCTS)
+            ]
+        )
+    )
+
+    samples, errors = [], Counter()
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(worker(operations, write_every, samples, errors) for _ in range(tasks))
+    )
+    elapsed = time.perf_counter() - started
+    await database.disconnect()
+
+    stats = summarize(samples)
+    print(f"profile: {type(database).__name__}")
+    print(f"operations/s: {len(samples) / elapsed:.0f}")
+    print(
+        f"p50 {stats['p50']:.2f} ms, p95 {stats['p95']:.2f} ms, "
+        f"p99 {stats['p99']:.2f} ms"
+    )
+    for error, count in errors.items():
+        print(f"failed {count}x: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--profile", choices=["default", "production"], default="default"
+    )
+    parser.add_argument("--tasks", type=int, default=50)
+    parser.add_argument("--operations", type=int, default=100)
+    parser.add_argument("--write-every", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.tasks, args.operations, args.write_every))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import os
+import statistics
+import tempfile
+import time
+
+
+def use_temporary_database(name: str) -> str:
+    """Point the app at a fresh SQLite file. Must run before anything from
+    catalog_api is imported, since the config is read at import time."""
+    path = os.path.join(tempfile.mkdtemp(prefix="catalog-bench-"), f"{name}.db")
+    os.environ["ENV_STATE"] = "dev"
+    os.environ["DEV_DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("DEV_SECRET_KEY", "benchmark-secret-benchmark-secret")
+    os.environ.setdefault("DEV_ALGORITHM", "HS256")
+    os.environ.setdefault("DEV_DB_ADMIN_EMAIL", "admin@bench.local")
+    os.environ.setdefault("DEV_DB_ADMIN_PWD", "admin")
+    return path
+
+
+def summarize(samples: list[float]) -> dict:
+    """Latency percentiles in milliseconds for samples taken in seconds."""
+    ordered = sorted(samples)
+
+    def percentile(p: float) -> float:
+        index = min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1)))
+        return ordered[index] * 1000
+
+    return {
+        "p50": percentile(50),
+        "p95": percentile(95),
+        "p99": percentile(99),
+        "mean": statistics.fmean(ordered) * 1000,
+    }
+
+
+async def time_async(func, *args, repeat: int = 1) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func(*args)
+        samples.append(time.perf_counter() - started)
+    return samples
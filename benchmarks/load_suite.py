@@ -0,0 +1,352 @@
+"""Load test of the API: throughput and latency per scenario, with a baseline.
+
+    python -m benchmarks.load_suite --transport asgi --duration 10
+    python -m benchmarks.load_suite --transport uvicorn --workers 2
+    python -m benchmarks.load_suite --save-baseline
+
+The app runs in-process behind httpx's ASGITransport, or in a real uvicorn
+process. The database is seeded with --products products, --users users and
+--views anonymous views. Each scenario then runs --concurrency clients in a
+closed loop for --duration seconds:
+
+    read       product pages, filtered listings and search
+    write      creates, partial and full updates and deletes, as an admin
+    login      POST /token as random users (bcrypt bound)
+    analytics  total views, per product views and date-range filters
+
+Results are compared with the --baseline file (per transport and scenario).
+The run exits with status 1 if requests per second dropped, or p95 latency or
+the error rate grew, by more than --tolerance.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from benchmarks.common import summarize, use_temporary_database
+
+use_temporary_database("load_suite")
+
+import httpx  # noqa: E402
+
+from catalog_api.config import config  # noqa: E402
+from catalog_api.database import database, products_table, users_table  # noqa: E402
+from catalog_api.security import get_password_hash  # noqa: E402
+from catalog_api.utils.db_utils import add_product_anonymous_views  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+BRANDS = ["Luuna", "Mappa", "Nooz", "Acme", "Zenit"]
+WORDS = ["pillow", "mattress", "sheet", "frame", "topper", "blanket", "duvet"]
+USER_PASSWORD = "bench-password"
+SEED_BATCH = 5000
+
+
+class Dataset:
+    def __init__(self, products: int, users: int):
+        self.products = products
+        self.users = users
+        self.admin_token = None
+        self.created = []
+        self.next_sku = 0
+
+
+async def seed(products: int, users: int, views: int):
+    await database.connect()
+    for start in range(0, products, SEED_BATCH):
+        await database.execute(
+            products_table.insert().values(
+                [
+                    {
+                        "name": f"{random.choice(WORDS).title()} {i}",
+                        "sku": f"SEED-{i}",
+                        "price": round(random.uniform(5, 500), 2),
+                        "brand": random.choice(BRANDS),
+                    }
+                    for i in range(start, min(products, start + SEED_BATCH))
+                ]
+            )
+        )
+
+    password = get_password_hash(USER_PASSWORD)
+    for start in range(0, users, SEED_BATCH):
+        await database.execute(
+            users_table.insert().values(
+                [
+                    {"email": f"user{i}@bench.local", "password": password}
+                    for i in range(start, min(users, start + SEED_BATCH))
+                ]
+            )
+        )
+
+    now = datetime.datetime.utcnow()
+    for start in range(0, views, SEED_BATCH):
+        await add_product_anonymous_views(
+            [
+                {
+                    "product_id": random.randint(1, products),
+                    "view_date": now
+                    - datetime.timedelta(seconds=random.randrange(30 * 24 * 3600)),
+                }
+                for _ in range(min(SEED_BATCH, views - start))
+            ]
+        )
+    await database.disconnect()
+
+
+async def read(client: httpx.AsyncClient, data: Dataset) -> httpx.Response:
+    roll = random.random()
+    if roll < 0.7:
+        return await client.get(f"/products/{random.randint(1, data.products)}")
+    if roll < 0.9:
+        params = {"limit": 50, "brand": random.choice(BRANDS)}
+        return await client.get("/products", params=params)
+    return await client.get("/products/search", params={"q": random.choice(WORDS)})
+
+
+async def write(client: httpx.AsyncClient, data: Dataset) -> httpx.Response:
+    headers = {"Authorization": f"Bearer {data.admin_token}"}
+    roll = random.random()
+    if roll < 0.4 or not data.created:
+        data.next_sku += 1
+        product = {
+            "name": f"{random.choice(WORDS).title()} new",
+            "sku": f"BENCH-{os.getpid()}-{data.next_sku}",
+            "price": round(random.uniform(5, 500), 2),
+            "brand": random.choice(BRANDS),
+        }
+        response = await client.post("/products", json=product, headers=headers)
+        if response.status_code == 201:
+            data.created.append(response.json())
+        return response
+    if roll < 0.8:
+        product_id = random.randint(1, data.products)
+        changes = {"price": round(random.uniform(5, 500), 2)}
+        return await client.patch(
+            f"/products/{product_id}", json=changes, headers=headers
+        )
+    if roll < 0.9:
+        product = random.choice(data.created)
+        product = {**product, "name": f"{product['name']} v2"}
+        return await client.put(
+            f"/products/{product.pop('id')}", json=product, headers=headers
+        )
+    product = data.created.pop(random.randrange(len(data.created)))
+    return await client.delete(f"/products/{product['id']}", headers=headers)
+
+
+async def login(client: httpx.AsyncClient, data: Dataset) -> httpx.Response:
+    credentials = {
+        "email": f"user{random.randrange(data.users)}@bench.local",
+        "password": USER_PASSWORD,
+    }
+    return await client.post("/token", json=credentials)
+
+
+async def analytics(client: httpx.AsyncClient, data: Dataset) -> httpx.Response:
+    roll = random.random()
+    if roll < 0.2:
+        return await client.get("/product-views/")
+    if roll < 0.5:
+        return await client.get(f"/product-views/{random.randint(1, data.products)}")
+    end = datetime.datetime.utcnow() - datetime.timedelta(
+        minutes=random.randrange(30 * 24 * 60)
+    )
+    start = end - datetime.timedelta(minutes=random.randrange(1, 14 * 24 * 60))
+    params = {"start": start.isoformat(), "end": end.isoformat()}
+    if roll < 0.8:
+        params["product_id"] = random.randint(1, data.products)
+    return await client.get("/product-views/filter/", params=params)
+
+
+SCENARIOS = {"read": read, "write": write, "login": login, "analytics": analytics}
+
+
+async def run_scenario(client, data: Dataset, operation, concurrency, duration):
+    samples = []
+    statuses = Counter()
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await operation(client, data)
+            except httpx.TransportError as e:
+                statuses[type(e).__name__] += 1
+                continue
+            samples.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    total = sum(statuses.values())
+    errors = sum(
+        count
+        for status, count in statuses.items()
+        if not isinstance(status, int) or status >= 400
+    )
+    return {
+        **summarize(samples),
+        "requests": total,
+        "rps": total / elapsed,
+        "error_rate": errors / total,
+        "statuses": {str(status): count for status, count in statuses.items()},
+    }
+
+
+async def run_scenarios(client, data: Dataset, args) -> dict:
+    response = await client.post(
+        "/token",
+        json={"email": config.DB_ADMIN_EMAIL, "password": config.DB_ADMIN_PWD},
+    )
+    data.admin_token = response.json()["access_token"]
+
+    results = {}
+    for name in args.scenarios:
+        results[name] = await run_scenario(
+            client, data, SCENARIOS[name], args.concurrency, args.duration
+        )
+    return results
+
+
+async def run_asgi(data: Dataset, args) -> dict:
+    from catalog_api.main import app
+
+    # Failing requests come back as 500s, like they would from uvicorn
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            return await run_scenarios(client, data, args)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_uvicorn(data: Dataset, args) -> dict:
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "catalog_api.main:app"]
+        + ["--port", str(port), "--workers", str(args.workers)]
+        + ["--log-level", "warning"],
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    limits = httpx.Limits(max_connections=args.concurrency)
+    try:
+        # Slow responses are measured, not counted as errors
+        async with httpx.AsyncClient(
+            base_url=base_url, limits=limits, timeout=60
+        ) as client:
+            for _ in range(300):
+                if server.poll() is not None:
+                    raise RuntimeError("uvicorn exited before it was ready")
+                try:
+                    await client.get("/docs")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("uvicorn didn't start in 30 seconds")
+            return await run_scenarios(client, data, args)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if not expected:
+            continue
+        if result["rps"] < expected["rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {result['rps']:.0f} req/s, baseline {expected['rps']:.0f}"
+            )
+        if result["p95"] > expected["p95"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {result['p95']:.1f} ms, baseline {expected['p95']:.1f}"
+            )
+        if result["error_rate"] > expected["error_rate"] + tolerance / 10:
+            regressions.append(
+                f"{name}: {result['error_rate']:.1%} errors, "
+                f"baseline {expected['error_rate']:.1%}"
+            )
+    return regressions
+
+
+def print_results(results: dict):
+    print(
+        f"{'scenario':<10} {'requests':>9} {'req/s':>8} {'p50 ms':>8} "
+        f"{'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:<10} {result['requests']:>9} {result['rps']:>8.0f} "
+            f"{result['p50']:>8.2f} {result['p95']:>8.2f} {result['p99']:>8.2f} "
+            f"{result['error_rate']:>7.1%}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transport", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--views", type=int, default=100000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+    args.scenarios = args.scenarios.split(",")
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    asyncio.run(seed(args.products, args.users, args.views))
+    data = Dataset(args.products, args.users)
+    runner = run_asgi if args.transport == "asgi" else run_uvicorn
+    results = asyncio.run(runner(data, args))
+    print_results(results)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    if args.save_baseline:
+        baseline[args.transport] = {**baseline.get(args.transport, {}), **results}
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline saved to {args.baseline}")
+        return
+
+    regressions = compare(results, baseline.get(args.transport, {}), args.tolerance)
+    if regressions:
+        print("\nREGRESSIONS against the baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("\nno regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
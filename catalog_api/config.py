@@ -1,5 +1,5 @@
 from functools import lru_cache
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -15,10 +15,55 @@ class BaseConfig(BaseSettings, extra="allow"):
 class GlobalConfig(BaseConfig):
     DATABASE_URL: Optional[str] = None
     DB_FORCE_ROLL_BACK: bool = False
+    # SQLite only: WAL, tuned pragmas, pooled readers and a single writer
+    DB_PRODUCTION_PROFILE: bool = False
+    DB_READ_POOL_SIZE: int = 4
+    DB_CACHE_SIZE_KB: int = 65536
+    DB_MMAP_SIZE: int = 268435456
+    DB_BUSY_TIMEOUT_MS: int = 5000
+    # Postgres only: asyncpg pool bounds and server-side statement timeout
+    DB_POOL_MIN_SIZE: int = 1
+    DB_POOL_MAX_SIZE: int = 10
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
     DB_ADMIN_EMAIL: Optional[str] = None
     DB_ADMIN_PWD: Optional[str] = None
     SECRET_KEY: Optional[str] = None
     ALGORITHM: Optional[str] = None
+    VIEW_BUFFER_MAX_SIZE: int = 10000
+    VIEW_BUFFER_BATCH_SIZE: int = 500
+    VIEW_BUFFER_FLUSH_INTERVAL: float = 1.0
+    VIEW_BUFFER_FULL_POLICY: Literal["drop", "block"] = "drop"
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL: float = 60.0
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_DEPTH: int = 32
+    PRODUCT_CACHE_SIZE: int = 10000
+    PRODUCT_CACHE_WARM_UP: int = 0
+    CATALOG_SNAPSHOT_POLL_INTERVAL: float = 1.0
+    # Audit entries younger than this aren't served by /products/changes nor
+    # reported by the daily changes report yet
+    PRODUCT_CHANGES_SETTLE_SECONDS: float = 1.0
+    SCHEDULER_LEASE_TTL: float = 30.0
+    SCHEDULER_LEASE_RENEW_INTERVAL: float = 10.0
+    SMTP_HOST: str = "mailhog"
+    SMTP_PORT: int = 1025
+    SMTP_USERNAME: Optional[str] = None
+    SMTP_PASSWORD: Optional[str] = None
+    SMTP_STARTTLS: bool = False
+    SMTP_TIMEOUT: float = 10.0
+    SMTP_KEEPALIVE_INTERVAL: float = 30.0
+    MAIL_SENDER: str = "sender@example.com"
+    MAIL_BATCH_SIZE: int = 50
+    MAIL_POLL_INTERVAL: float = 5.0
+    MAIL_RETRY_BASE_DELAY: float = 1.0
+    MAIL_RETRY_MAX_DELAY: float = 600.0
+    MAIL_MAX_ATTEMPTS: int = 8
+    # Request and query timings, served on /metrics
+    METRICS_ENABLED: bool = True
+    # Statements slower than the threshold are kept with their query plan
+    SLOW_QUERY_LOG_ENABLED: bool = False
+    SLOW_QUERY_THRESHOLD_MS: float = 100.0
+    SLOW_QUERY_LOG_SIZE: int = 100
 
 
 class DevConfig(GlobalConfig):
@@ -1,21 +1,32 @@
 import datetime
 
-import databases
 from sqlalchemy import (
     Boolean,
     Column,
+    Date,
     DateTime,
     Enum,
     Float,
-    ForeignKey,
+    Index,
     Integer,
     MetaData,
     String,
     Table,
     create_engine,
+    inspect,
+    make_url,
+    text,
 )
+from sqlalchemy.dialects import postgresql, sqlite
 
 from catalog_api.config import config
+from catalog_api.utils.metrics import instrument_database
+from catalog_api.utils.slow_queries import SlowQueryLog, record_slow_queries
+from catalog_api.utils.sqlite_pool import (
+    ImmediateTransactionDatabase,
+    RoutedDatabase,
+    production_pragmas,
+)
 
 metadata = MetaData()
 
@@ -28,6 +39,10 @@ products_table = Table(
     Column("sku", String, unique=True, nullable=False),
     Column("price", Float, nullable=False),
     Column("brand", String, nullable=False),
+    Index("ix_products_brand_id", "brand", "id"),
+    # Price ranges are paged by (price, id)
+    Index("ix_products_price_id", "price", "id"),
+    Index("ix_products_brand_price_id", "brand", "price", "id"),
 )
 
 
@@ -41,12 +56,68 @@ users_table = Table(
 )
 
 
+# Views, audit entries and imports outlive the products and users they refer to,
+# so these tables keep plain ids rather than foreign keys, which SQLite never
+# enforced but Postgres would, failing every delete of a referenced row.
 product_analytics_table = Table(
     "product_analytics",
     metadata,
     Column("id", Integer, primary_key=True),
-    Column("product_id", Integer, ForeignKey("products.id"), nullable=False),
+    Column("product_id", Integer, nullable=False),
     Column("view_date", DateTime, default=datetime.datetime.utcnow, nullable=False),
+    Index("ix_product_analytics_product_id_view_date", "product_id", "view_date"),
+    Index("ix_product_analytics_view_date", "view_date"),
+)
+
+# Per-product view counts, kept in step with product_analytics when views are
+# written so the analytics endpoints don't have to count raw events.
+product_views_hourly_table = Table(
+    "product_views_hourly",
+    metadata,
+    Column("product_id", Integer, primary_key=True),
+    Column("bucket", DateTime, primary_key=True),
+    Column("count", Integer, nullable=False),
+    Index("ix_product_views_hourly_bucket", "bucket"),
+)
+
+product_views_daily_table = Table(
+    "product_views_daily",
+    metadata,
+    Column("product_id", Integer, primary_key=True),
+    Column("bucket", Date, primary_key=True),
+    Column("count", Integer, nullable=False),
+    Index("ix_product_views_daily_bucket", "bucket"),
+)
+
+# Bumped by every product write and used to build ETags, so conditional GETs
+# can be answered without reading product rows.
+catalog_state_table = Table(
+    "catalog_state",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False),
+)
+
+product_versions_table = Table(
+    "product_versions",
+    metadata,
+    Column("product_id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False),
+)
+
+product_imports_table = Table(
+    "product_imports",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("status", String, nullable=False),
+    Column("rows_committed", Integer, nullable=False),
+    Column("created", Integer, nullable=False),
+    Column("updated", Integer, nullable=False),
+    Column("conflicts", Integer, nullable=False),
+    Column("invalid", Integer, nullable=False),
+    Column("last_error", String, nullable=True),
+    Column("started_by", Integer, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
 )
 
 action_enum = Enum("ADDED", "UPDATED", "DELETED", name="action_enum")
@@ -55,17 +126,170 @@ audit_log_table = Table(
     "audit_log",
     metadata,
     Column("id", Integer, primary_key=True),
-    Column("product_id", Integer, ForeignKey("products.id"), nullable=False),
+    Column("product_id", Integer, nullable=False),
     Column("action", action_enum, nullable=False),
     Column("previous_data", String, nullable=True),
     Column("new_data", String, nullable=True),
-    Column("changed_by", Integer, ForeignKey("users.id"), nullable=False),
+    Column("changed_by", Integer, nullable=False),
     Column("timestamp", DateTime, default=datetime.datetime.utcnow, nullable=False),
+    Index("ix_audit_log_timestamp", "timestamp"),
+)
+
+# Mail waiting to be delivered by catalog_api.utils.send_mails.mail_sender.
+# Rows stay after delivery (status "sent") or after giving up ("failed").
+outbound_emails_table = Table(
+    "outbound_emails",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("sender", String, nullable=False),
+    Column("recipients", String, nullable=False),
+    Column("subject", String, nullable=False),
+    Column("body", String, nullable=False),
+    Column("status", String, nullable=False),
+    Column("attempts", Integer, nullable=False),
+    Column("next_attempt_at", DateTime, nullable=False),
+    Column("last_error", String, nullable=True),
+    Column("created_at", DateTime, nullable=False),
+    Column("sent_at", DateTime, nullable=True),
+    Index("ix_outbound_emails_status_next_attempt_at", "status", "next_attempt_at"),
+)
+
+# One row per lease; the worker named in holder runs the lease's jobs until
+# expires_at, and keeps pushing expires_at forward while it is alive.
+leases_table = Table(
+    "leases",
+    metadata,
+    Column("name", String, primary_key=True),
+    Column("holder", String, nullable=False),
+    Column("expires_at", DateTime, nullable=False),
+)
+
+# Last audit_log id covered by each report, so every run only reads new entries
+report_watermarks_table = Table(
+    "report_watermarks",
+    metadata,
+    Column("name", String, primary_key=True),
+    Column("last_audit_id", Integer, nullable=False),
+)
+
+# FTS5 index over products for /products/search. Triggers keep it in step with
+# every write to products, whichever code path makes it.
+PRODUCTS_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE products_fts USING fts5(
+        name, brand, sku, content='products', content_rowid='id', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts (rowid, name, brand, sku)
+        VALUES (new.id, new.name, new.brand, new.sku);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, name, brand, sku)
+        VALUES ('delete', old.id, old.name, old.brand, old.sku);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, name, brand, sku)
+        VALUES ('delete', old.id, old.name, old.brand, old.sku);
+        INSERT INTO products_fts (rowid, name, brand, sku)
+        VALUES (new.id, new.name, new.brand, new.sku);
+    END
+    """,
+]
+
+
+# Postgres has no FTS5; search there uses this tsvector with the same column
+# weights, indexed with GIN.
+PRODUCTS_SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', name), 'A') || "
+    "setweight(to_tsvector('simple', brand), 'B') || "
+    "setweight(to_tsvector('simple', sku), 'C')"
 )
 
-engine = create_engine(config.DATABASE_URL, connect_args={"check_same_thread": False})
+
+def create_products_search_index(engine):
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as connection:
+            connection.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_products_search ON products "
+                    f"USING GIN (({PRODUCTS_SEARCH_VECTOR}))"
+                )
+            )
+        return
+    if inspect(engine).has_table("products_fts"):
+        return
+    with engine.begin() as connection:
+        for statement in PRODUCTS_FTS_DDL:
+            connection.execute(text(statement))
+        # Index the products that existed before the search table
+        connection.execute(
+            text("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+        )
+
+
+def dialect_insert(table):
+    """INSERT with on_conflict_do_nothing/on_conflict_do_update for the
+    configured database."""
+    if engine.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+def database_options() -> dict:
+    if engine.dialect.name == "postgresql":
+        return {
+            "min_size": config.DB_POOL_MIN_SIZE,
+            "max_size": config.DB_POOL_MAX_SIZE,
+            "server_settings": {
+                "statement_timeout": str(config.DB_STATEMENT_TIMEOUT_MS)
+            },
+        }
+    return {}
+
+
+engine = create_engine(
+    config.DATABASE_URL,
+    connect_args=(
+        {"check_same_thread": False}
+        if make_url(config.DATABASE_URL).get_backend_name() == "sqlite"
+        else {}
+    ),
+)
 
 metadata.create_all(engine)
-database = databases.Database(
-    config.DATABASE_URL, force_rollback=config.DB_FORCE_ROLL_BACK
+# create_all skips tables that already exist, so indexes added after a table was
+# first created have to be created on their own.
+for table in metadata.sorted_tables:
+    for index in table.indexes:
+        index.create(engine, checkfirst=True)
+create_products_search_index(engine)
+
+if config.DB_PRODUCTION_PROFILE and engine.dialect.name == "sqlite":
+    database = RoutedDatabase(
+        config.DATABASE_URL,
+        read_pool_size=config.DB_READ_POOL_SIZE,
+        pragmas=production_pragmas(
+            config.DB_CACHE_SIZE_KB, config.DB_MMAP_SIZE, config.DB_BUSY_TIMEOUT_MS
+        ),
+    )
+else:
+    # The stock backends, except for SQLite (see ImmediateSQLiteTransaction)
+    database = ImmediateTransactionDatabase(
+        config.DATABASE_URL,
+        force_rollback=config.DB_FORCE_ROLL_BACK,
+        **database_options(),
+    )
+
+slow_query_log = SlowQueryLog(
+    config.SLOW_QUERY_THRESHOLD_MS, config.SLOW_QUERY_LOG_SIZE
 )
+if config.METRICS_ENABLED:
+    instrument_database(database)
+if config.SLOW_QUERY_LOG_ENABLED:
+    record_slow_queries(database, slow_query_log, engine.dialect.name)
@@ -1,21 +1,65 @@
+import datetime
 from contextlib import asynccontextmanager
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from fastapi import FastAPI
 
+from catalog_api.config import config
 from catalog_api.database import database
 from catalog_api.reports.product_changes import send_daily_report
+from catalog_api.routers.admin import router as admin_router
 from catalog_api.routers.analytics import router as product_analytics_router
+from catalog_api.routers.metrics import router as metrics_router
 from catalog_api.routers.products import router as products_router
 from catalog_api.routers.users import router as users_router
-from catalog_api.security import create_default_admin
+from catalog_api.security import (
+    create_default_admin,
+    password_executor,
+    principal_cache,
+)
+from catalog_api.utils.catalog_snapshot import catalog_snapshot
+from catalog_api.utils.leader_lease import scheduler_lease
+from catalog_api.utils.metrics import MetricsMiddleware, registry
+from catalog_api.utils.product_cache import product_cache, warm_up_product_cache
+from catalog_api.utils.send_mails import mail_sender
+from catalog_api.utils.view_buffer import view_buffer
+from catalog_api.utils.view_rollups import backfill_view_rollups
+
+
+def create_scheduler() -> AsyncIOScheduler:
+    # Every worker runs the scheduler, but only the one holding the lease runs
+    # the jobs; the others keep trying to take it over in case the leader dies.
+    scheduler = AsyncIOScheduler()
+    scheduler.add_job(
+        scheduler_lease.renew,
+        "interval",
+        seconds=config.SCHEDULER_LEASE_RENEW_INTERVAL,
+        next_run_time=datetime.datetime.now(),
+    )
+    scheduler.add_job(
+        scheduler_lease.leader_only(send_daily_report), "interval", minutes=1
+    )
+    # For a real daily report: "interval", days=1
+    return scheduler
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await database.connect()
     await create_default_admin()
+    await backfill_view_rollups()
+    await warm_up_product_cache(config.PRODUCT_CACHE_WARM_UP)
+    await view_buffer.start()
+    await mail_sender.start()
+    await catalog_snapshot.start()
+    scheduler = create_scheduler()
+    scheduler.start()
     yield
+    scheduler.shutdown(wait=False)
+    await scheduler_lease.release()
+    await catalog_snapshot.stop()
+    await mail_sender.stop()
+    await view_buffer.stop()
     await database.disconnect()
 
 
@@ -23,8 +67,15 @@ app = FastAPI(lifespan=lifespan)
 app.include_router(products_router)
 app.include_router(product_analytics_router)
 app.include_router(users_router)
+app.include_router(admin_router)
 
-scheduler = AsyncIOScheduler()
-scheduler.add_job(send_daily_report, "interval", minutes=1)
-# scheduler.add_job(send_daily_report, "interval", days=1)
-scheduler.start()
+if config.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router)
+    registry.add_stats("product_cache", product_cache.stats)
+    registry.add_stats("catalog_snapshot", catalog_snapshot.stats)
+    registry.add_stats("principal_cache", principal_cache.stats)
+    registry.add_stats("password_executor", password_executor.stats)
+    registry.add_stats("scheduler_lease", scheduler_lease.stats)
+    registry.add_stats("mail", mail_sender.stats)
+    registry.add_stats("view_buffer", view_buffer.stats)
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel, ConfigDict
 
@@ -35,3 +35,35 @@ class ProductPatchResponse(ProductUpdatePatch):
     model_config = ConfigDict(from_attributes=True)
 
     id: int
+
+
+class ProductChange(BaseModel):
+    product_id: int
+    action: Literal["upsert", "delete"]
+    product: Optional[Product] = None
+
+
+class ProductChanges(BaseModel):
+    changes: List[ProductChange]
+    cursor: str
+    has_more: bool
+
+
+class ProductBulkResult(BaseModel):
+    sku: str
+    status: Literal["created", "updated", "conflict"]
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class ProductImport(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    status: Literal["pending", "running", "completed", "failed"]
+    rows_committed: int
+    created: int
+    updated: int
+    conflicts: int
+    invalid: int
+    last_error: Optional[str] = None
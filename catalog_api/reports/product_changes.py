@@ -1,11 +1,17 @@
-from catalog_api.utils.daily_changes_report import return_text_for_mail
+from catalog_api.database import database
+from catalog_api.utils.daily_changes_report import mark_reported, return_text_for_mail
 from catalog_api.utils.send_mails import send_email
 
 
 async def send_daily_report():
-    body_content = await return_text_for_mail()
-    if body_content:
-        await send_email(body_content)
+    report = await return_text_for_mail()
+    if report:
+        body_content, last_audit_id = report
+        # Queued and marked as reported together, so a change is never mailed
+        # twice or skipped
+        async with database.transaction():
+            await send_email(body_content)
+            await mark_reported(last_audit_id)
         return {"detail": "Report sucessfully sent!"}
     else:
         return {"detail": "No changes were found, report skipped."}
@@ -0,0 +1,38 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, status
+
+from catalog_api.database import slow_query_log
+from catalog_api.models.users import User
+from catalog_api.security import get_current_user, principal_cache
+from catalog_api.utils.leader_lease import scheduler_lease
+from catalog_api.utils.product_cache import product_cache
+
+router = APIRouter()
+
+
+@router.get("/admin/cache-stats", status_code=status.HTTP_200_OK)
+async def get_cache_stats(current_user: Annotated[User, Depends(get_current_user)]):
+    return {
+        "principals": principal_cache.stats(),
+        "products": product_cache.stats(),
+    }
+
+
+@router.get("/admin/scheduler-lease", status_code=status.HTTP_200_OK)
+async def get_scheduler_lease(current_user: Annotated[User, Depends(get_current_user)]):
+    """
+    Lease metrics of this worker: whether it currently runs the scheduled jobs,
+    and how often it acquired, renewed, lost or released the lease
+    """
+    return scheduler_lease.stats()
+
+
+@router.get("/admin/slow-queries", status_code=status.HTTP_200_OK)
+async def get_slow_queries(current_user: Annotated[User, Depends(get_current_user)]):
+    """
+    The latest statements of this worker slower than SLOW_QUERY_THRESHOLD_MS,
+    newest first, with their parameters and query plan. Empty unless
+    SLOW_QUERY_LOG_ENABLED is set
+    """
+    return {**slow_query_log.stats(), "queries": list(reversed(slow_query_log.entries))}
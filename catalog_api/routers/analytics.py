@@ -1,21 +1,35 @@
+import datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, Query, status
+from fastapi import APIRouter, HTTPException, status
 
-from catalog_api.database import database
+from catalog_api.database import database, product_views_daily_table
 from catalog_api.models.analytics import ProductViewCount
+from catalog_api.utils.view_rollups import count_views_between, total_views_query
 
 router = APIRouter()
 
 
+def as_utc(moment: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    # View dates are stored as naive UTC
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
+async def fetch_view_counts(query) -> List[dict]:
+    # Records expose Sequence.count, which would shadow the "count" column when
+    # the response model reads attributes, so hand plain dicts to the model.
+    return [dict(views) for views in await database.fetch_all(query)]
+
+
 @router.get(
     "/product-views/",
     response_model=List[ProductViewCount],
     status_code=status.HTTP_200_OK,
 )
 async def get_products_views():
-    query = "SELECT product_id, COUNT(*) AS count FROM product_analytics GROUP BY product_id"
-    return await database.fetch_all(query)
+    return await fetch_view_counts(total_views_query())
 
 
 @router.get(
@@ -24,12 +38,13 @@ async def get_products_views():
     status_code=status.HTTP_200_OK,
 )
 async def get_specific_product_views(product_id: int):
-    query = f"SELECT product_id, COUNT(*) AS count FROM product_analytics WHERE product_id = {product_id} GROUP BY product_id"
-    views = await database.fetch_one(query)
-    print(views)
+    query = total_views_query().where(
+        product_views_daily_table.c.product_id == product_id
+    )
+    views = await fetch_view_counts(query)
     if not views:
         return {"product_id": product_id, "count": 0}
-    return views
+    return views[0]
 
 
 @router.get(
@@ -38,29 +53,25 @@ async def get_specific_product_views(product_id: int):
     status_code=status.HTTP_200_OK,
 )
 async def get_product_views_filtered(
-    month: Optional[int] = Query(None, ge=1, le=12), year: Optional[int] = Query(None)
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    product_id: Optional[int] = None,
 ):
     """
-    Read product views by a specific month and year
-    :param month: Month to filter (1-12)
-    :param year: Year to filter
+    Read product views in a date range
+    :param start: Count views from this moment on (inclusive), UTC if no offset is given
+    :param end: Count views up to this moment (exclusive), UTC if no offset is given
+    :param product_id: Only count views of this product
     """
+    start, end = as_utc(start), as_utc(end)
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end",
+        )
 
-    # Base part of the query
-    query = "SELECT product_id, COUNT(*) AS count FROM product_analytics"
-
-    # List to hold where conditions
-    conditions = []
-
-    if year:
-        conditions.append(f"strftime('%Y', view_date) = '{year}'")
-    if month:
-        conditions.append(f"strftime('%m', view_date) = '{str(month).zfill(2)}'")
-
-    # If any conditions exist, append them to the query
-    if conditions:
-        query += " WHERE " + " AND ".join(conditions)
-
-    query += " GROUP BY product_id"
-
-    return await database.fetch_all(query)
+    views = await count_views_between(start, end, product_id)
+    return [
+        {"product_id": product_id, "count": count}
+        for product_id, count in sorted(views.items())
+    ]
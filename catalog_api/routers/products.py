@@ -1,27 +1,269 @@
-import json
-from typing import Annotated, List
+from typing import Annotated, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from sqlalchemy import exists, select, tuple_
 
-from catalog_api.database import database, products_table
+from catalog_api.database import database, dialect_insert, products_table
 from catalog_api.models.products import (
     Product,
+    ProductBulkResult,
+    ProductChanges,
     ProductCreate,
+    ProductImport,
     ProductPatchResponse,
     ProductUpdatePatch,
     ProductUpdatePut,
 )
 from catalog_api.models.users import User
 from catalog_api.security import get_current_user, is_user_valid
-from catalog_api.utils.db_utils import add_audit_entry, add_product_anonymous_view
+from catalog_api.utils.audit import audited_transaction
+from catalog_api.utils.bulk_products import upsert_products
+from catalog_api.utils.catalog_export import (
+    MEDIA_TYPES,
+    CatalogFormat,
+    export_products,
+)
+from catalog_api.utils.catalog_snapshot import (
+    IDENTITY,
+    catalog_snapshot,
+    choose_encoding,
+)
+from catalog_api.utils.pagination import (
+    decode_id_cursor,
+    decode_sort_key_cursor,
+    encode_cursor,
+)
+from catalog_api.utils.product_cache import (
+    evict_product,
+    get_cached_product,
+    store_product,
+)
+from catalog_api.utils.product_changes import (
+    get_latest_audit_id,
+    get_product_changes,
+)
+from catalog_api.utils.product_import import (
+    claim_import,
+    create_import,
+    get_import,
+    import_products,
+)
+from catalog_api.utils.product_search import build_match_expression, search_products
+from catalog_api.utils.row_responses import TrustedRowsRoute
+from catalog_api.utils.versions import (
+    bump_product_version,
+    etag_matches,
+    get_catalog_version,
+    get_product_version,
+    make_etag,
+)
+from catalog_api.utils.view_buffer import view_buffer
 
-router = APIRouter()
+# Products are returned as read from the database, without validating them
+router = APIRouter(route_class=TrustedRowsRoute)
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_BULK_PRODUCTS = 1000
+DEFAULT_IMPORT_CHUNK_SIZE = 500
+CACHE_CONTROL = "public, max-age=0, must-revalidate"
 
-@router.get("/products", response_model=List[Product], status_code=status.HTTP_200_OK)
-async def read_products():
+
+def not_modified(etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL},
+    )
+
+
+def products_page_query(
+    limit: int,
+    after: Optional[str] = None,
+    brand: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+):
     query = products_table.select()
-    return await database.fetch_all(query)
+    if brand is not None:
+        query = query.where(products_table.c.brand == brand)
+    if min_price is None and max_price is None:
+        if after is not None:
+            query = query.where(products_table.c.id > decode_id_cursor(after))
+        order_by = [products_table.c.id]
+    else:
+        # Ordered by price so the page is read straight from the price index,
+        # rather than sorting every product in the range by id for each page
+        if after is not None:
+            price, product_id = decode_sort_key_cursor(after)
+            query = query.where(
+                tuple_(products_table.c.price, products_table.c.id)
+                > tuple_(price, product_id)
+            )
+            # SQLite only starts the index scan at a plain bound on the price,
+            # not at a row value, and at a single one of them
+            min_price = price if min_price is None else max(min_price, price)
+        if min_price is not None:
+            query = query.where(products_table.c.price >= min_price)
+        if max_price is not None:
+            query = query.where(products_table.c.price <= max_price)
+        order_by = [products_table.c.price, products_table.c.id]
+
+    # One extra row tells us whether there is a next page without a COUNT(*)
+    return query.order_by(*order_by).limit(limit + 1)
+
+
+@router.get("/products", response_model=List[Product], status_code=status.HTTP_200_OK)
+async def read_products(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    brand: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Read a page of products ordered by id, or by price then id when filtering
+    by price
+    :param limit: Maximum number of products in the page
+    :param after: Cursor from the X-Next-Cursor header of the previous page
+    :param brand: Only return products of this brand
+    :param min_price: Only return products with a price greater or equal to this
+    :param max_price: Only return products with a price lower or equal to this
+    """
+    # The version is read before the products, so a write landing in between
+    # can only make the ETag older than the body, never newer.
+    params = sorted(request.query_params.multi_items())
+    etag = make_etag("products", await get_catalog_version(), params)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+    query = products_page_query(limit, after, brand, min_price, max_price)
+    products = await database.fetch_all(query)
+    if len(products) > limit:
+        products = products[:limit]
+        last = products[-1]
+        by_price = min_price is not None or max_price is not None
+        response.headers["X-Next-Cursor"] = encode_cursor(
+            [last.price, last.id] if by_price else last.id
+        )
+
+    return products
+
+
+@router.get(
+    "/products/search", response_model=List[Product], status_code=status.HTTP_200_OK
+)
+async def search_catalog(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+):
+    """
+    Search products by name, brand and SKU, best matches first
+    :param q: Words to look for, each one matches as a prefix
+    :param limit: Maximum number of products in the page
+    :param after: Cursor from the X-Next-Cursor header of the previous page
+    """
+    match = build_match_expression(q)
+    if match is None:
+        return []
+
+    cursor = decode_sort_key_cursor(after) if after is not None else None
+    products = await search_products(match, limit + 1, cursor)
+    if len(products) > limit:
+        products = products[:limit]
+        last = products[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor([last.score, last.id])
+
+    return products
+
+
+@router.get(
+    "/products/snapshot", response_model=List[Product], status_code=status.HTTP_200_OK
+)
+async def read_catalog_snapshot(
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    The whole catalog ordered by id, from a snapshot kept in memory and
+    compressed with brotli or gzip ahead of time, as the client accepts.
+    Changes made through another worker show up within
+    CATALOG_SNAPSHOT_POLL_INTERVAL seconds
+    """
+    encoding = choose_encoding(accept_encoding)
+    version, body = await catalog_snapshot.get(encoding)
+    # One ETag per encoding, since the bodies differ
+    etag = make_etag("snapshot", version, encoding)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if encoding != IDENTITY:
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@router.get(
+    "/products/changes", response_model=ProductChanges, status_code=status.HTTP_200_OK
+)
+async def read_product_changes(
+    since: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """
+    Changes to products since a cursor, one per product: "upsert" with the
+    product as it is now, or "delete". To mirror the catalog, get a cursor
+    (no since), then load /products/snapshot, then keep asking for the changes
+    since the last cursor returned, right away while has_more is true
+    :param since: Cursor from a previous response
+    :param limit: Maximum number of audit entries read, changes to the same
+    product are folded into one
+    """
+    if since is None:
+        cursor = await get_latest_audit_id()
+        return {"changes": [], "cursor": encode_cursor(cursor), "has_more": False}
+
+    changes, cursor, has_more = await get_product_changes(
+        decode_id_cursor(since), limit
+    )
+    return {"changes": changes, "cursor": encode_cursor(cursor), "has_more": has_more}
+
+
+@router.get("/products/export", status_code=status.HTTP_200_OK)
+async def export_catalog(
+    export_format: CatalogFormat = Query(CatalogFormat.ndjson, alias="format"),
+    gzip: bool = False,
+):
+    """
+    Stream the whole catalog ordered by id
+    :param format: ndjson (one product per line) or csv
+    :param gzip: Compress the stream on the fly
+    """
+    filename = f"products.{export_format.value}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(
+        export_products(export_format, gzip),
+        media_type=MEDIA_TYPES[export_format],
+        headers=headers,
+    )
 
 
 @router.get(
@@ -30,82 +272,189 @@ async def read_products():
 async def read_product(
     product_id: int,
     is_valid_user: Annotated[bool, Depends(is_user_valid)],
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
 ):
+    version = await get_product_version(product_id)
+    etag = make_etag("product", product_id, version)
+    # * matches any product that exists, which takes reading it first
+    if not etag_matches(if_none_match, etag, wildcard=False):
+        product = await get_cached_product(product_id, version)
+        if not product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Product not found"
+            )
+
+    if not is_valid_user:
+        await view_buffer.add(product_id)
+
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return product
+
+
+async def fetch_product(product_id: int):
+    # Mutations read the row itself rather than the cache, so audit entries
+    # always record what was in the database.
     query = products_table.select().where(products_table.c.id == product_id)
     product = await database.fetch_one(query)
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Product not found"
         )
+    return product
 
-    if not is_valid_user:
-        await add_product_anonymous_view(product_id)
 
-    return product
+def update_product_query(product_id: int, data: dict):
+    query = (
+        products_table.update()
+        .where(products_table.c.id == product_id)
+        .values(data)
+        .returning(*products_table.c)
+    )
+    if "sku" in data:
+        # Leave the row alone instead of failing on the unique index, so a
+        # taken SKU comes back as no row rather than an IntegrityError
+        taken = select(products_table.c.id).where(
+            products_table.c.sku == data["sku"], products_table.c.id != product_id
+        )
+        query = query.where(~exists(taken))
+    return query
+
+
+def returned_product(record) -> dict:
+    # SQLite's RETURNING gives the values as sent, before the column types
+    # apply (an int for a price of 1), and the rows aren't validated on the
+    # way out, so they take the model's types before being stored anywhere
+    return Product.model_validate(dict(record)).model_dump()
+
+
+sku_conflict_exception = HTTPException(
+    status_code=status.HTTP_409_CONFLICT, detail="SKU already exist"
+)
 
 
 @router.post("/products", response_model=Product, status_code=status.HTTP_201_CREATED)
 async def create_product(
     product: ProductCreate, current_user: Annotated[User, Depends(get_current_user)]
 ):
-    data = product.dict()
-    existing_sku_query = products_table.select().where(
-        products_table.c.sku == product.sku
+    query = (
+        dialect_insert(products_table)
+        .values(product.dict())
+        .on_conflict_do_nothing(index_elements=[products_table.c.sku])
+        .returning(*products_table.c)
     )
-    if await database.fetch_one(existing_sku_query):
+    async with audited_transaction() as audit:
+        record = await database.fetch_one(query)
+        if not record:
+            raise sku_conflict_exception
+        new_record = returned_product(record)
+        versions = await bump_product_version(new_record["id"])
+        audit.add(new_record["id"], "ADDED", current_user.id, new_data=new_record)
+
+    store_product(new_record, versions.products[new_record["id"]])
+    catalog_snapshot.store(versions.catalog, [new_record])
+    return new_record
+
+
+@router.post(
+    "/products/bulk",
+    response_model=List[ProductBulkResult],
+    status_code=status.HTTP_200_OK,
+)
+async def bulk_upsert_products(
+    products: List[ProductCreate],
+    current_user: Annotated[User, Depends(get_current_user)],
+):
+    """
+    Create or update up to MAX_BULK_PRODUCTS products by SKU in one transaction
+    """
+    if len(products) > MAX_BULK_PRODUCTS:
         raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT, detail="SKU already exist"
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {MAX_BULK_PRODUCTS} products per request",
         )
 
-    query = products_table.insert().values(data)
+    return await upsert_products(
+        [product.dict() for product in products], current_user.id
+    )
 
-    last_record_id = await database.execute(query)
-    new_record = {**data, "id": last_record_id}
 
-    await add_audit_entry(
-        data={
-            "product_id": new_record["id"],
-            "action": "ADDED",
-            "previous_data": None,
-            "new_data": json.dumps(new_record),
-            "changed_by": current_user.id,
-        }
-    )
+@router.post(
+    "/products/imports",
+    response_model=ProductImport,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_product_import(
+    current_user: Annotated[User, Depends(get_current_user)],
+):
+    """
+    Start a product import, the file is then sent to PUT /products/imports/{id}
+    """
+    return await create_import(current_user.id)
 
-    return new_record
+
+@router.get(
+    "/products/imports/{import_id}",
+    response_model=ProductImport,
+    status_code=status.HTTP_200_OK,
+)
+async def read_product_import(
+    import_id: int, current_user: Annotated[User, Depends(get_current_user)]
+):
+    product_import = await get_import(import_id)
+    if not product_import:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Import not found"
+        )
+    return product_import
 
 
 @router.put(
-    "/products/{product_id}", response_model=Product, status_code=status.HTTP_200_OK
+    "/products/imports/{import_id}",
+    response_model=ProductImport,
+    status_code=status.HTTP_200_OK,
 )
-async def complete_update_product(
-    product: ProductUpdatePut,
-    product_id: int,
+async def upload_product_import(
+    import_id: int,
+    request: Request,
     current_user: Annotated[User, Depends(get_current_user)],
+    file_format: CatalogFormat = Query(CatalogFormat.csv, alias="format"),
+    chunk_size: int = Query(DEFAULT_IMPORT_CHUNK_SIZE, ge=1, le=MAX_BULK_PRODUCTS),
 ):
-    data = product.dict()
-    previous_data = await read_product(product_id, is_valid_user=True)
-    query = (
-        products_table.update().where(products_table.c.id == product_id).values(data)
-    )
-    last_record_id = await database.execute(query)
-    if not last_record_id:
+    """
+    Stream a CSV or NDJSON file of products in the request body, committing
+    every chunk_size rows. If a previous upload was interrupted, sending the
+    same file again resumes after the last committed row.
+    :param format: csv (with a header row) or ndjson
+    :param chunk_size: Rows committed per transaction
+    """
+    await read_product_import(import_id, current_user)
+    # A retried upload could otherwise import the same rows alongside the first
+    if not await claim_import(import_id):
+        product_import = await get_import(import_id)
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Product not found"
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Import already {product_import.status}",
         )
-    updated_record = {**data, "id": last_record_id}
-
-    await add_audit_entry(
-        data={
-            "product_id": updated_record["id"],
-            "action": "UPDATED",
-            "previous_data": json.dumps(dict(previous_data)),
-            "new_data": json.dumps(dict(updated_record)),
-            "changed_by": current_user.id,
-        }
+
+    await import_products(
+        import_id, request.stream(), file_format, chunk_size, current_user.id
     )
+    return await get_import(import_id)
 
-    return updated_record
+
+@router.put(
+    "/products/{product_id}", response_model=Product, status_code=status.HTTP_200_OK
+)
+async def complete_update_product(
+    product: ProductUpdatePut,
+    product_id: int,
+    current_user: Annotated[User, Depends(get_current_user)],
+):
+    return await update_product(product_id, product.dict(), current_user)
 
 
 @router.patch(
@@ -118,28 +467,33 @@ async def partially_update_product(
     product_id: int,
     current_user: Annotated[User, Depends(get_current_user)],
 ):
-    data = product.dict(exclude_unset=True)
-    previous_data = await read_product(product_id, is_valid_user=True)
-    query = (
-        products_table.update().where(products_table.c.id == product_id).values(data)
+    return await update_product(
+        product_id, product.dict(exclude_unset=True), current_user
     )
-    last_record_id = await database.execute(query)
-    if not last_record_id:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Product not found"
+
+
+async def update_product(product_id: int, data: dict, current_user: User):
+    async with audited_transaction() as audit:
+        # SQLite's RETURNING only sees the new row, so the previous one for the
+        # audit entry still takes its own read
+        previous_data = await fetch_product(product_id)
+        if not data:
+            return previous_data
+        record = await database.fetch_one(update_product_query(product_id, data))
+        if not record:
+            raise sku_conflict_exception
+        new_data = returned_product(record)
+        versions = await bump_product_version(product_id)
+        audit.add(
+            product_id,
+            "UPDATED",
+            current_user.id,
+            previous_data=previous_data,
+            new_data=new_data,
         )
-    new_data = await read_product(product_id, is_valid_user=True)
-
-    await add_audit_entry(
-        data={
-            "product_id": new_data["id"],
-            "action": "UPDATED",
-            "previous_data": json.dumps(dict(previous_data)),
-            "new_data": json.dumps(dict(new_data)),
-            "changed_by": current_user.id,
-        }
-    )
 
+    store_product(new_data, versions.products[product_id])
+    catalog_snapshot.store(versions.catalog, [new_data])
     return new_data
 
 
@@ -147,22 +501,20 @@ async def partially_update_product(
 async def delete_product(
     product_id: int, current_user: Annotated[User, Depends(get_current_user)]
 ):
-    previous_data = await read_product(product_id, is_valid_user=True)
-    query = products_table.delete().where(products_table.c.id == product_id)
-    product = await database.execute(query)
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Product not found"
-        )
-
-    await add_audit_entry(
-        data={
-            "product_id": previous_data["id"],
-            "action": "DELETED",
-            "previous_data": json.dumps(dict(previous_data)),
-            "new_data": None,
-            "changed_by": current_user.id,
-        }
+    query = (
+        products_table.delete()
+        .where(products_table.c.id == product_id)
+        .returning(*products_table.c)
     )
+    async with audited_transaction() as audit:
+        previous_data = await database.fetch_one(query)
+        if not previous_data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Product not found"
+            )
+        versions = await bump_product_version(product_id)
+        audit.add(product_id, "DELETED", current_user.id, previous_data=previous_data)
 
+    evict_product(product_id)
+    catalog_snapshot.remove(versions.catalog, product_id)
     return {"detail": "Product deleted sucessfully"}
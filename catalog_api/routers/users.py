@@ -14,8 +14,9 @@ from catalog_api.security import (
     authenticate_user,
     create_access_token,
     get_current_user,
-    get_password_hash,
+    get_password_hash_async,
     get_user,
+    invalidate_principal,
     is_user_admin,
 )
 
@@ -39,7 +40,7 @@ async def register_user(
             detail="Only admin users can create admin users",
         )
 
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     data = user.dict()
     query = users_table.insert().values({**data, "password": hashed_password})
     await database.execute(query)
@@ -65,12 +66,18 @@ async def partially_update_user(
         "email": user.email,
         "is_admin": user.is_admin,
     }
-    query = users_table.update().where(users_table.c.id == user_id).values(data)
-    last_record_id = await database.execute(query)
+    query = (
+        users_table.update()
+        .where(users_table.c.id == user_id)
+        .values(data)
+        .returning(users_table.c.id)
+    )
+    last_record_id = await database.fetch_val(query)
     if not last_record_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
+    invalidate_principal(user_id)
 
     return {**data, "id": last_record_id}
 
@@ -79,11 +86,16 @@ async def partially_update_user(
 async def delete_user(
     user_id: int, current_user: Annotated[User, Depends(get_current_user)]
 ):
-    query = users_table.delete().where(users_table.c.id == user_id)
-    deleted_user = await database.execute(query)
+    query = (
+        users_table.delete()
+        .where(users_table.c.id == user_id)
+        .returning(users_table.c.id)
+    )
+    deleted_user = await database.fetch_val(query)
     if not deleted_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
+    invalidate_principal(user_id)
 
     return {"detail": "User deleted sucessfully"}
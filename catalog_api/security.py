@@ -8,14 +8,28 @@ from jwt.exceptions import ExpiredSignatureError
 from passlib.context import CryptContext
 
 from catalog_api.config import config
-from catalog_api.database import database, users_table
+from catalog_api.database import database, dialect_insert, users_table
 from catalog_api.models.users import User
+from catalog_api.utils.bounded_executor import BoundedExecutor, ExecutorSaturatedError
+from catalog_api.utils.cache import LRUCache
 
 SECRET_KEY = config.SECRET_KEY
 ALGORITHM = config.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 pwd_context = CryptContext(schemes=["bcrypt"])
+# bcrypt takes tens of milliseconds per call, so it must not run on the event loop
+password_executor = BoundedExecutor(
+    max_workers=config.PASSWORD_HASH_WORKERS,
+    max_queued=config.PASSWORD_HASH_QUEUE_DEPTH,
+    thread_name_prefix="password-hash",
+)
+principal_cache = LRUCache(
+    max_size=config.PRINCIPAL_CACHE_SIZE, ttl=config.PRINCIPAL_CACHE_TTL
+)
+# Bumped on every invalidation, so a lookup that raced with one doesn't put
+# the user it read before the change back into the cache.
+_principal_invalidations = 0
 
 credentials_exception = HTTPException(
     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -23,6 +37,12 @@ credentials_exception = HTTPException(
     headers={"WWW-Authenticate": "Bearer"},
 )
 
+password_hashing_busy_exception = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Too many password checks in progress, try again later",
+    headers={"Retry-After": "1"},
+)
+
 not_admin_exception = HTTPException(
     status_code=status.HTTP_401_UNAUTHORIZED,
     detail="Only admin can access this",
@@ -47,6 +67,21 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+async def run_password_job(func, *args):
+    try:
+        return await password_executor.run(func, *args)
+    except ExecutorSaturatedError:
+        raise password_hashing_busy_exception
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await run_password_job(get_password_hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await run_password_job(verify_password, plain_password, hashed_password)
+
+
 async def get_user(email: str):
     query = users_table.select().where(users_table.c.email == email)
     result = await database.fetch_one(query)
@@ -54,11 +89,29 @@ async def get_user(email: str):
         return result
 
 
+async def get_principal(email: str):
+    """Same as get_user, but cached by token subject so authenticated requests
+    don't need a users lookup every time."""
+    user = principal_cache.get(email)
+    if user is None:
+        invalidations = _principal_invalidations
+        user = await get_user(email)
+        if user is not None and invalidations == _principal_invalidations:
+            principal_cache.set(email, user)
+    return user
+
+
+def invalidate_principal(user_id: int):
+    global _principal_invalidations
+    _principal_invalidations += 1
+    principal_cache.discard_where(lambda user: user.id == user_id)
+
+
 async def authenticate_user(email: str, password: str):
     user = await get_user(email)
     if not user:
         raise credentials_exception
-    if not verify_password(password, user.password):
+    if not await verify_password_async(password, user.password):
         raise credentials_exception
     return user
 
@@ -67,13 +120,18 @@ async def create_default_admin():
     query = users_table.select().where(users_table.c.email == config.DB_ADMIN_EMAIL)
     default_admin_user = await database.fetch_one(query)
     if not default_admin_user:
-        hashed_password = get_password_hash(config.DB_ADMIN_PWD)
-        query = users_table.insert().values(
-            {
-                "email": config.DB_ADMIN_EMAIL,
-                "password": hashed_password,
-                "is_admin": True,
-            }
+        hashed_password = await get_password_hash_async(config.DB_ADMIN_PWD)
+        # Every worker runs this on startup, the first one to insert wins
+        query = (
+            dialect_insert(users_table)
+            .values(
+                {
+                    "email": config.DB_ADMIN_EMAIL,
+                    "password": hashed_password,
+                    "is_admin": True,
+                }
+            )
+            .on_conflict_do_nothing(index_elements=[users_table.c.email])
         )
         await database.execute(query)
 
@@ -92,7 +150,7 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> Use
         ) from e
     except Exception:
         raise credentials_exception
-    user = await get_user(email=email)
+    user = await get_principal(email)
     if user is None:
         raise credentials_exception
     if not user.is_admin:
@@ -109,7 +167,7 @@ async def is_user_valid(token: Annotated[str, Depends(oauth2_scheme)]) -> bool:
     except (ExpiredSignatureError, Exception):
         return False
 
-    user = await get_user(email=email)
+    user = await get_principal(email)
     if user is None:
         return False
 
@@ -125,7 +183,7 @@ async def is_user_admin(token: Annotated[str, Depends(oauth2_scheme)]) -> bool:
     except (ExpiredSignatureError, Exception):
         return False
 
-    user = await get_user(email=email)
+    user = await get_principal(email)
     if user is None:
         return False
 
@@ -9,7 +9,13 @@ os.environ["ENV_STATE"] = "test"
 from catalog_api.config import config  # noqa: E402
 from catalog_api.database import database, users_table  # noqa: E402
 from catalog_api.main import app  # noqa: E402
-from catalog_api.security import create_default_admin, is_user_admin  # noqa: E402
+from catalog_api.security import (  # noqa: E402
+    create_default_admin,
+    is_user_admin,
+    principal_cache,
+)
+from catalog_api.utils.catalog_snapshot import catalog_snapshot  # noqa: E402
+from catalog_api.utils.product_cache import product_cache  # noqa: E402
 
 
 @pytest.fixture(scope="session")
@@ -27,6 +33,10 @@ async def db() -> AsyncGenerator:
     await database.connect()
     yield
     await database.disconnect()
+    # Cached rows would outlive the rolled back test data
+    principal_cache.clear()
+    product_cache.clear()
+    catalog_snapshot.clear()
 
 
 @pytest.fixture()
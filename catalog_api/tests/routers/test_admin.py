@@ -0,0 +1,60 @@
+import pytest
+from httpx import AsyncClient
+
+
+@pytest.mark.anyio
+async def test_get_cache_stats(async_client: AsyncClient, logged_in_admin_token: str):
+    headers = {"Authorization": f"Bearer {logged_in_admin_token}"}
+    await async_client.get("/admin/cache-stats", headers=headers)
+    response = await async_client.get("/admin/cache-stats", headers=headers)
+
+    assert response.status_code == 200
+    assert response.json()["principals"]["hits"] >= 1
+
+
+@pytest.mark.anyio
+async def test_get_cache_stats_non_admin(
+    async_client: AsyncClient, logged_in_token: str
+):
+    response = await async_client.get(
+        "/admin/cache-stats", headers={"Authorization": f"Bearer {logged_in_token}"}
+    )
+
+    assert response.status_code == 401
+
+
+@pytest.mark.anyio
+async def test_get_scheduler_lease(
+    async_client: AsyncClient, logged_in_admin_token: str
+):
+    response = await async_client.get(
+        "/admin/scheduler-lease",
+        headers={"Authorization": f"Bearer {logged_in_admin_token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["name"] == "scheduler"
+    assert response.json()["is_leader"] is False
+
+
+@pytest.mark.anyio
+async def test_get_slow_queries(async_client: AsyncClient, logged_in_admin_token: str):
+    response = await async_client.get(
+        "/admin/slow-queries",
+        headers={"Authorization": f"Bearer {logged_in_admin_token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["queries"] == []
+    assert response.json()["threshold_ms"] == 100.0
+
+
+@pytest.mark.anyio
+async def test_get_slow_queries_non_admin(
+    async_client: AsyncClient, logged_in_token: str
+):
+    response = await async_client.get(
+        "/admin/slow-queries", headers={"Authorization": f"Bearer {logged_in_token}"}
+    )
+
+    assert response.status_code == 401
@@ -0,0 +1,115 @@
+import datetime
+
+import pytest
+from httpx import AsyncClient
+
+from catalog_api.utils.db_utils import add_product_anonymous_views
+
+
+def views(product_id: int, view_date: datetime.datetime, count: int) -> list:
+    return [{"product_id": product_id, "view_date": view_date}] * count
+
+
+@pytest.fixture()
+async def recorded_views():
+    await add_product_anonymous_views(
+        views(1, datetime.datetime(2023, 1, 15, 10, 30), 3)
+        + views(1, datetime.datetime(2023, 2, 1, 8, 0), 2)
+        + views(2, datetime.datetime(2024, 1, 20, 23, 59), 4)
+    )
+
+
+@pytest.mark.anyio
+async def test_get_products_views(async_client: AsyncClient, recorded_views):
+    response = await async_client.get("/product-views/")
+
+    assert response.status_code == 200
+    assert sorted(response.json(), key=lambda v: v["product_id"]) == [
+        {"product_id": 1, "count": 5},
+        {"product_id": 2, "count": 4},
+    ]
+
+
+@pytest.mark.anyio
+async def test_get_specific_product_views(async_client: AsyncClient, recorded_views):
+    response = await async_client.get("/product-views/1")
+
+    assert response.status_code == 200
+    assert response.json() == {"product_id": 1, "count": 5}
+
+
+@pytest.mark.anyio
+async def test_get_specific_product_views_not_viewed(async_client: AsyncClient):
+    response = await async_client.get("/product-views/3")
+
+    assert response.status_code == 200
+    assert response.json() == {"product_id": 3, "count": 0}
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "params,expected",
+    [
+        ({}, [{"product_id": 1, "count": 5}, {"product_id": 2, "count": 4}]),
+        (
+            {"start": "2023-01-01T00:00:00", "end": "2024-01-01T00:00:00"},
+            [{"product_id": 1, "count": 5}],
+        ),
+        (
+            {"start": "2023-02-01T00:00:00"},
+            [{"product_id": 1, "count": 2}, {"product_id": 2, "count": 4}],
+        ),
+        ({"end": "2023-01-15T10:30:00"}, []),
+        (
+            {"start": "2023-01-15T10:30:00", "end": "2023-01-15T10:30:01"},
+            [{"product_id": 1, "count": 3}],
+        ),
+        (
+            {"start": "2023-01-15T10:00:00", "end": "2024-01-20T23:59:30"},
+            [{"product_id": 1, "count": 5}, {"product_id": 2, "count": 4}],
+        ),
+        (
+            {"start": "2023-01-15T10:31:00", "end": "2024-01-20T23:59:00"},
+            [{"product_id": 1, "count": 2}],
+        ),
+        (
+            {"start": "2024-01-21T01:59:00+02:00", "product_id": 2},
+            [{"product_id": 2, "count": 4}],
+        ),
+        ({"product_id": 2, "end": "2024-01-01T00:00:00"}, []),
+    ],
+)
+async def test_get_product_views_filtered(
+    async_client: AsyncClient, recorded_views, params: dict, expected: list
+):
+    response = await async_client.get("/product-views/filter/", params=params)
+
+    assert response.status_code == 200
+    assert response.json() == expected
+
+
+@pytest.mark.anyio
+async def test_get_product_views_filtered_invalid_range(async_client: AsyncClient):
+    response = await async_client.get(
+        "/product-views/filter/",
+        params={"start": "2024-01-01T00:00:00", "end": "2023-01-01T00:00:00"},
+    )
+
+    assert response.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_anonymous_product_view_is_counted(
+    async_client: AsyncClient, logged_in_admin_token: str
+):
+    response = await async_client.post(
+        "/products",
+        json={"name": "Product", "sku": "sku-1", "price": 1.0, "brand": "Luuna"},
+        headers={"Authorization": f"Bearer {logged_in_admin_token}"},
+    )
+    product_id = response.json()["id"]
+
+    await async_client.get(f"/products/{product_id}")
+    response = await async_client.get(f"/product-views/{product_id}")
+
+    assert response.json() == {"product_id": product_id, "count": 1}
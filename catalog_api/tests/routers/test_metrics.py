@@ -0,0 +1,21 @@
+import pytest
+from httpx import AsyncClient
+
+
+@pytest.mark.anyio
+async def test_get_metrics(async_client: AsyncClient):
+    await async_client.get("/products/1")
+    response = await async_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert (
+        'catalog_http_request_duration_seconds_count{method="GET",'
+        'route="/products/{product_id}",status="404"}' in response.text
+    )
+    assert (
+        'catalog_db_query_duration_seconds_count{operation="fetch_one",'
+        'statement="SELECT products.id, products.name, products.sku, products.price,'
+        ' products.brand FROM products WHERE products.id = :id_1"}' in response.text
+    )
+    assert "catalog_product_cache_misses" in response.text
@@ -1,6 +1,20 @@
+import csv
+import io
+import json
+
 import pytest
 from httpx import AsyncClient
 
+from catalog_api.config import config
+from catalog_api.database import audit_log_table, database, engine, products_table
+from catalog_api.routers.products import products_page_query
+from catalog_api.utils import catalog_export
+from catalog_api.utils.catalog_snapshot import catalog_snapshot
+from catalog_api.utils.pagination import encode_cursor
+from catalog_api.utils.product_import import claim_import
+from catalog_api.utils.slow_queries import SlowQueryLog
+from catalog_api.utils.versions import bump_product_version
+
 
 async def create_product(
     body: dict, async_client: AsyncClient, logged_in_admin_token: str
@@ -36,6 +50,316 @@ async def test_get_products(async_client: AsyncClient, created_product: dict):
     assert response.json()[0]["brand"] == "Luuna"
 
 
+@pytest.mark.anyio
+async def test_get_products_paginated(
+    async_client: AsyncClient, logged_in_admin_token: str
+):
+    for i in range(3):
+        await create_product(
+            {
+                "name": f"Product {i}",
+                "sku": f"sku-{i}",
+                "price": 10.0,
+                "brand": "Luuna",
+            },
+            async_client,
+            logged_in_admin_token,
+        )
+
+    response = await async_client.get("/products", params={"limit": 2})
+    assert response.status_code == 200
+    assert [p["sku"] for p in response.json()] == ["sku-0", "sku-1"]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = await async_client.get("/products", params={"limit": 2, "after": cursor})
+    assert [p["sku"] for p in response.json()] == ["sku-2"]
+    assert "X-Next-Cursor" not in response.headers
+
+
+@pytest.mark.anyio
+async def test_get_products_filtered(
+    async_client: AsyncClient, logged_in_admin_token: str
+):
+    products = [
+        {"name": "Cheap", "sku": "sku-1", "price": 10.0, "brand": "Luuna"},
+        {"name": "Expensive", "sku": "sku-2", "price": 500.0, "brand": "Luuna"},
+        {"name": "Other", "sku": "sku-3", "price": 50.0, "brand": "Mappa"},
+    ]
+    for product in products:
+        await create_product(product, async_client, logged_in_admin_token)
+
+    response = await async_client.get(
+        "/products", params={"brand": "Luuna", "max_price": 100}
+    )
+    assert [p["name"] for p in response.json()] == ["Cheap"]
+
+    # Ordered by price when filtering by price
+    response = await async_client.get("/products", params={"min_price": 50})
+    assert [p["name"] for p in response.json()] == ["Other", "Expensive"]
+
+
+@pytest.mark.anyio
+async def test_get_products_price_range_paginated(
+    async_client: AsyncClient, logged_in_admin_token: str
+):
+    for i, price in enumerate([30.0, 10.0, 20.0, 10.0, 99.0]):
+        await create_product(
+            {"name": f"Product {i}", "sku": f"sku-{i}", "price": price, "brand": "B"},
+            async_client,
+            logged_in_admin_token,
+        )
+
+    names = []
+    params = {"min_price": 10, "max_price": 50, "limit": 2}
+    while True:
+        response = await async_client.get("/products", params=params)
+        names += [p["name"] for p in response.json()]
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["after"] = response.headers["X-Next-Cursor"]
+
+    assert names == ["Product 1", "Product 3", "Product 2", "Product 0"]
+
+
+@pytest.mark.anyio
+@pytest.mark.skipif(engine.dialect.name != "sqlite", reason="SQLite query plans")
+@pytest.mark.parametrize(
+    "filters",
+    [
+        {"min_price": 10.0, "max_price": 50.0, "after": encode_cursor([10.0, 3])},
+        {"brand": "B", "max_price": 50.0},
+        {"brand": "B", "after": encode_cursor(3)},
+    ],
+)
+async def test_products_page_query_reads_in_index_order(filters: dict):
+    plan = await SlowQueryLog(threshold_ms=0, size=1).explain(
+        database,
+        "sqlite",
+        products_page_query(100, **filters),
+        None,
+    )
+
+    assert any("USING INDEX" in line or "PRIMARY KEY" in line for line in plan)
+    assert not any("TEMP B-TREE" in line for line in plan)
+
+
+@pytest.mark.anyio
+async def test_get_products_invalid_cursor(async_client: AsyncClient):
+    response = await async_client.get("/products", params={"after": "not-a-cursor"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+@pytest.fixture()
+def settled_changes(monkeypatch):
+    monkeypatch.setattr(config, "PRODUCT_CHANGES_SETTLE_SECONDS", 0)
+
+
+@pytest.mark.anyio
+async def test_get_product_changes(
+    async_client: AsyncClient, logged_in_admin_token: str, settled_changes
+):
+    headers = {"Authorization": f"Bearer {logged_in_admin_token}"}
+    response = await async_client.get("/products/changes")
+    assert response.json()["changes"] == []
+    cursor = response.json()["cursor"]
+
+    first = await create_product(
+        {"name": "First", "sku": "sku-1", "price": 1.0, "brand": "Luuna"},
+        async_client,
+        logged_in_admin_token,
+    )
+    second = await create_product(
+        {"name": "Second", "sku": "sku-2", "price": 2.0, "brand": "Luuna"},
+        async_client,
+        logged_in_admin_token,
+    )
+    for price in (3.0, 4.0):
+        await async_client.patch(
+            f"/products/{first['id']}", json={"price": price}, headers=headers
+        )
+    await async_client.delete(f"/products/{second['id']}", headers=headers)
+
+    response = await async_client.get("/products/changes", params={"since": cursor})
+    assert response.status_code == 200
+    assert response.json()["changes"] == [
+        {
+            "product_id": first["id"],
+            "action": "upsert",
+            "product": {**first, "price": 4.0},
+        },
+        {"product_id": second["id"], "action": "delete", "product": None},
+    ]
+    assert response.json()["has_more"] is False
+
+    cursor = response.json()["cursor"]
+    response = await async_client.get("/products/changes", params={"since": cursor})
+    assert response.json() == {"changes": [], "cursor": cursor, "has_more": False}
+
+
+@pytest.mark.anyio
+async def test_get_product_changes_paginated(
+    async_client: AsyncClient, logged_in_admin_token: str, settled_changes
+):
+    cursor = (await async_client.get("/products/changes")).json()["cursor"]
+    for i in range(3):
+        await create_product(
+            {"name": f"Product {i}", "sku": f"sku-{i}", "price": 1.0, "brand": "B"},
+            async_client,
+            logged_in_admin_token,
+        )
+
+    params = {"since": cursor, "limit": 2}
+    response = await async_client.get("/products/changes", params=params)
+    assert [c["product"]["sku"] for c in response.json()["changes"]] == [
+        "sku-0",
+        "sku-1",
+    ]
+    assert response.json()["has_more"] is True
+
+    params["since"] = response.json()["cursor"]
+    response = await async_client.get("/products/changes", params=params)
+    assert [c["product"]["sku"] for c in response.json()["changes"]] == ["sku-2"]
+    assert response.json()["has_more"] is False
+
+
+@pytest.mark.anyio
+async def test_get_product_changes_waits_for_recent_entries(
+    async_client: AsyncClient, created_product: dict
+):
+    response = await async_client.get("/products/changes")
+    cursor = response.json()["cursor"]
+
+    response = await async_client.get("/products/changes", params={"since": cursor})
+    assert response.json() == {"changes": [], "cursor": cursor, "has_more": False}
+
+
+@pytest.mark.anyio
+async def test_get_product_changes_invalid_cursor(async_client: AsyncClient):
+    response = await async_client.get("/products/changes", params={"since": "nope"})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_export_products_ndjson(async_client: AsyncClient, created_product: dict):
+    response = await async_client.get("/products/export")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = response.text.splitlines()
+    assert [json.loads(line) for line in lines] == [created_product]
+
+
+@pytest.mark.anyio
+async def test_export_products_paged(
+    async_client: AsyncClient, logged_in_admin_token: str, monkeypatch
+):
+    monkeypatch.setattr(catalog_export, "PAGE_SIZE", 2)
+    for i in range(4):
+        await create_product(
+            {"name": f"Product {i}", "sku": f"sku-{i}", "price": 10.0, "brand": "B"},
+            async_client,
+            logged_in_admin_token,
+        )
+
+    response = await async_client.get("/products/export")
+
+    lines = response.text.splitlines()
+    assert [json.loads(line)["sku"] for line in lines] == [
+        "sku-0",
+        "sku-1",
+        "sku-2",
+        "sku-3",
+    ]
+
+
+@pytest.mark.anyio
+async def test_export_products_csv(async_client: AsyncClient, created_product: dict):
+    response = await async_client.get("/products/export", params={"format": "csv"})
+
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 1
+    assert rows[0]["sku"] == created_product["sku"]
+    assert float(rows[0]["price"]) == created_product["price"]
+
+
+@pytest.mark.anyio
+async def test_export_products_gzip(async_client: AsyncClient, created_product: dict):
+    response = await async_client.get("/products/export", params={"gzip": True})
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert json.loads(response.text) == created_product
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("encoding", ["br", "gzip", "identity"])
+async def test_get_catalog_snapshot(
+    async_client: AsyncClient, created_product: dict, encoding: str
+):
+    response = await async_client.get(
+        "/products/snapshot", headers={"Accept-Encoding": encoding}
+    )
+
+    assert response.status_code == 200
+    assert response.headers.get("content-encoding", "identity") == encoding
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.json() == [created_product]
+
+
+@pytest.mark.anyio
+async def test_get_catalog_snapshot_patched_by_writes(
+    async_client: AsyncClient, logged_in_admin_token: str, created_product: dict
+):
+    headers = {"Authorization": f"Bearer {logged_in_admin_token}"}
+    assert (await async_client.get("/products/snapshot")).json() == [created_product]
+    loads = catalog_snapshot.loads
+
+    other = await create_product(
+        {"name": "Other", "sku": "sku-2", "price": 1.0, "brand": "Luuna"},
+        async_client,
+        logged_in_admin_token,
+    )
+    url = f"/products/{created_product['id']}"
+    updated = (
+        await async_client.patch(url, json={"price": 5.0}, headers=headers)
+    ).json()
+    assert (await async_client.get("/products/snapshot")).json() == [updated, other]
+
+    await async_client.delete(url, headers=headers)
+    assert (await async_client.get("/products/snapshot")).json() == [other]
+    assert catalog_snapshot.loads == loads
+
+
+@pytest.mark.anyio
+async def test_get_catalog_snapshot_not_modified(
+    async_client: AsyncClient, logged_in_admin_token: str, created_product: dict
+):
+    headers = {"Accept-Encoding": "identity"}
+    response = await async_client.get("/products/snapshot", headers=headers)
+    etag = response.headers["ETag"]
+
+    headers["If-None-Match"] = etag
+    response = await async_client.get("/products/snapshot", headers=headers)
+    assert response.status_code == 304
+
+    headers["Accept-Encoding"] = "br"
+    response = await async_client.get("/products/snapshot", headers=headers)
+    assert response.status_code == 200
+
+    await create_product(
+        {"name": "Other", "sku": "sku-2", "price": 1.0, "brand": "Luuna"},
+        async_client,
+        logged_in_admin_token,
+    )
+    headers["Accept-Encoding"] = "identity"
+    response = await async_client.get("/products/snapshot", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+
 @pytest.mark.anyio
 async def test_get_product(async_client: AsyncClient, created_product: dict):
     response = await async_client.get(f"/products/{created_product['id']}")
@@ -183,6 +507,28 @@ async def test_patch_product(
     assert response.json()["brand"] == created_product["brand"]
 
 
+@pytest.mark.anyio
+async def test_patch_product_taken_sku(
+    async_client: AsyncClient, logged_in_admin_token: str, created_product: dict
+):
+    other_product = await create_product(
+        {"name": "Other", "sku": "OTHER-1", "price": 1.0, "brand": "Mappa"},
+        async_client,
+        logged_in_admin_token,
+    )
+
+    response = await async_client.patch(
+        f"/products/{other_product['id']}",
+        json={"sku": created_product["sku"]},
+        headers={"Authorization": f"Bearer {logged_in_admin_token}"},
+    )
+
+    assert response.status_code == 409
+    assert response.json()["detail"] == "SKU already exist"
+    response = await async_client.get(f"/products/{other_product['id']}")
+    assert response.json()["sku"] == "OTHER-1"
+
+
 @pytest.mark.anyio
 async def test_non_admin_patch_product(
     async_client: AsyncClient, logged_in_token: str, created_product: dict
@@ -214,6 +560,23 @@ async def test_delete_product(
     assert response.json()["detail"] == "Product deleted sucessfully"
 
 
+@pytest.mark.anyio
+async def test_delete_product_audited(
+    async_client: AsyncClient, logged_in_admin_token: str, created_product: dict
+):
+    await async_client.delete(
+        f"/products/{created_product['id']}",
+        headers={"Authorization": f"Bearer {logged_in_admin_token}"},
+    )
+
+    entries = await database.fetch_all(
+        audit_log_table.select().order_by(audit_log_table.c.id)
+    )
+    assert [entry["action"] for entry in entries] == ["ADDED", "DELETED"]
+    assert json.loads(entries[1]["previous_data"])["id"] == created_product["id"]
+    assert entries[1]["new_data"] is None
+
+
 @pytest.mark.anyio
 async def test_non_admin_delete_product(
     async_client: AsyncClient, logged_in_token: str, created_product: dict
@@ -225,3 +588,355 @@ async def test_non_admin_delete_product(
 
     assert response.status_code == 401
     assert response.json()["detail"] == "Only admin can access this"
+
+
+@pytest.mark.anyio
+async def test_get_product_after_update(
+    async_client: AsyncClient, logged_in_admin_token: str, created_product: dict
+):
+    await async_client.get(f"/products/{created_product['id']}")
+    await async_client.patch(
+        f"/products/{created_product['id']}",
+        json={"price": 10.5},
+        headers={"Authorization": f"Bearer {logged_in_admin_token}"},
+    )
+
+    response = await async_client.get(f"/products/{created_product['id']}")
+
+    assert response.json()["price"] == 10.5
+
+
+@pytest.mark.anyio
+async def test_get_product_after_delete(
+    async_client: AsyncClient, logged_in_admin_token: str, created_product: dict
+):
+    await async_client.get(f"/products/{created_product['id']}")
+    await async_client.delete(
+        f"/products/{created_product['id']}",
+        headers={"Authorization": f"Bearer {logged_in_admin_token}"},
+    )
+
+    response = await async_client.get(f"/products/{created_product['id']}")
+
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_get_products_not_modified(
+    async_client: AsyncClient, logged_in_admin_token: str, created_product: dict
+):
+    response = await async_client.get("/products")
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"]
+
+    response = await async_client.get("/products", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = await async_client.get(
+        "/products", params={"limit": 1}, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+
+    await create_product(
+        {"name": "Other", "sku": "sku-2", "price": 1.0, "brand": "Luuna"},
+        async_client,
+        logged_in_admin_token,
+    )
+    response = await async_client.get("/products", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+
+@pytest.mark.anyio
+async def test_get_product_not_modified(
+    async_client: AsyncClient, logged_in_admin_token: str, created_product: dict
+):
+    url = f"/products/{created_product['id']}"
+    etag = (await async_client.get(url)).headers["ETag"]
+
+    response = await async_client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    await async_client.patch(
+        url,
+        json={"price": 10.5},
+        headers={"Authorization": f"Bearer {logged_in_admin_token}"},
+    )
+    response = await async_client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+@pytest.mark.anyio
+async def test_written_product_has_model_types(
+    async_client: AsyncClient, logged_in_admin_token: str
+):
+    headers = {"Authorization": f"Bearer {logged_in_admin_token}"}
+    created = await create_product(
+        {"name": "Lamp", "sku": "sku-1", "price": 1, "brand": "Luuna"},
+        async_client,
+        logged_in_admin_token,
+    )
+    url = f"/products/{created['id']}"
+    updated = (await async_client.patch(url, json={"price": 2}, headers=headers)).json()
+
+    # Cached and patched into the snapshot as returned
+    for product in [
+        created,
+        updated,
+        (await async_client.get(url)).json(),
+        (await async_client.get("/products/snapshot")).json()[0],
+    ]:
+        assert isinstance(product["price"], float)
+
+
+@pytest.mark.anyio
+async def test_get_product_written_by_another_worker(
+    async_client: AsyncClient, created_product: dict
+):
+    url = f"/products/{created_product['id']}"
+    etag = (await async_client.get(url)).headers["ETag"]
+
+    # Written without going through this worker's cache
+    await database.execute(
+        products_table.update()
+        .where(products_table.c.id == created_product["id"])
+        .values(price=5.0)
+    )
+    await bump_product_version(created_product["id"])
+
+    response = await async_client.get(url)
+    assert response.json()["price"] == 5.0
+    assert response.headers["ETag"] != etag
+
+
+@pytest.mark.anyio
+async def test_get_product_if_none_match_any(
+    async_client: AsyncClient, created_product: dict
+):
+    headers = {"If-None-Match": "*"}
+    response = await async_client.get(
+        f"/products/{created_product['id']}", headers=headers
+    )
+    assert response.status_code == 304
+
+    response = await async_client.get("/products/1234", headers=headers)
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_bulk_upsert_products(
+    async_client: AsyncClient, logged_in_admin_token: str, created_product: dict
+):
+    products = [
+        {"name": "Updated", "sku": created_product["sku"], "price": 1.0, "brand": "B"},
+        {"name": "New", "sku": "sku-new", "price": 2.0, "brand": "B"},
+        {"name": "Repeated", "sku": "sku-new", "price": 3.0, "brand": "B"},
+    ]
+
+    response = await async_client.post(
+        "/products/bulk",
+        json=products,
+        headers={"Authorization": f"Bearer {logged_in_admin_token}"},
+    )
+
+    assert response.status_code == 200
+    results = response.json()
+    assert [result["status"] for result in results] == [
+        "updated",
+        "created",
+        "conflict",
+    ]
+    assert results[0]["id"] == created_product["id"]
+
+    response = await async_client.get("/products")
+    assert [(p["name"], p["price"]) for p in response.json()] == [
+        ("Updated", 1.0),
+        ("New", 2.0),
+    ]
+
+
+@pytest.mark.anyio
+async def test_bulk_upsert_products_too_many(
+    async_client: AsyncClient, logged_in_admin_token: str
+):
+    product = {"name": "New", "sku": "sku", "price": 2.0, "brand": "B"}
+
+    response = await async_client.post(
+        "/products/bulk",
+        json=[product] * 1001,
+        headers={"Authorization": f"Bearer {logged_in_admin_token}"},
+    )
+
+    assert response.status_code == 413
+
+
+@pytest.mark.anyio
+async def test_non_admin_bulk_upsert_products(
+    async_client: AsyncClient, logged_in_token: str
+):
+    response = await async_client.post(
+        "/products/bulk",
+        json=[{"name": "New", "sku": "sku", "price": 2.0, "brand": "B"}],
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+
+    assert response.status_code == 401
+
+
+@pytest.mark.anyio
+async def test_import_products_csv(
+    async_client: AsyncClient, logged_in_admin_token: str
+):
+    headers = {"Authorization": f"Bearer {logged_in_admin_token}"}
+    response = await async_client.post("/products/imports", headers=headers)
+    assert response.status_code == 201
+    import_id = response.json()["id"]
+
+    body = (
+        "name,sku,price,brand\n"
+        "First,sku-1,10.5,Luuna\n"
+        '"Second, with comma",sku-2,20,Luuna\n'
+        "Broken,sku-3,not-a-price,Luuna\n"
+    )
+    response = await async_client.put(
+        f"/products/imports/{import_id}",
+        params={"format": "csv", "chunk_size": 2},
+        content=body,
+        headers=headers,
+    )
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "completed"
+    assert response.json()["rows_committed"] == 3
+    assert response.json()["created"] == 2
+    assert response.json()["invalid"] == 1
+    assert response.json()["last_error"].startswith("row 3: price")
+
+    response = await async_client.get("/products")
+    assert [p["name"] for p in response.json()] == ["First", "Second, with comma"]
+
+    response = await async_client.put(
+        f"/products/imports/{import_id}", content=body, headers=headers
+    )
+    assert response.status_code == 409
+
+
+@pytest.mark.anyio
+async def test_import_products_already_running(
+    async_client: AsyncClient, logged_in_admin_token: str
+):
+    headers = {"Authorization": f"Bearer {logged_in_admin_token}"}
+    import_id = (await async_client.post("/products/imports", headers=headers)).json()[
+        "id"
+    ]
+    # Like an upload still in progress when the client retries
+    assert await claim_import(import_id)
+
+    response = await async_client.put(
+        f"/products/imports/{import_id}",
+        content="name,sku,price,brand\nFirst,sku-1,10.5,Luuna\n",
+        headers=headers,
+    )
+
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Import already running"
+    assert (await async_client.get("/products")).json() == []
+
+
+@pytest.mark.anyio
+async def test_import_products_ndjson(
+    async_client: AsyncClient, logged_in_admin_token: str, created_product: dict
+):
+    headers = {"Authorization": f"Bearer {logged_in_admin_token}"}
+    import_id = (await async_client.post("/products/imports", headers=headers)).json()[
+        "id"
+    ]
+    body = "\n".join(
+        json.dumps(product)
+        for product in [
+            {**created_product, "name": "Renamed"},
+            {"name": "New", "sku": "sku-2", "price": 1, "brand": "Mappa"},
+        ]
+    )
+
+    response = await async_client.put(
+        f"/products/imports/{import_id}",
+        params={"format": "ndjson"},
+        content=body,
+        headers=headers,
+    )
+
+    assert response.json()["updated"] == 1
+    assert response.json()["created"] == 1
+
+    response = await async_client.get(f"/products/imports/{import_id}", headers=headers)
+    assert response.json()["status"] == "completed"
+
+
+@pytest.mark.anyio
+async def test_search_products(async_client: AsyncClient, logged_in_admin_token: str):
+    products = [
+        {"name": "Memory foam pillow", "sku": "sku-1", "price": 1.0, "brand": "Luuna"},
+        {"name": "Bed frame", "sku": "sku-2", "price": 2.0, "brand": "Mappa"},
+        {"name": "Luxury sheets", "sku": "sku-3", "price": 3.0, "brand": "Nooz"},
+    ]
+    for product in products:
+        await create_product(product, async_client, logged_in_admin_token)
+
+    response = await async_client.get("/products/search", params={"q": "lu"})
+    assert response.status_code == 200
+    assert [p["sku"] for p in response.json()] == ["sku-3", "sku-1"]
+
+    response = await async_client.get("/products/search", params={"q": "memo pil"})
+    assert [p["sku"] for p in response.json()] == ["sku-1"]
+
+    response = await async_client.get("/products/search", params={"q": '"*'})
+    assert response.json() == []
+
+
+@pytest.mark.anyio
+async def test_search_products_paginated(
+    async_client: AsyncClient, logged_in_admin_token: str, created_product: dict
+):
+    ids = {created_product["id"]}
+    for i in range(2):
+        product = await create_product(
+            {"name": f"Pillow {i}", "sku": f"sku-{i}", "price": 1.0, "brand": "Luuna"},
+            async_client,
+            logged_in_admin_token,
+        )
+        ids.add(product["id"])
+
+    response = await async_client.get(
+        "/products/search", params={"q": "luuna", "limit": 2}
+    )
+    first_page = [p["id"] for p in response.json()]
+    response = await async_client.get(
+        "/products/search",
+        params={"q": "luuna", "limit": 2, "after": response.headers["X-Next-Cursor"]},
+    )
+    second_page = [p["id"] for p in response.json()]
+
+    assert len(first_page) == 2
+    assert len(second_page) == 1
+    assert set(first_page + second_page) == ids
+    assert "X-Next-Cursor" not in response.headers
+
+
+@pytest.mark.anyio
+async def test_search_products_after_update(
+    async_client: AsyncClient, logged_in_admin_token: str, created_product: dict
+):
+    await async_client.patch(
+        f"/products/{created_product['id']}",
+        json={"name": "Renamed"},
+        headers={"Authorization": f"Bearer {logged_in_admin_token}"},
+    )
+
+    response = await async_client.get("/products/search", params={"q": "new"})
+    assert response.json() == []
+    response = await async_client.get("/products/search", params={"q": "renamed"})
+    assert [p["id"] for p in response.json()] == [created_product["id"]]
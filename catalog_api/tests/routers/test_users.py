@@ -1,6 +1,7 @@
 import pytest
 from httpx import AsyncClient
 
+from catalog_api import security
 from catalog_api.main import app
 from catalog_api.security import get_current_user, get_user, is_user_admin
 
@@ -120,3 +121,43 @@ async def test_delete_user(
 @pytest.mark.anyio
 async def test_admin_user(admin_registered_user: dict):
     assert admin_registered_user["is_admin"] is True
+
+
+@pytest.mark.anyio
+async def test_deleted_user_token_is_rejected(
+    async_client: AsyncClient,
+    admin_registered_user: dict,
+    logged_in_admin_token: str,
+    admin_credentials: dict,
+):
+    headers = {"Authorization": f"Bearer {logged_in_admin_token}"}
+    response = await async_client.get("/admin/cache-stats", headers=headers)
+    assert response.status_code == 200
+
+    admin_token = (await async_client.post("/token", json=admin_credentials)).json()[
+        "access_token"
+    ]
+    await async_client.delete(
+        f"/user/{admin_registered_user['id']}",
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+
+    response = await async_client.get("/admin/cache-stats", headers=headers)
+    assert response.status_code == 401
+
+
+@pytest.mark.anyio
+async def test_login_user_hashing_saturated(
+    async_client: AsyncClient, registered_user: dict, monkeypatch
+):
+    monkeypatch.setattr(security.password_executor, "capacity", 0)
+
+    response = await async_client.post(
+        "/token",
+        json={
+            "email": registered_user["email"],
+            "password": registered_user["password"],
+        },
+    )
+
+    assert response.status_code == 503
@@ -67,3 +67,38 @@ async def test_raise_not_admin_exception(registered_user: dict):
 async def test_get_current_user_invalid_token():
     with pytest.raises(security.HTTPException):
         await security.get_current_user("invalid token")
+
+
+@pytest.mark.anyio
+async def test_get_principal_is_cached(registered_user: dict):
+    hits = security.principal_cache.hits
+    first = await security.get_principal(registered_user["email"])
+    second = await security.get_principal(registered_user["email"])
+
+    assert first.email == second.email == registered_user["email"]
+    assert security.principal_cache.hits == hits + 1
+
+
+@pytest.mark.anyio
+async def test_invalidate_principal(registered_user: dict):
+    await security.get_principal(registered_user["email"])
+
+    security.invalidate_principal(registered_user["id"])
+
+    assert registered_user["email"] not in security.principal_cache
+
+
+@pytest.mark.anyio
+async def test_get_principal_racing_invalidation(registered_user: dict, monkeypatch):
+    get_user = security.get_user
+
+    async def get_user_then_demote(email: str):
+        user = await get_user(email)
+        # The user is changed while the lookup is in flight
+        security.invalidate_principal(user.id)
+        return user
+
+    monkeypatch.setattr(security, "get_user", get_user_then_demote)
+    await security.get_principal(registered_user["email"])
+
+    assert registered_user["email"] not in security.principal_cache
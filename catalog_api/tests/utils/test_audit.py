@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from catalog_api.database import audit_log_table, database, products_table
+from catalog_api.utils.audit import audited_transaction
+
+
+async def audit_rows() -> list:
+    return await database.fetch_all(
+        audit_log_table.select().order_by(audit_log_table.c.id)
+    )
+
+
+@pytest.mark.anyio
+async def test_audited_transaction_writes_entries_with_the_change():
+    async with audited_transaction() as audit:
+        product = {"name": "Chair", "sku": "CH-1", "price": 10.0, "brand": "Acme"}
+        product_id = await database.execute(products_table.insert().values(product))
+        audit.add(product_id, "ADDED", 1, new_data={**product, "id": product_id})
+        audit.add(product_id, "DELETED", 1, previous_data={"id": product_id})
+
+    rows = await audit_rows()
+    assert [row["action"] for row in rows] == ["ADDED", "DELETED"]
+    assert json.loads(rows[0]["new_data"])["sku"] == "CH-1"
+    assert rows[0]["previous_data"] is None
+    assert rows[0]["timestamp"] == rows[1]["timestamp"]
+
+
+@pytest.mark.anyio
+async def test_audited_transaction_rolls_back_change_and_entries():
+    with pytest.raises(RuntimeError):
+        async with audited_transaction() as audit:
+            product = {"name": "Chair", "sku": "CH-1", "price": 10.0, "brand": "Acme"}
+            product_id = await database.execute(products_table.insert().values(product))
+            audit.add(product_id, "ADDED", 1, new_data=product)
+            raise RuntimeError("failed after the insert")
+
+    assert await audit_rows() == []
+    assert await database.fetch_all(products_table.select()) == []
@@ -0,0 +1,30 @@
+import threading
+
+import anyio
+import pytest
+
+from catalog_api.utils.bounded_executor import BoundedExecutor, ExecutorSaturatedError
+
+
+@pytest.mark.anyio
+async def test_run():
+    executor = BoundedExecutor(max_workers=1, max_queued=0, thread_name_prefix="test")
+
+    assert await executor.run(sum, [1, 2]) == 3
+    assert executor.pending == 0
+
+
+@pytest.mark.anyio
+async def test_run_rejects_when_saturated():
+    executor = BoundedExecutor(max_workers=1, max_queued=0, thread_name_prefix="test")
+    release = threading.Event()
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(executor.run, release.wait)
+        await anyio.sleep(0.01)
+
+        with pytest.raises(ExecutorSaturatedError):
+            await executor.run(sum, [1, 2])
+        release.set()
+
+    assert executor.rejected == 1
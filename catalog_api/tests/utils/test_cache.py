@@ -0,0 +1,57 @@
+from catalog_api.utils import cache
+from catalog_api.utils.cache import LRUCache
+
+
+def test_get_and_set():
+    lru = LRUCache(max_size=2)
+    lru.set("a", 1)
+
+    assert lru.get("a") == 1
+    assert lru.get("b") is None
+    assert lru.stats()["hits"] == 1
+    assert lru.stats()["misses"] == 1
+
+
+def test_least_recently_used_is_evicted():
+    lru = LRUCache(max_size=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+
+    assert "a" in lru
+    assert "b" not in lru
+    assert lru.stats()["evictions"] == 1
+
+
+def test_expired_entries_are_misses(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    lru = LRUCache(max_size=2, ttl=10)
+    lru.set("a", 1)
+
+    now[0] += 11
+
+    assert lru.get("a") is None
+    assert len(lru) == 0
+
+
+def test_invalid_entries_are_misses():
+    lru = LRUCache(max_size=2)
+    lru.set("a", 1)
+
+    assert lru.get("a", valid=lambda value: value == 2) is None
+    assert lru.get("a", valid=lambda value: value == 1) == 1
+    assert lru.stats()["hits"] == 1
+    assert lru.stats()["misses"] == 1
+
+
+def test_discard_where():
+    lru = LRUCache(max_size=3)
+    lru.set("a", 1)
+    lru.set("b", 2)
+
+    lru.discard_where(lambda value: value == 1)
+
+    assert "a" not in lru
+    assert "b" in lru
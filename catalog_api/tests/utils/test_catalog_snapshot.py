@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from catalog_api.database import database, products_table
+from catalog_api.utils.catalog_snapshot import CatalogSnapshot, choose_encoding
+from catalog_api.utils.versions import bump_product_version
+
+
+@pytest.mark.parametrize(
+    "accept_encoding,encoding",
+    [
+        (None, "identity"),
+        ("gzip, deflate, br", "br"),
+        ("gzip, br;q=0.5", "gzip"),
+        ("br;q=0, deflate", "identity"),
+        ("*", "br"),
+        ("identity;q=0, *;q=0.1", "br"),
+    ],
+)
+def test_choose_encoding(accept_encoding, encoding):
+    assert choose_encoding(accept_encoding) == encoding
+
+
+def product(sku: str) -> dict:
+    return {"name": "Lamp", "sku": sku, "price": 10.0, "brand": "Acme"}
+
+
+async def create(sku: str) -> tuple[int, dict]:
+    record = await database.fetch_one(
+        products_table.insert().values(product(sku)).returning(*products_table.c)
+    )
+    return (await bump_product_version(record["id"])).catalog, dict(record)
+
+
+@pytest.mark.anyio
+async def test_snapshot_reloads_after_missed_write():
+    snapshot = CatalogSnapshot(poll_interval=1)
+    await create("L-1")
+    await snapshot.get()
+
+    # Written without patching the snapshot, like another worker would
+    await create("L-2")
+    version, third = await create("L-3")
+    snapshot.store(version, [third])
+    assert snapshot.version is None
+
+    _, body = await snapshot.get()
+    assert [p["sku"] for p in json.loads(body)] == ["L-1", "L-2", "L-3"]
+    assert snapshot.loads == 2
@@ -0,0 +1,93 @@
+import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from catalog_api.config import config
+from catalog_api.utils import daily_changes_report
+from catalog_api.utils.daily_changes_report import mark_reported, return_text_for_mail
+from catalog_api.utils.db_utils import add_audit_entries, add_audit_entry
+
+
+def audit_entry(product_id: int, action: str) -> dict:
+    return {
+        "product_id": product_id,
+        "action": action,
+        "previous_data": None if action == "ADDED" else '{"name": "before"}',
+        "new_data": None if action == "DELETED" else '{"name": "after"}',
+        "changed_by": 1,
+    }
+
+
+@pytest.fixture(autouse=True)
+def settled_changes(monkeypatch):
+    monkeypatch.setattr(config, "PRODUCT_CHANGES_SETTLE_SECONDS", 0)
+
+
+@pytest.mark.anyio
+async def test_report_contains_todays_changes():
+    await add_audit_entries(
+        [audit_entry(1, "ADDED"), audit_entry(1, "UPDATED"), audit_entry(2, "DELETED")]
+    )
+
+    body, last_audit_id = await return_text_for_mail()
+
+    today = datetime.datetime.utcnow().strftime("%Y-%m-%d")
+    assert f"product changes made from {today} " in body
+    assert "**Total Changes:** 3" in body
+    assert "**New Products Added:**\n- Product ID: 1" in body
+    assert "**Products Updated:**\n- Product ID: 1" in body
+    assert "**Products Deleted:**\n- Product ID: 2" in body
+    assert last_audit_id == await daily_changes_report.database.fetch_val(
+        select(func.max(daily_changes_report.audit_log_table.c.id))
+    )
+
+
+@pytest.mark.anyio
+async def test_report_skips_reported_changes(monkeypatch):
+    monkeypatch.setattr(daily_changes_report, "FETCH_SIZE", 2)
+    await add_audit_entries([audit_entry(i, "ADDED") for i in range(5)])
+    _, last_audit_id = await return_text_for_mail()
+    await mark_reported(last_audit_id)
+
+    assert await return_text_for_mail() is None
+
+    await add_audit_entry(audit_entry(9, "UPDATED"))
+    query = daily_changes_report.audit_log_table.update().values(
+        timestamp=datetime.datetime(2026, 1, 2, 9, 30)
+    )
+    await daily_changes_report.database.execute(
+        query.where(daily_changes_report.audit_log_table.c.product_id == 9)
+    )
+    body, _ = await return_text_for_mail()
+    assert "made from 2026-01-02 09:30 to 2026-01-02 09:30 UTC" in body
+    assert "**Total Changes:** 1" in body
+    assert "Product ID: 9" in body
+
+
+@pytest.mark.anyio
+async def test_report_ignores_changes_before_today():
+    entry = audit_entry(1, "ADDED")
+    await add_audit_entry(entry)
+    query = daily_changes_report.audit_log_table.update().values(
+        timestamp=datetime.datetime.utcnow() - datetime.timedelta(days=2)
+    )
+    await daily_changes_report.database.execute(query)
+
+    assert await return_text_for_mail() is None
+
+
+@pytest.mark.anyio
+async def test_report_leaves_unsettled_changes_for_later(monkeypatch):
+    await add_audit_entry(audit_entry(1, "ADDED"))
+    _, last_audit_id = await return_text_for_mail()
+    await mark_reported(last_audit_id)
+
+    monkeypatch.setattr(config, "PRODUCT_CHANGES_SETTLE_SECONDS", 60)
+    await add_audit_entry(audit_entry(2, "ADDED"))
+    assert await return_text_for_mail() is None
+
+    monkeypatch.setattr(config, "PRODUCT_CHANGES_SETTLE_SECONDS", 0)
+    body, _ = await return_text_for_mail()
+    assert "**Total Changes:** 1" in body
+    assert "Product ID: 2" in body
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from catalog_api.utils.leader_lease import LeaderLease
+
+
+@pytest.mark.anyio
+async def test_only_one_worker_holds_the_lease():
+    first = LeaderLease("jobs", ttl=30, holder="first")
+    second = LeaderLease("jobs", ttl=30, holder="second")
+
+    assert await first.renew()
+    assert not await second.renew()
+    assert await first.renew()
+
+    assert first.stats()["acquired"] == 1
+    assert first.stats()["renewed"] == 1
+    assert not second.is_leader
+
+
+@pytest.mark.anyio
+async def test_expired_lease_is_handed_off():
+    first = LeaderLease("jobs", ttl=0.05, holder="first")
+    second = LeaderLease("jobs", ttl=30, holder="second")
+    await first.renew()
+    await asyncio.sleep(0.1)
+
+    assert await second.renew()
+    assert not await first.renew()
+    assert first.stats()["lost"] == 1
+
+
+@pytest.mark.anyio
+async def test_released_lease_is_free():
+    first = LeaderLease("jobs", ttl=30, holder="first")
+    second = LeaderLease("jobs", ttl=30, holder="second")
+    await first.renew()
+    await first.release()
+
+    assert await second.renew()
+    assert first.stats()["released"] == 1
+
+
+@pytest.mark.anyio
+async def test_leader_only_jobs_run_on_the_leader():
+    runs = []
+
+    async def job(worker):
+        runs.append(worker)
+
+    first = LeaderLease("jobs", ttl=30, holder="first")
+    second = LeaderLease("jobs", ttl=30, holder="second")
+    await first.leader_only(job)("first")
+    await second.leader_only(job)("second")
+
+    assert runs == ["first"]
@@ -0,0 +1,58 @@
+import pytest
+
+from catalog_api.database import products_table
+from catalog_api.utils.metrics import (
+    Histogram,
+    query_duration,
+    statement_shape,
+    timed_query,
+)
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, ("/a",))
+    histogram.observe(0.5, ("/a",))
+    histogram.observe(5, ("/a",))
+
+    assert histogram.render()[2:] == [
+        'latency_seconds_bucket{route="/a",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a",le="1.0"} 2',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 3',
+        'latency_seconds_sum{route="/a"} 5.55',
+        'latency_seconds_count{route="/a"} 3',
+    ]
+
+
+def test_statement_shape_ignores_values():
+    first = products_table.select().where(products_table.c.id == 1)
+    second = products_table.select().where(products_table.c.id == 2)
+
+    assert statement_shape(first) == statement_shape(second)
+    assert statement_shape(first).endswith("WHERE products.id = :id_1")
+
+
+def test_statement_shape_collapses_rows_and_literals():
+    rows = [{"name": "Lamp", "sku": "L-1", "price": 1, "brand": "Acme"}]
+    two = products_table.insert().values(rows * 2)
+    many = products_table.insert().values(rows * 3)
+
+    assert statement_shape(two) == statement_shape(many)
+    assert statement_shape(many).endswith(":brand_m0), ...")
+    assert statement_shape("SELECT 1 FROM products WHERE sku = 'L-1'") == (
+        "SELECT ? FROM products WHERE sku = ?"
+    )
+
+
+@pytest.mark.anyio
+async def test_timed_query_records_statement():
+    async def fetch_val(query):
+        return 1
+
+    query = products_table.select().where(products_table.c.sku == "L-1")
+    timed = timed_query("fetch_val", fetch_val)
+
+    labels = ("fetch_val", statement_shape(query))
+    before = query_duration.count(labels)
+    assert await timed(query) == 1
+    assert query_duration.count(labels) == before + 1
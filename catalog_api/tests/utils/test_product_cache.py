@@ -0,0 +1,71 @@
+import datetime
+
+import pytest
+
+from catalog_api.database import database, products_table
+from catalog_api.utils.db_utils import add_product_anonymous_views
+from catalog_api.utils.product_cache import (
+    get_cached_product,
+    product_cache,
+    warm_up_product_cache,
+)
+
+
+async def insert_product(sku: str) -> int:
+    query = products_table.insert().values(
+        name="Product", sku=sku, price=1.0, brand="Luuna"
+    )
+    return await database.execute(query)
+
+
+@pytest.mark.anyio
+async def test_get_cached_product():
+    product_id = await insert_product("sku-1")
+
+    first = await get_cached_product(product_id, 0)
+    hits = product_cache.hits
+    second = await get_cached_product(product_id, 0)
+
+    assert first == second
+    assert first["sku"] == "sku-1"
+    assert product_cache.hits == hits + 1
+
+
+@pytest.mark.anyio
+async def test_get_cached_product_reads_newer_version():
+    product_id = await insert_product("sku-1")
+    await get_cached_product(product_id, 0)
+
+    await database.execute(
+        products_table.update()
+        .where(products_table.c.id == product_id)
+        .values(sku="sku-2")
+    )
+
+    assert (await get_cached_product(product_id, 0))["sku"] == "sku-1"
+    hits, misses = product_cache.hits, product_cache.misses
+    assert (await get_cached_product(product_id, 1))["sku"] == "sku-2"
+    assert (product_cache.hits, product_cache.misses) == (hits, misses + 1)
+    assert product_cache.get(product_id)[0] == 1
+
+
+@pytest.mark.anyio
+async def test_get_cached_product_not_found():
+    assert await get_cached_product(1234, 0) is None
+    assert 1234 not in product_cache
+
+
+@pytest.mark.anyio
+async def test_warm_up_product_cache():
+    cold_id = await insert_product("sku-1")
+    hot_id = await insert_product("sku-2")
+    now = datetime.datetime.utcnow()
+    await add_product_anonymous_views(
+        [{"product_id": hot_id, "view_date": now}] * 3
+        + [{"product_id": cold_id, "view_date": now}]
+    )
+
+    await warm_up_product_cache(1)
+
+    assert hot_id in product_cache
+    assert cold_id not in product_cache
@@ -0,0 +1,157 @@
+import datetime
+
+import pytest
+
+from catalog_api.config import config
+from catalog_api.database import database, product_imports_table, products_table
+from catalog_api.security import create_default_admin, get_user
+from catalog_api.utils import product_import
+from catalog_api.utils.catalog_export import CatalogFormat
+from catalog_api.utils.catalog_snapshot import catalog_snapshot
+from catalog_api.utils.product_cache import product_cache
+from catalog_api.utils.product_import import (
+    IMPORT_CLAIM_TIMEOUT,
+    InvalidRow,
+    claim_import,
+    create_import,
+    get_import,
+    import_products,
+    iter_csv_rows,
+    iter_lines,
+)
+
+CSV = b"name,sku,price,brand\n" + b"".join(
+    f"Product {i},sku-{i},1.5,Luuna\r\n".encode() for i in range(10)
+)
+
+
+async def stream(data: bytes, chunk_size: int = 7, fail_after: int = None):
+    for sent, start in enumerate(range(0, len(data), chunk_size)):
+        if fail_after is not None and sent == fail_after:
+            raise ConnectionError("client went away")
+        yield data[start : start + chunk_size]
+
+
+async def collect(iterator) -> list:
+    return [item async for item in iterator]
+
+
+@pytest.fixture()
+async def admin_id() -> int:
+    await create_default_admin()
+    return (await get_user(config.DB_ADMIN_EMAIL)).id
+
+
+@pytest.mark.anyio
+async def test_iter_csv_rows_quoted_newline():
+    data = b'name,sku\n"Multi\nline",sku-1\nbad,"row\n'
+    rows = await collect(iter_csv_rows(iter_lines(stream(data))))
+
+    assert rows[0] == {"name": "Multi\nline", "sku": "sku-1"}
+    assert isinstance(rows[1], InvalidRow)
+
+
+@pytest.mark.anyio
+async def test_iter_csv_rows_quote_inside_unquoted_field():
+    data = b'name,sku\n12" TV,sku-1\n"Say ""hi""\n",sku-2\nLamp,sku-3\n'
+    rows = await collect(iter_csv_rows(iter_lines(stream(data))))
+
+    assert rows == [
+        {"name": '12" TV', "sku": "sku-1"},
+        {"name": 'Say "hi"\n', "sku": "sku-2"},
+        {"name": "Lamp", "sku": "sku-3"},
+    ]
+
+
+@pytest.mark.anyio
+async def test_iter_csv_rows_caps_record_size(monkeypatch):
+    monkeypatch.setattr(product_import, "MAX_RECORD_SIZE", 20)
+    data = b'name,sku\n"Never closed\n' + b"x\n" * 20 + b'"Lamp",sku-3\n'
+    rows = await collect(iter_csv_rows(iter_lines(stream(data))))
+
+    assert "longer than 20 characters" in str(rows[0])
+    # The rest of the file is still read
+    assert rows[-1] == {"name": "Lamp", "sku": "sku-3"}
+
+
+@pytest.mark.anyio
+async def test_import_is_resumed_after_failure(admin_id: int):
+    product_import = await create_import(admin_id)
+
+    with pytest.raises(ConnectionError):
+        await import_products(
+            product_import.id,
+            stream(CSV, fail_after=20),
+            CatalogFormat.csv,
+            3,
+            admin_id,
+        )
+    failed = await get_import(product_import.id)
+    assert failed.status == "failed"
+    assert failed.rows_committed in (3, 6)
+
+    await import_products(
+        product_import.id, stream(CSV), CatalogFormat.csv, 3, admin_id
+    )
+
+    completed = await get_import(product_import.id)
+    assert completed.status == "completed"
+    assert completed.rows_committed == 10
+    assert completed.created == 10
+    assert completed.updated == 0
+    products = await database.fetch_all(products_table.select())
+    assert len(products) == 10
+
+
+@pytest.mark.anyio
+async def test_import_rejects_rows_that_are_not_utf8(admin_id: int):
+    product_import = await create_import(admin_id)
+    data = CSV.replace(b"Product 3", b"Product \xff\xfe")
+
+    await import_products(
+        product_import.id, stream(data), CatalogFormat.csv, 3, admin_id
+    )
+
+    completed = await get_import(product_import.id)
+    assert completed.status == "completed"
+    assert completed.rows_committed == 10
+    assert completed.created == 9
+    assert completed.invalid == 1
+    assert completed.last_error == "row 4: not valid UTF-8"
+
+
+@pytest.mark.anyio
+async def test_rolled_back_chunk_isnt_cached(admin_id: int, monkeypatch):
+    update_import = product_import.update_import
+
+    async def fail_checkpoint(import_id: int, **values):
+        if "rows_committed" in values:
+            raise RuntimeError("checkpoint failed")
+        await update_import(import_id, **values)
+
+    monkeypatch.setattr(product_import, "update_import", fail_checkpoint)
+    job = await create_import(admin_id)
+    await catalog_snapshot.get()
+
+    with pytest.raises(RuntimeError):
+        await import_products(job.id, stream(CSV), CatalogFormat.csv, 3, admin_id)
+
+    assert await database.fetch_all(products_table.select()) == []
+    assert len(product_cache) == 0
+    assert catalog_snapshot.stats()["products"] == 0
+
+
+@pytest.mark.anyio
+async def test_claim_import(admin_id: int):
+    job = await create_import(admin_id)
+
+    assert await claim_import(job.id)
+    assert not await claim_import(job.id)
+
+    # Left running by a worker that died
+    await database.execute(
+        product_imports_table.update().values(
+            updated_at=datetime.datetime.utcnow() - IMPORT_CLAIM_TIMEOUT
+        )
+    )
+    assert await claim_import(job.id)
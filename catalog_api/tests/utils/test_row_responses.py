@@ -0,0 +1,94 @@
+from typing import List
+
+import pytest
+from fastapi import APIRouter, FastAPI, Response, status
+from httpx import AsyncClient
+from sqlalchemy import select
+
+from catalog_api.database import database, products_table
+from catalog_api.models.products import Product, ProductBulkResult
+from catalog_api.utils.row_responses import RowEncoder, TrustedRowsRoute
+
+
+def product(sku: str) -> dict:
+    return {"name": "Lamp", "sku": sku, "price": 10.0, "brand": "Acme"}
+
+
+@pytest.mark.anyio
+async def test_row_encoder_reads_records_by_field():
+    await database.execute(products_table.insert().values([product("L-1")]))
+    # Columns in another order, plus one the model doesn't have
+    query = select(
+        (products_table.c.price * 2).label("score"), *reversed(products_table.c)
+    ).order_by(products_table.c.id)
+    records = await database.fetch_all(query)
+
+    assert RowEncoder(Product).encode(records) == [
+        {"id": records[0]["id"], **product("L-1")}
+    ]
+
+
+def test_row_encoder_fills_defaults_of_dicts():
+    encoder = RowEncoder(ProductBulkResult)
+
+    assert encoder.encode([{"sku": "L-1", "status": "created", "id": 1}]) == [
+        {"sku": "L-1", "status": "created", "id": 1, "detail": None}
+    ]
+    with pytest.raises(KeyError):
+        encoder.encode([{"sku": "L-1"}])
+
+
+@pytest.fixture()
+def rows_app() -> FastAPI:
+    router = APIRouter(route_class=TrustedRowsRoute)
+
+    @router.get("/rows", response_model=List[Product])
+    async def read_rows(response: Response):
+        response.headers["X-Next-Cursor"] = "abc"
+        return [{"id": 1, **product("L-1"), "password": "secret"}]
+
+    @router.post("/rows", response_model=Product, status_code=status.HTTP_201_CREATED)
+    async def create_row():
+        return {"id": 2, **product("L-2")}
+
+    @router.get("/rows/{row_id}", response_model=Product)
+    async def read_row(row_id: int):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED)
+
+    app = FastAPI()
+    app.include_router(router)
+    return app
+
+
+@pytest.mark.anyio
+async def test_trusted_rows_route_dumps_model_fields(rows_app):
+    async with AsyncClient(app=rows_app, base_url="http://test") as client:
+        response = await client.get("/rows")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["X-Next-Cursor"] == "abc"
+    assert response.json() == [{"id": 1, **product("L-1")}]
+
+
+@pytest.mark.anyio
+async def test_trusted_rows_route_keeps_status_and_responses(rows_app):
+    async with AsyncClient(app=rows_app, base_url="http://test") as client:
+        created = await client.post("/rows")
+        not_modified = await client.get("/rows/1")
+
+    assert created.status_code == 201
+    assert created.json() == {"id": 2, **product("L-2")}
+    assert not_modified.status_code == 304
+
+
+def test_trusted_rows_route_documents_response_model(rows_app):
+    operation = rows_app.openapi()["paths"]["/rows"]["get"]
+    schema = operation["responses"]["200"]["content"]["application/json"]["schema"]
+
+    assert schema == {
+        "type": "array",
+        "items": {"$ref": "#/components/schemas/Product"},
+        "title": "Response Read Rows Rows Get",
+    }
+    assert operation.get("parameters", []) == []
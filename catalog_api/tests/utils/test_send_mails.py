@@ -0,0 +1,124 @@
+import socket
+
+import pytest
+from aiosmtpd.controller import Controller
+from sqlalchemy import select
+
+from catalog_api.database import database, outbound_emails_table
+from catalog_api.utils.send_mails import MailSender, SMTPConnection, queue_email
+
+
+class Sink:
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        self.sessions.add(id(session))
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture()
+def smtp_sink():
+    sink = Sink()
+    controller = Controller(sink, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    yield sink, controller.port
+    controller.stop()
+
+
+def mail_sender(port: int, max_attempts: int = 3) -> MailSender:
+    return MailSender(
+        SMTPConnection("127.0.0.1", port, timeout=2),
+        batch_size=10,
+        poll_interval=1,
+        retry_base_delay=60,
+        retry_max_delay=600,
+        max_attempts=max_attempts,
+    )
+
+
+async def queued_emails() -> list:
+    query = select(outbound_emails_table).order_by(outbound_emails_table.c.id)
+    return await database.fetch_all(query)
+
+
+@pytest.mark.anyio
+async def test_queued_emails_are_sent_on_one_connection(smtp_sink):
+    sink, port = smtp_sink
+    sender = mail_sender(port)
+    await queue_email(["admin@example.com"], "Report", "first")
+    await queue_email(["admin@example.com", "other@example.com"], "Report", "second")
+
+    assert await sender.deliver_due() == 2
+    sender.connection.close()
+
+    assert [m.rcpt_tos for m in sink.messages] == [
+        ["admin@example.com"],
+        ["admin@example.com", "other@example.com"],
+    ]
+    assert len(sink.sessions) == 1
+    assert sender.connection.opened == 1
+    assert [email["status"] for email in await queued_emails()] == ["sent", "sent"]
+
+
+@pytest.mark.anyio
+async def test_sent_emails_are_not_sent_again(smtp_sink):
+    sink, port = smtp_sink
+    sender = mail_sender(port)
+    await queue_email(["admin@example.com"], "Report", "body")
+
+    await sender.deliver_due()
+    assert await sender.deliver_due() == 0
+    sender.connection.close()
+
+    assert len(sink.messages) == 1
+
+
+@pytest.mark.anyio
+async def test_emails_are_claimed_one_at_a_time():
+    sender = mail_sender(free_port())
+    await queue_email(["admin@example.com"], "Report", "first")
+    await queue_email(["admin@example.com"], "Report", "second")
+
+    claimed = await sender.claim_next()
+
+    first, second = await queued_emails()
+    assert claimed["id"] == first["id"]
+    assert first["attempts"] == 1
+    # Left for whichever worker is free first
+    assert second["attempts"] == 0
+    assert (await sender.claim_next())["id"] == second["id"]
+
+
+@pytest.mark.anyio
+async def test_failed_emails_are_retried_with_backoff():
+    sender = mail_sender(free_port())
+    await queue_email(["admin@example.com"], "Report", "body")
+
+    assert await sender.deliver_due() == 0
+    (email,) = await queued_emails()
+    assert email["status"] == "pending"
+    assert email["attempts"] == 1
+    assert email["last_error"]
+    # Not due again until the backoff has passed
+    assert await sender.claim_next() is None
+
+
+@pytest.mark.anyio
+async def test_emails_fail_after_max_attempts():
+    sender = mail_sender(free_port(), max_attempts=1)
+    await queue_email(["admin@example.com"], "Report", "body")
+
+    await sender.deliver_due()
+
+    (email,) = await queued_emails()
+    assert email["status"] == "failed"
+    assert sender.stats()["failed"] == 1
@@ -0,0 +1,108 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, func, select
+
+from catalog_api.database import (
+    database,
+    engine,
+    metadata,
+    outbound_emails_table,
+    products_table,
+)
+from catalog_api.utils.slow_queries import SlowQueryLog, record_slow_queries
+from catalog_api.utils.sqlite_pool import ImmediateTransactionDatabase
+
+
+def product(sku: str) -> dict:
+    return {"name": "Lamp", "sku": sku, "price": 10.0, "brand": "Acme"}
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "query",
+    [
+        products_table.select().where(products_table.c.sku.in_(["L-1", "L-2"])),
+        products_table.update()
+        .where(products_table.c.id == 1)
+        .values(price=1.0)
+        .returning(products_table.c.id),
+        outbound_emails_table.update()
+        .where(
+            outbound_emails_table.c.id.in_(
+                select(outbound_emails_table.c.id)
+                .where(outbound_emails_table.c.status == "pending")
+                .limit(5)
+            )
+        )
+        .values(attempts=outbound_emails_table.c.attempts + 1),
+    ],
+)
+async def test_explain(query):
+    log = SlowQueryLog(threshold_ms=0, size=10)
+
+    plan = await log.explain(database, engine.dialect.name, query, None)
+
+    assert plan and all(isinstance(line, str) for line in plan)
+
+
+@pytest.mark.anyio
+async def test_explain_failure_keeps_transaction():
+    log = SlowQueryLog(threshold_ms=0, size=10)
+
+    async with database.transaction():
+        plan = await log.explain(database, engine.dialect.name, "SELECT nope", None)
+        assert plan is None
+        assert await database.fetch_val(select(func.count(products_table.c.id))) >= 0
+
+
+@pytest.mark.anyio
+async def test_record_slow_queries(tmp_path):
+    url = f"sqlite:///{tmp_path / 'catalog.db'}"
+    metadata.create_all(create_engine(url))
+    sqlite_database = ImmediateTransactionDatabase(url)
+    log = SlowQueryLog(threshold_ms=0, size=2)
+    record_slow_queries(sqlite_database, log, "sqlite")
+    await sqlite_database.connect()
+    try:
+        await sqlite_database.execute(products_table.insert().values(product("L-1")))
+        await sqlite_database.fetch_all(
+            products_table.select().where(func.lower(products_table.c.name) == "lamp")
+        )
+        await sqlite_database.fetch_one(
+            products_table.select().where(products_table.c.sku == "L-1")
+        )
+    finally:
+        await sqlite_database.disconnect()
+
+    assert log.recorded == 3
+    by_name, by_sku = log.entries
+    assert by_name["operation"] == "fetch_all"
+    assert by_name["statement"].endswith("WHERE lower(products.name) = :lower_1")
+    assert by_name["parameters"] == {"lower_1": "lamp"}
+    assert by_name["plan"] == ["SCAN products"]
+    assert "USING INDEX" in by_sku["plan"][0]
+
+
+@pytest.mark.anyio
+async def test_explain_outside_transaction_doesnt_wait_for_writer(tmp_path):
+    path = tmp_path / "catalog.db"
+    metadata.create_all(create_engine(f"sqlite:///{path}"))
+    sqlite_database = ImmediateTransactionDatabase(f"sqlite:///{path}", timeout=0.1)
+    log = SlowQueryLog(threshold_ms=0, size=2)
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    await sqlite_database.connect()
+    try:
+        plan = await log.explain(
+            sqlite_database,
+            "sqlite",
+            products_table.select().where(products_table.c.sku == "L-1"),
+            None,
+        )
+    finally:
+        await sqlite_database.disconnect()
+        writer.rollback()
+        writer.close()
+
+    assert plan and "USING INDEX" in plan[0]
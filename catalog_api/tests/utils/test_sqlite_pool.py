@@ -0,0 +1,115 @@
+import asyncio
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, select
+
+from catalog_api.database import metadata, products_table
+from catalog_api.utils.sqlite_pool import (
+    ImmediateTransactionDatabase,
+    RoutedDatabase,
+    production_pragmas,
+)
+
+
+@pytest.fixture()
+async def routed_database(tmp_path):
+    url = f"sqlite:///{tmp_path / 'catalog.db'}"
+    metadata.create_all(create_engine(url))
+    routed = RoutedDatabase(
+        url, read_pool_size=2, pragmas=production_pragmas(1024, 0, 1000)
+    )
+    await routed.connect()
+    yield routed
+    await routed.disconnect()
+
+
+def product(sku: str) -> dict:
+    return {"name": "Lamp", "sku": sku, "price": 10.0, "brand": "Acme"}
+
+
+@pytest.mark.anyio
+async def test_routed_database_uses_wal(routed_database):
+    assert await routed_database.fetch_val("PRAGMA journal_mode") == "wal"
+
+
+@pytest.mark.anyio
+async def test_routed_database_reads_committed_writes(routed_database):
+    await routed_database.execute(products_table.insert().values(product("L-1")))
+
+    rows = await routed_database.fetch_all(select(products_table.c.sku))
+    assert [row["sku"] for row in rows] == ["L-1"]
+
+
+@pytest.mark.anyio
+async def test_routed_database_readers_are_read_only(routed_database):
+    with pytest.raises(sqlite3.OperationalError):
+        await routed_database.reader.execute(
+            products_table.insert().values(product("L-1"))
+        )
+
+
+@pytest.mark.anyio
+async def test_routed_database_reads_during_write_transaction(routed_database):
+    written = asyncio.Event()
+    release = asyncio.Event()
+
+    async def write():
+        async with routed_database.transaction():
+            await routed_database.execute(
+                products_table.insert().values(product("L-1"))
+            )
+            # Reads in the transaction go to the writer and see its changes
+            assert await routed_database.fetch_val(select(products_table.c.sku))
+            written.set()
+            await release.wait()
+
+    writer = asyncio.create_task(write())
+    await written.wait()
+    # Outside the transaction readers aren't blocked and don't see it yet
+    assert await routed_database.fetch_all(select(products_table)) == []
+    release.set()
+    await writer
+
+    assert len(await routed_database.fetch_all(select(products_table))) == 1
+
+
+@pytest.mark.anyio
+async def test_routed_database_iterates_on_reader(routed_database):
+    await routed_database.execute(products_table.insert().values(product("L-1")))
+
+    # Iterating runs in a transaction, which a read-only connection can start
+    records = routed_database.iterate(select(products_table.c.sku))
+    assert [record["sku"] async for record in records] == ["L-1"]
+
+
+@pytest.mark.anyio
+async def test_routed_database_rolls_back_failed_transaction(routed_database):
+    with pytest.raises(RuntimeError):
+        async with routed_database.transaction():
+            await routed_database.execute(
+                products_table.insert().values(product("L-1"))
+            )
+            raise RuntimeError()
+
+    assert await routed_database.fetch_all(select(products_table)) == []
+
+
+@pytest.mark.anyio
+async def test_sqlite_database_queues_concurrent_write_transactions(tmp_path):
+    url = f"sqlite:///{tmp_path / 'catalog.db'}"
+    metadata.create_all(create_engine(url))
+    database = ImmediateTransactionDatabase(url)
+    await database.connect()
+
+    async def read_then_write(sku: str):
+        async with database.transaction():
+            await database.fetch_all(select(products_table))
+            await asyncio.sleep(0.01)
+            await database.execute(products_table.insert().values(product(sku)))
+
+    try:
+        await asyncio.gather(*(read_then_write(f"L-{i}") for i in range(5)))
+        assert len(await database.fetch_all(select(products_table))) == 5
+    finally:
+        await database.disconnect()
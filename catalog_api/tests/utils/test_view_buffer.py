@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+import sqlalchemy
+
+from catalog_api.database import database, product_analytics_table
+from catalog_api.utils import view_buffer
+from catalog_api.utils.view_buffer import ViewEventBuffer
+
+
+async def count_views(product_id: int) -> int:
+    query = sqlalchemy.select(sqlalchemy.func.count()).where(
+        product_analytics_table.c.product_id == product_id
+    )
+    return await database.fetch_val(query)
+
+
+@pytest.mark.anyio
+async def test_views_are_written_on_stop():
+    buffer = ViewEventBuffer(max_size=100, batch_size=10, flush_interval=60)
+    await buffer.start()
+    for _ in range(25):
+        await buffer.add(1)
+
+    await buffer.stop()
+
+    assert await count_views(1) == 25
+
+
+@pytest.mark.anyio
+async def test_full_batch_is_written_before_flush_interval(monkeypatch):
+    batches = []
+
+    async def write(views: list[dict]):
+        batches.append(len(views))
+
+    monkeypatch.setattr(view_buffer, "add_product_anonymous_views", write)
+    buffer = ViewEventBuffer(max_size=100, batch_size=3, flush_interval=60)
+    await buffer.start()
+    try:
+        for _ in range(3):
+            await buffer.add(1)
+
+        # Long before the flush interval, while the buffer keeps running
+        for _ in range(100):
+            if batches:
+                break
+            await asyncio.sleep(0.01)
+        assert batches == [3]
+        assert buffer.running
+    finally:
+        await buffer.stop()
+
+
+@pytest.mark.anyio
+async def test_views_are_dropped_when_full():
+    buffer = ViewEventBuffer(
+        max_size=2, batch_size=10, flush_interval=60, full_policy="drop"
+    )
+    await buffer.start()
+    for _ in range(5):
+        await buffer.add(1)
+
+    await buffer.stop()
+
+    assert buffer.dropped == 3
+    assert await count_views(1) == 2
+
+
+@pytest.mark.anyio
+async def test_views_are_written_directly_when_not_running():
+    buffer = ViewEventBuffer(max_size=100, batch_size=10, flush_interval=60)
+    await buffer.add(1)
+
+    assert await count_views(1) == 1
+
+
+@pytest.mark.anyio
+async def test_add_waits_for_room_when_full():
+    buffer = ViewEventBuffer(
+        max_size=2, batch_size=10, flush_interval=0.05, full_policy="block"
+    )
+    await buffer.start()
+    try:
+        await buffer.add(1)
+        await buffer.add(1)
+        blocked = asyncio.create_task(buffer.add(1))
+        await asyncio.sleep(0)
+        assert not blocked.done()
+
+        # The next flush makes room for it
+        await asyncio.wait_for(blocked, timeout=1)
+    finally:
+        await buffer.stop()
+
+    assert buffer.dropped == 0
+    assert await count_views(1) == 3
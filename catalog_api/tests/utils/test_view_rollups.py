@@ -0,0 +1,45 @@
+import datetime
+from collections import Counter
+
+import pytest
+
+from catalog_api.database import (
+    database,
+    product_analytics_table,
+    product_views_daily_table,
+    product_views_hourly_table,
+)
+from catalog_api.utils.view_rollups import (
+    backfill_view_rollups,
+    count_views_between,
+    increment_view_rollups,
+)
+
+
+@pytest.mark.anyio
+async def test_backfill_view_rollups_only_once():
+    view_date = datetime.datetime(2024, 5, 1, 10, 30)
+    views = [
+        {"product_id": 1, "view_date": view_date},
+        {"product_id": 1, "view_date": view_date + datetime.timedelta(minutes=10)},
+        {"product_id": 2, "view_date": view_date + datetime.timedelta(hours=1)},
+    ]
+    await database.execute_many(product_analytics_table.insert(), views)
+
+    # Like several workers starting at once
+    await backfill_view_rollups()
+    await backfill_view_rollups()
+
+    start = datetime.datetime(2024, 5, 1)
+    end = start + datetime.timedelta(days=1)
+    assert await count_views_between(start, end) == Counter({1: 2, 2: 1})
+    assert await count_views_between(
+        view_date.replace(minute=0), view_date.replace(minute=0, hour=11)
+    ) == Counter({1: 2})
+
+    # New views add to the backfilled buckets
+    await increment_view_rollups([views[0]])
+    hourly = await database.fetch_all(product_views_hourly_table.select())
+    daily = await database.fetch_all(product_views_daily_table.select())
+    assert sorted(row["count"] for row in hourly) == [1, 3]
+    assert sorted(row["count"] for row in daily) == [1, 3]
@@ -0,0 +1,56 @@
+import json
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from catalog_api.database import database
+from catalog_api.utils.db_utils import add_audit_entries
+
+
+class AuditOutbox:
+    """Audit entries waiting for the transaction they describe to commit.
+
+    Entries are written with a single multi-row insert when the outbox is
+    flushed, so a route that changes one product and an import that changes
+    thousands both pay one audit statement per transaction."""
+
+    def __init__(self):
+        self.entries = []
+
+    def add(
+        self,
+        product_id: int,
+        action: str,
+        changed_by: int,
+        previous_data: Optional[dict] = None,
+        new_data: Optional[dict] = None,
+    ):
+        self.entries.append(
+            {
+                "product_id": product_id,
+                "action": action,
+                "previous_data": (
+                    json.dumps(dict(previous_data))
+                    if previous_data is not None
+                    else None
+                ),
+                "new_data": (
+                    json.dumps(dict(new_data)) if new_data is not None else None
+                ),
+                "changed_by": changed_by,
+            }
+        )
+
+    async def flush(self):
+        entries, self.entries = self.entries, []
+        await add_audit_entries(entries)
+
+
+@asynccontextmanager
+async def audited_transaction():
+    """Open a transaction and yield an AuditOutbox for it. The queued entries
+    are inserted just before the transaction commits, so a product change is
+    never saved without its audit record, or the other way round."""
+    outbox = AuditOutbox()
+    async with database.transaction():
+        yield outbox
+        await outbox.flush()
@@ -0,0 +1,39 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class ExecutorSaturatedError(Exception):
+    pass
+
+
+class BoundedExecutor:
+    """Runs blocking calls in a thread pool off the event loop. At most
+    `max_workers` calls run at once and `max_queued` more may wait for a
+    thread; anything beyond that is rejected instead of piling up."""
+
+    def __init__(self, max_workers: int, max_queued: int, thread_name_prefix: str):
+        self.capacity = max_workers + max_queued
+        self.pending = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=thread_name_prefix
+        )
+
+    async def run(self, func: Callable, *args: Any) -> Any:
+        if self.pending >= self.capacity:
+            self.rejected += 1
+            raise ExecutorSaturatedError
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "capacity": self.capacity,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,91 @@
+from catalog_api.database import database, dialect_insert, products_table
+from catalog_api.utils.audit import audited_transaction
+from catalog_api.utils.catalog_snapshot import catalog_snapshot
+from catalog_api.utils.product_cache import store_product
+from catalog_api.utils.versions import Versions, bump_product_versions
+
+PRODUCT_FIELDS = ["name", "sku", "price", "brand"]
+
+
+async def write_products(
+    products: list[dict], changed_by: int
+) -> tuple[list[dict], list[dict], Versions]:
+    """Create or update products by SKU in a single transaction.
+
+    Products whose SKU doesn't exist yet are created, the rest are updated.
+    A SKU that appears more than once in `products` is only applied the first
+    time; the repeats are reported as conflicts. Returns one result per
+    product, in order, along with the saved products and their versions to
+    pass to publish_products once the outermost transaction has committed."""
+    results = []
+    unique = {}
+    for product in products:
+        if product["sku"] in unique:
+            results.append(
+                {
+                    "sku": product["sku"],
+                    "status": "conflict",
+                    "detail": "SKU repeated in the same request",
+                }
+            )
+            continue
+        unique[product["sku"]] = {field: product[field] for field in PRODUCT_FIELDS}
+        results.append({"sku": product["sku"]})
+    if not unique:
+        return results, [], Versions(None, {})
+
+    skus = list(unique)
+    async with audited_transaction() as audit:
+        query = products_table.select().where(products_table.c.sku.in_(skus))
+        existing = {row["sku"]: dict(row) for row in await database.fetch_all(query)}
+
+        upsert = dialect_insert(products_table).values(list(unique.values()))
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[products_table.c.sku],
+            set_={
+                field: upsert.excluded[field]
+                for field in PRODUCT_FIELDS
+                if field != "sku"
+            },
+        )
+        await database.execute(upsert)
+
+        query = products_table.select().where(products_table.c.sku.in_(skus))
+        saved = {row["sku"]: dict(row) for row in await database.fetch_all(query)}
+
+        for sku, product in saved.items():
+            previous = existing.get(sku)
+            audit.add(
+                product["id"],
+                "UPDATED" if previous else "ADDED",
+                changed_by,
+                previous_data=previous,
+                new_data=product,
+            )
+        versions = await bump_product_versions(
+            [product["id"] for product in saved.values()]
+        )
+
+    for result in results:
+        if "status" not in result:
+            product = saved[result["sku"]]
+            result["id"] = product["id"]
+            result["status"] = "updated" if result["sku"] in existing else "created"
+    return results, list(saved.values()), versions
+
+
+def publish_products(saved: list[dict], versions: Versions):
+    """Update this worker's product cache and catalog snapshot with products
+    written by write_products. Only once they are committed: a rolled back
+    write left in them would be served under a version some later write
+    reaches."""
+    for product in saved:
+        store_product(product, versions.products[product["id"]])
+    catalog_snapshot.store(versions.catalog, saved)
+
+
+async def upsert_products(products: list[dict], changed_by: int) -> list[dict]:
+    """write_products then publish_products, when not inside a transaction."""
+    results, saved, versions = await write_products(products, changed_by)
+    publish_products(saved, versions)
+    return results
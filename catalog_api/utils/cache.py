@@ -0,0 +1,79 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """In-process LRU cache with an optional time to live per entry.
+
+    Hit, miss and eviction counters are kept so the cache can be checked
+    from the admin endpoints."""
+
+    def __init__(self, max_size: int, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(
+        self,
+        key: Hashable,
+        default: Any = None,
+        valid: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """The value for `key`, or `default` if there is none, it expired or
+        it isn't `valid`, which counts as a miss."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at is None or expires_at > time.monotonic():
+                if valid is None or valid(value):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+            else:
+                del self._entries[key]
+
+        self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any):
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def discard_where(self, predicate: Callable[[Any], bool]):
+        for key in [
+            key for key, (_, value) in self._entries.items() if predicate(value)
+        ]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
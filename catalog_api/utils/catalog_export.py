@@ -0,0 +1,99 @@
+import csv
+import io
+import json
+import zlib
+from enum import Enum
+from typing import AsyncIterator
+
+from catalog_api.database import database, products_table
+
+EXPORT_FIELDS = ["id", "name", "sku", "price", "brand"]
+CHUNK_SIZE = 64 * 1024
+# Products read per query while exporting
+PAGE_SIZE = 1000
+
+
+class CatalogFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+MEDIA_TYPES = {
+    CatalogFormat.ndjson: "application/x-ndjson",
+    CatalogFormat.csv: "text/csv",
+}
+
+
+async def iterate_products() -> AsyncIterator[dict]:
+    """Every product, by id, read a page at a time after the last id seen.
+    The response is only as fast as its client, so no connection is held
+    across the pages."""
+    after = 0
+    while True:
+        query = (
+            products_table.select()
+            .where(products_table.c.id > after)
+            .order_by(products_table.c.id)
+            .limit(PAGE_SIZE)
+        )
+        records = await database.fetch_all(query)
+        for record in records:
+            yield {field: record[field] for field in EXPORT_FIELDS}
+        if len(records) < PAGE_SIZE:
+            return
+        after = records[-1]["id"]
+
+
+async def ndjson_lines(products: AsyncIterator[dict]) -> AsyncIterator[str]:
+    async for product in products:
+        yield json.dumps(product) + "\n"
+
+
+async def csv_lines(products: AsyncIterator[dict]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    async for product in products:
+        writer.writerow(product)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+async def encode_chunks(lines: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    """Group lines into chunks of roughly CHUNK_SIZE bytes, so the response
+    is not written one row at a time."""
+    parts = []
+    size = 0
+    async for line in lines:
+        parts.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield "".join(parts).encode()
+            parts = []
+            size = 0
+    if parts:
+        yield "".join(parts).encode()
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_products(export_format: CatalogFormat, gzip: bool) -> AsyncIterator[bytes]:
+    products = iterate_products()
+    if export_format == CatalogFormat.csv:
+        lines = csv_lines(products)
+    else:
+        lines = ndjson_lines(products)
+
+    chunks = encode_chunks(lines)
+    if gzip:
+        chunks = gzip_chunks(chunks)
+    return chunks
@@ -0,0 +1,216 @@
+import asyncio
+import gzip
+import logging
+from typing import Callable, Optional
+
+import brotli
+import orjson
+
+from catalog_api.config import config
+from catalog_api.database import database, products_table
+from catalog_api.models.products import Product
+from catalog_api.utils.row_responses import RowEncoder
+from catalog_api.utils.versions import get_catalog_version
+
+logger = logging.getLogger(__name__)
+
+IDENTITY = "identity"
+# Fast settings: the catalog is compressed again after every change
+COMPRESSORS: dict[str, Callable[[bytes], bytes]] = {
+    "br": lambda body: brotli.compress(body, quality=4),
+    "gzip": lambda body: gzip.compress(body, compresslevel=6),
+}
+# Preferred first when the client accepts several equally
+ENCODINGS = ["br", "gzip", IDENTITY]
+
+product_encoder = RowEncoder(Product)
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> str:
+    """The content coding to answer an Accept-Encoding header with."""
+    if not accept_encoding:
+        return IDENTITY
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.strip().lower()] = weight
+
+    def weight(coding: str) -> float:
+        if coding in weights:
+            return weights[coding]
+        # Identity is acceptable unless refused, explicitly or through *
+        default = 1.0 if coding == IDENTITY else 0.0
+        return weights.get("*", default)
+
+    best = max(ENCODINGS, key=lambda coding: (weight(coding), -ENCODINGS.index(coding)))
+    return best if weight(best) > 0 else IDENTITY
+
+
+class CatalogSnapshot:
+    """The whole catalog as a JSON array ordered by id, held in memory as
+    bytes along with its gzip and brotli variants, so that serving it takes
+    no database work and no serialization while the catalog doesn't change.
+
+    Each product is kept as its own JSON fragment. Writes made through this
+    worker patch the fragments of their products, as long as they arrive in
+    catalog version order; the body is joined and compressed again when next
+    asked for. Anything else, like writes made by other workers, is caught by
+    checking the catalog version every `poll_interval` seconds (on every
+    request when the poll isn't running, e.g. in scripts and tests) and
+    loading the whole catalog again."""
+
+    def __init__(self, poll_interval: float):
+        self.poll_interval = poll_interval
+        # The catalog version the fragments are at, None when out of date
+        self.version: Optional[int] = None
+        self.loads = 0
+        self.patches = 0
+        self._fragments: dict[int, bytes] = {}
+        self._ordered = True
+        self._bodies: dict[str, bytes] = {}
+        self._pending: dict[tuple, asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _once(self, key: tuple, make: Callable):
+        """Await make() once for all the callers asking for `key` meanwhile."""
+        future = self._pending.get(key)
+        if future is None:
+            future = self._pending[key] = asyncio.ensure_future(make())
+            future.add_done_callback(lambda _: self._pending.pop(key, None))
+        # A caller giving up doesn't cancel it for the others
+        return await asyncio.shield(future)
+
+    async def load(self):
+        # The version is read before the products, so the fragments can only
+        # be newer than their version, which gets them loaded again later
+        version = await get_catalog_version()
+        query = products_table.select().order_by(products_table.c.id)
+        products = product_encoder.encode(await database.fetch_all(query))
+        self._fragments = {product["id"]: orjson.dumps(product) for product in products}
+        self._ordered = True
+        self._bodies = {}
+        self.version = version
+        self.loads += 1
+
+    def _advance(self, version: Optional[int]) -> bool:
+        if self.version is None or version is None:
+            return False
+        if version != self.version + 1:
+            # A write was missed or applied out of order
+            self.version = None
+            return False
+        self.version = version
+        self._bodies = {}
+        self.patches += 1
+        return True
+
+    def store(self, version: Optional[int], products: list):
+        """Patch in products created or updated by the write that bumped the
+        catalog to `version`."""
+        if not self._advance(version):
+            return
+        for product in product_encoder.encode(products):
+            product_id = product["id"]
+            if product_id not in self._fragments:
+                # New products usually have the highest ids and go last
+                last_id = next(reversed(self._fragments), None)
+                if last_id is not None and product_id < last_id:
+                    self._ordered = False
+            self._fragments[product_id] = orjson.dumps(product)
+
+    def remove(self, version: Optional[int], product_id: int):
+        """Patch out a product deleted by the write that bumped the catalog to
+        `version`."""
+        if self._advance(version):
+            self._fragments.pop(product_id, None)
+
+    def _identity(self) -> bytes:
+        body = self._bodies.get(IDENTITY)
+        if body is None:
+            if not self._ordered:
+                self._fragments = dict(sorted(self._fragments.items()))
+                self._ordered = True
+            body = b"[" + b",".join(self._fragments.values()) + b"]"
+            self._bodies[IDENTITY] = body
+        return body
+
+    async def _compress(self, encoding: str, version: int, identity: bytes) -> bytes:
+        # Compressing a big catalog takes a while, so not in the event loop
+        body = await asyncio.to_thread(COMPRESSORS[encoding], identity)
+        if self.version == version:
+            self._bodies[encoding] = body
+        return body
+
+    async def get(self, encoding: str = IDENTITY) -> tuple[int, bytes]:
+        """The catalog version and the body in the given content coding."""
+        if self.version is not None and not self.running:
+            if await get_catalog_version() != self.version:
+                self.version = None
+        while self.version is None:
+            await self._once(("load",), self.load)
+
+        version, identity = self.version, self._identity()
+        if encoding == IDENTITY:
+            return version, identity
+        body = self._bodies.get(encoding)
+        if body is None:
+            body = await self._once(
+                ("compress", encoding, version),
+                lambda: self._compress(encoding, version, identity),
+            )
+        return version, body
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if not self.loads:
+                # Nobody asked for it yet
+                continue
+            try:
+                if await get_catalog_version() != self.version:
+                    await self._once(("load",), self.load)
+            except Exception:
+                logger.exception("Could not refresh the catalog snapshot")
+
+    def clear(self):
+        self.version = None
+        self._fragments = {}
+        self._ordered = True
+        self._bodies = {}
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "products": len(self._fragments),
+            "bytes": len(self._bodies.get(IDENTITY, b"")),
+            "loads": self.loads,
+            "patches": self.patches,
+        }
+
+
+catalog_snapshot = CatalogSnapshot(poll_interval=config.CATALOG_SNAPSHOT_POLL_INTERVAL)
@@ -1,64 +1,138 @@
+import asyncio
 import datetime
+import io
 from datetime import date
+from typing import AsyncIterator, Optional
 
-from catalog_api.database import database
+from sqlalchemy import func, select
 
+from catalog_api.database import (
+    audit_log_table,
+    database,
+    dialect_insert,
+    report_watermarks_table,
+)
+from catalog_api.utils.product_changes import get_latest_audit_id
 
-async def get_daily_changes(date: str):
-    query = f"SELECT * FROM audit_log WHERE DATE(timestamp) = '{date}'"
-    daily_changes = await database.fetch_all(query)
+REPORT_NAME = "daily_changes"
+FETCH_SIZE = 1000
 
-    if not daily_changes:
-        return {}
 
-    changes_formatted = {"added": [], "updated": [], "deleted": []}
-
-    for entry in daily_changes:
-        action = entry.action.lower()
-        if action == "added":
-            changes_formatted["added"].append(dict(entry))
-        elif action == "updated":
-            changes_formatted["updated"].append(dict(entry))
-        elif action == "deleted":
-            changes_formatted["deleted"].append(dict(entry))
-
-    return changes_formatted
+async def get_watermark(name: str) -> int:
+    query = select(report_watermarks_table.c.last_audit_id).where(
+        report_watermarks_table.c.name == name
+    )
+    last_audit_id = await database.fetch_val(query)
+    if last_audit_id is not None:
+        return last_audit_id
+
+    # First run: start with today's changes, like the report always did
+    midnight = datetime.datetime.combine(date.today(), datetime.time())
+    query = select(func.min(audit_log_table.c.id)).where(
+        audit_log_table.c.timestamp >= midnight
+    )
+    first_of_today = await database.fetch_val(query)
+    if first_of_today is not None:
+        return first_of_today - 1
+    return await database.fetch_val(select(func.max(audit_log_table.c.id))) or 0
 
 
-def construct_email_body(changes):
-    body = (
-        f"Hello Admin,\n\nHere's a summary of product changes for {date.today()}:\n\n"
+async def set_watermark(name: str, last_audit_id: int):
+    query = dialect_insert(report_watermarks_table).values(
+        name=name, last_audit_id=last_audit_id
     )
-
-    total_changes = sum(len(v) for v in changes.values())
-    body += f"**Total Changes:** {total_changes}\n\n---\n\n"
-
-    if changes["added"]:
-        body += "**New Products Added:**\n"
-        for change in changes["added"]:
-            body += f"- Product ID: {change['product_id']} - Added data: {change['new_data']} - Added by User: {change['changed_by']}\n"
-        body += "---\n\n"
-
-    if changes["updated"]:
-        body += "**Products Updated:**\n"
-        for change in changes["updated"]:
-            body += f"- Product ID: {change['product_id']} - Previous data: {change['previous_data']} > New data: {change['new_data']} - Updated by User: {change['changed_by']}\n"
-        body += "---\n\n"
-
-    if changes["deleted"]:
-        body += "**Products Deleted:**\n"
-        for change in changes["deleted"]:
-            body += f"- Product ID: {change['product_id']} - Deleted data: {change['previous_data']} - Deleted by User: {change['changed_by']}\n"
-        body += "---\n\n"
-
-    body += "Best regards,\nZ Brands"
-    return body
-
-
-async def return_text_for_mail():
-    current_date = datetime.date.today()
-    formatted_date = current_date.strftime("%Y-%m-%d")
-    changes = await get_daily_changes(formatted_date)
-    if changes:
-        email_body = construct_email_body(changes)
-        return email_body
+    query = query.on_conflict_do_update(
+        index_elements=[report_watermarks_table.c.name],
+        set_={"last_audit_id": last_audit_id},
+    )
+    await database.execute(query)
+
+
+async def get_new_changes(after_id: int, up_to_id: int) -> AsyncIterator:
+    """Audit entries with after_id < id <= up_to_id, read in pages of
+    FETCH_SIZE over the primary key."""
+    while after_id < up_to_id:
+        query = (
+            audit_log_table.select()
+            .where(audit_log_table.c.id > after_id, audit_log_table.c.id <= up_to_id)
+            .order_by(audit_log_table.c.id)
+            .limit(FETCH_SIZE)
+        )
+        changes = await database.fetch_all(query)
+        if not changes:
+            return
+        for change in changes:
+            yield change
+        after_id = changes[-1].id
+        # Let requests run between pages on large days
+        await asyncio.sleep(0)
+
+
+def format_change(change) -> str:
+    action = change.action
+    if action == "ADDED":
+        return f"- Product ID: {change.product_id} - Added data: {change.new_data} - Added by User: {change.changed_by}\n"
+    if action == "UPDATED":
+        return f"- Product ID: {change.product_id} - Previous data: {change.previous_data} > New data: {change.new_data} - Updated by User: {change.changed_by}\n"
+    return f"- Product ID: {change.product_id} - Deleted data: {change.previous_data} - Deleted by User: {change.changed_by}\n"
+
+
+def format_timestamp(timestamp: datetime.datetime) -> str:
+    return timestamp.strftime("%Y-%m-%d %H:%M")
+
+
+async def construct_email_body(changes: AsyncIterator) -> Optional[str]:
+    sections = {
+        "ADDED": ("**New Products Added:**\n", io.StringIO()),
+        "UPDATED": ("**Products Updated:**\n", io.StringIO()),
+        "DELETED": ("**Products Deleted:**\n", io.StringIO()),
+    }
+    total_changes = 0
+    first = last = None
+    async for change in changes:
+        sections[change.action][1].write(format_change(change))
+        total_changes += 1
+        first = first or change
+        last = change
+
+    if not total_changes:
+        return None
+
+    # The report covers the changes since the last one was sent, which
+    # needn't be a single day: name the range instead
+    body = io.StringIO()
+    body.write(
+        "Hello Admin,\n\nHere's a summary of product changes made from "
+        f"{format_timestamp(first.timestamp)} to "
+        f"{format_timestamp(last.timestamp)} UTC:\n\n"
+    )
+    body.write(f"**Total Changes:** {total_changes}\n\n---\n\n")
+    for title, section in sections.values():
+        if section.tell():
+            body.write(title)
+            body.write(section.getvalue())
+            body.write("---\n\n")
+    body.write("Best regards,\nZ Brands")
+    return body.getvalue()
+
+
+async def return_text_for_mail() -> Optional[tuple[str, int]]:
+    """Build the report for the changes made since the last one was sent.
+    Returns the email body and the last audit id it covers, which has to be
+    passed to mark_reported once the email is out.
+
+    The report stops before the first entry that isn't settled yet, like
+    /products/changes: on Postgres an entry with a lower id can still be
+    committing, and the watermark would move past it for good."""
+    after_id = await get_watermark(REPORT_NAME)
+    up_to_id = await get_latest_audit_id()
+    if up_to_id <= after_id:
+        return None
+
+    email_body = await construct_email_body(get_new_changes(after_id, up_to_id))
+    if email_body:
+        return email_body, up_to_id
+
+
+async def mark_reported(last_audit_id: int):
+    await set_watermark(REPORT_NAME, last_audit_id)
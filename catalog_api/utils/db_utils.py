@@ -1,13 +1,20 @@
 import datetime
 
 from catalog_api.database import audit_log_table, database, product_analytics_table
+from catalog_api.utils.view_rollups import increment_view_rollups
 
 
 async def add_product_anonymous_view(product_id: int):
-    query = product_analytics_table.insert().values(
-        {"product_id": product_id, "view_date": datetime.datetime.utcnow()}
+    await add_product_anonymous_views(
+        [{"product_id": product_id, "view_date": datetime.datetime.utcnow()}]
     )
-    await database.execute(query)
+
+
+async def add_product_anonymous_views(views: list[dict]):
+    query = product_analytics_table.insert().values(views)
+    async with database.transaction():
+        await database.execute(query)
+        await increment_view_rollups(views)
 
 
 async def add_audit_entry(data: dict):
@@ -15,3 +22,13 @@ async def add_audit_entry(data: dict):
         {**data, "timestamp": datetime.datetime.utcnow()}
     )
     await database.execute(query)
+
+
+async def add_audit_entries(entries: list[dict]):
+    if not entries:
+        return
+    timestamp = datetime.datetime.utcnow()
+    query = audit_log_table.insert().values(
+        [{**entry, "timestamp": timestamp} for entry in entries]
+    )
+    await database.execute(query)
@@ -0,0 +1,117 @@
+import datetime
+import functools
+import logging
+import os
+import socket
+import uuid
+from typing import Optional
+
+from catalog_api.config import config
+from catalog_api.database import database, dialect_insert, leases_table
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLease:
+    """A lease row shared by every worker. Whoever holds it and keeps renewing
+    it before `ttl` seconds pass is the leader; if the leader stops renewing
+    (crash, hang, shutdown), another worker takes the lease over on its next
+    attempt."""
+
+    def __init__(self, name: str, ttl: float, holder: Optional[str] = None):
+        self.name = name
+        self.ttl = datetime.timedelta(seconds=ttl)
+        self.holder = (
+            holder or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        )
+        self.expires_at: Optional[datetime.datetime] = None
+        self.acquired = 0
+        self.renewed = 0
+        self.lost = 0
+        self.released = 0
+        self.failed_attempts = 0
+
+    @property
+    def is_leader(self) -> bool:
+        return (
+            self.expires_at is not None and self.expires_at > datetime.datetime.utcnow()
+        )
+
+    async def renew(self) -> bool:
+        """Take the lease if it is free or expired, or extend it if this worker
+        already holds it. Returns whether this worker is the leader."""
+        now = datetime.datetime.utcnow()
+        expires_at = now + self.ttl
+        query = dialect_insert(leases_table).values(
+            name=self.name, holder=self.holder, expires_at=expires_at
+        )
+        query = query.on_conflict_do_update(
+            index_elements=[leases_table.c.name],
+            set_={
+                "holder": query.excluded.holder,
+                "expires_at": query.excluded.expires_at,
+            },
+            where=(leases_table.c.holder == self.holder)
+            | (leases_table.c.expires_at < now),
+        ).returning(leases_table.c.name)
+
+        was_leader = self.is_leader
+        try:
+            taken = await database.fetch_val(query)
+        except Exception:
+            self.failed_attempts += 1
+            logger.exception("Could not renew the %s lease", self.name)
+            return self.is_leader
+
+        if taken is None:
+            if self.expires_at is not None:
+                self.lost += 1
+                logger.warning("Lost the %s lease", self.name)
+            self.expires_at = None
+            return False
+
+        if was_leader:
+            self.renewed += 1
+        else:
+            self.acquired += 1
+            logger.info("Acquired the %s lease as %s", self.name, self.holder)
+        self.expires_at = expires_at
+        return True
+
+    async def release(self):
+        """Give the lease up so another worker can take it without waiting for
+        it to expire."""
+        if self.expires_at is None:
+            return
+        query = leases_table.delete().where(
+            leases_table.c.name == self.name, leases_table.c.holder == self.holder
+        )
+        await database.execute(query)
+        self.expires_at = None
+        self.released += 1
+
+    def leader_only(self, job):
+        """Wrap a scheduled job so it only runs on the worker holding the lease."""
+
+        @functools.wraps(job)
+        async def run_if_leader(*args, **kwargs):
+            if await self.renew():
+                return await job(*args, **kwargs)
+
+        return run_if_leader
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "holder": self.holder,
+            "is_leader": self.is_leader,
+            "expires_at": self.expires_at,
+            "acquired": self.acquired,
+            "renewed": self.renewed,
+            "lost": self.lost,
+            "released": self.released,
+            "failed_attempts": self.failed_attempts,
+        }
+
+
+scheduler_lease = LeaderLease("scheduler", ttl=config.SCHEDULER_LEASE_TTL)
@@ -0,0 +1,260 @@
+import functools
+import re
+import time
+from bisect import bisect_left
+from typing import Callable
+
+from catalog_api.utils.cache import LRUCache
+
+# Seconds; a little below the latency of a cached read up to a slow report
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, label_names: tuple = ()):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels: tuple = (), amount: float = 1):
+        self.inc(labels, -amount)
+
+    def set(self, value: float, labels: tuple = ()):
+        self._values[labels] = value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(
+                f"{self.name}{format_labels(self.label_names, labels)} {value}"
+            )
+        return lines
+
+
+class Histogram:
+    """A Prometheus histogram per label set. Observing a value only bumps one
+    bucket counter; the cumulative counts are worked out when rendered."""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        label_names: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        # Per label set: one counter per bucket plus +Inf, and the sum
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, labels: tuple = ()):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def count(self, labels: tuple = ()) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                bucket_labels = format_labels(self.label_names, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            series_labels = format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{series_labels} {total}")
+            lines.append(f"{self.name}_count{series_labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """The metrics of this worker, rendered in the Prometheus text format.
+
+    Besides its own gauges and histograms it exports the stats() of other
+    components (caches, the mail sender...) as gauges, read when scraped."""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self._metrics = []
+        self._stats: dict[str, Callable[[], dict]] = {}
+
+    def gauge(self, name: str, help: str, label_names: tuple = ()) -> Gauge:
+        gauge = Gauge(f"{self.prefix}_{name}", help, label_names)
+        self._metrics.append(gauge)
+        return gauge
+
+    def histogram(self, name: str, help: str, label_names: tuple = ()) -> Histogram:
+        histogram = Histogram(f"{self.prefix}_{name}", help, label_names)
+        self._metrics.append(histogram)
+        return histogram
+
+    def add_stats(self, name: str, stats: Callable[[], dict]):
+        self._stats[name] = stats
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, stats in self._stats.items():
+            for key, value in stats().items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if not isinstance(value, (int, float)):
+                    continue
+                metric = f"{self.prefix}_{name}_{key}"
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry("catalog")
+requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "Requests being handled right now"
+)
+request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "Time to handle a request, by route",
+    ("method", "route", "status"),
+)
+query_duration = registry.histogram(
+    "db_query_duration_seconds",
+    "Time to run a database query, by statement",
+    ("operation", "statement"),
+)
+
+
+class MetricsMiddleware:
+    """Times every HTTP request and labels it with the route's path template
+    (/products/{product_id}), so the number of series stays bounded."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            requests_in_flight.dec()
+            route = scope.get("route")
+            request_duration.observe(
+                time.perf_counter() - started,
+                (scope["method"], route.path if route else "unmatched", status),
+            )
+
+
+# Numbers and quoted strings in raw SQL, and the rows of a multi-row INSERT,
+# which would otherwise make a new statement label per value or row count
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_REPEATED_ROWS = re.compile(r"(VALUES \([^)]*\))(?:, \([^)]*\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+_statement_shapes = LRUCache(max_size=1000)
+
+
+def normalize_sql(sql: str) -> str:
+    sql = _REPEATED_ROWS.sub(r"\1, ...", _WHITESPACE.sub(" ", sql).strip())
+    return _LITERALS.sub("?", sql)
+
+
+def statement_shape(query) -> str:
+    """The query's SQL with placeholders instead of values, e.g.
+    "SELECT ... FROM products WHERE products.id = :id_1".
+
+    Compiling a statement costs more than most queries take to run, so shapes
+    are cached under SQLAlchemy's cache key, which is the same for statements
+    that only differ in their values."""
+    if isinstance(query, str):
+        return normalize_sql(query)
+
+    cache_key = query._generate_cache_key()
+    if cache_key is not None:
+        key = cache_key.key
+    else:
+        # SQLAlchemy has no cache key for multi-row INSERTs, and compiling a
+        # big one takes milliseconds: they share a shape per table and upsert
+        key = (
+            type(query),
+            getattr(query, "table", None),
+            type(getattr(query, "_post_values_clause", None)),
+        )
+    shape = _statement_shapes.get(key)
+    if shape is None:
+        shape = normalize_sql(str(query))
+        _statement_shapes.set(key, shape)
+    return shape
+
+
+def timed_query(operation: str, method: Callable) -> Callable:
+    @functools.wraps(method)
+    async def timed(query, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await method(query, *args, **kwargs)
+        finally:
+            query_duration.observe(
+                time.perf_counter() - started, (operation, statement_shape(query))
+            )
+
+    return timed
+
+
+def instrument_database(
+    database,
+    operations=("fetch_all", "fetch_one", "fetch_val", "execute", "execute_many"),
+):
+    """Time the queries made through `database` (a databases.Database or a
+    RoutedDatabase) by wrapping its query methods on the instance."""
+    for operation in operations:
+        setattr(
+            database, operation, timed_query(operation, getattr(database, operation))
+        )
@@ -0,0 +1,42 @@
+import base64
+import binascii
+import json
+
+from fastapi import HTTPException, status
+
+invalid_cursor_exception = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+)
+
+
+def encode_cursor(value) -> str:
+    raw = json.dumps(value, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError):
+        raise invalid_cursor_exception
+
+
+def decode_id_cursor(cursor: str) -> int:
+    value = decode_cursor(cursor)
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise invalid_cursor_exception
+    return value
+
+
+def decode_sort_key_cursor(cursor: str) -> tuple[float, int]:
+    """A cursor of [value, id], for pages ordered by a number then id."""
+    value = decode_cursor(cursor)
+    if (
+        not isinstance(value, list)
+        or len(value) != 2
+        or not isinstance(value[0], (int, float))
+        or not isinstance(value[1], int)
+    ):
+        raise invalid_cursor_exception
+    return value[0], value[1]
@@ -0,0 +1,83 @@
+from typing import Optional
+
+from sqlalchemy import func, select
+
+from catalog_api.config import config
+from catalog_api.database import (
+    database,
+    product_versions_table,
+    product_views_daily_table,
+    products_table,
+)
+from catalog_api.utils.cache import LRUCache
+
+# Products are cached as (version, product). Product routes on this worker
+# update or evict entries as they write; writes made by other workers are
+# caught by comparing the version with the one in the database, which the
+# product's ETag is built from anyway.
+product_cache = LRUCache(max_size=config.PRODUCT_CACHE_SIZE)
+# Bumped on every write, so a read that raced with a write doesn't put the row
+# it read before the write back into the cache.
+_writes = 0
+
+
+def store_product(product: dict, version: int):
+    global _writes
+    _writes += 1
+    product_cache.set(product["id"], (version, product))
+
+
+def evict_product(product_id: int):
+    global _writes
+    _writes += 1
+    product_cache.pop(product_id)
+
+
+async def get_cached_product(product_id: int, version: int) -> Optional[dict]:
+    """The product, if cached at `version`, else read from the database.
+
+    `version` must be read before calling this, so the row read can only be
+    newer than it, which gets it read again next time."""
+    entry = product_cache.get(product_id, valid=lambda entry: entry[0] == version)
+    if entry is not None:
+        return entry[1]
+
+    writes = _writes
+    query = products_table.select().where(products_table.c.id == product_id)
+    record = await database.fetch_one(query)
+    if record is None:
+        return None
+    product = dict(record)
+    if writes == _writes:
+        product_cache.set(product_id, (version, product))
+    return product
+
+
+async def warm_up_product_cache(size: int):
+    """Load the `size` most viewed products into the cache."""
+    if size <= 0:
+        return
+    views = product_views_daily_table
+    hottest = (
+        select(views.c.product_id, func.sum(views.c.count).label("views"))
+        .group_by(views.c.product_id)
+        .order_by(func.sum(views.c.count).desc())
+        .limit(size)
+        .subquery()
+    )
+    query = (
+        select(
+            products_table,
+            func.coalesce(product_versions_table.c.version, 0).label("version"),
+        )
+        .join(hottest, hottest.c.product_id == products_table.c.id)
+        .outerjoin(
+            product_versions_table,
+            product_versions_table.c.product_id == products_table.c.id,
+        )
+        .order_by(hottest.c.views)
+    )
+    # Least viewed first, so the hottest products end up most recently used
+    for record in await database.fetch_all(query):
+        product = {column.name: record[column.name] for column in products_table.c}
+        product_cache.set(record["id"], (record["version"], product))
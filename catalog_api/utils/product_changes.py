@@ -0,0 +1,81 @@
+import datetime
+import json
+
+from sqlalchemy import func, select
+
+from catalog_api.config import config
+from catalog_api.database import audit_log_table, database
+
+
+def settled_before() -> datetime.datetime:
+    return datetime.datetime.utcnow() - datetime.timedelta(
+        seconds=config.PRODUCT_CHANGES_SETTLE_SECONDS
+    )
+
+
+async def get_latest_audit_id() -> int:
+    """The cursor to start following the changes from now on: just before
+    the first entry that isn't settled yet, if any."""
+    query = select(func.min(audit_log_table.c.id)).where(
+        audit_log_table.c.timestamp >= settled_before()
+    )
+    first_unsettled = await database.fetch_val(query)
+    if first_unsettled is not None:
+        return first_unsettled - 1
+    return await database.fetch_val(select(func.max(audit_log_table.c.id))) or 0
+
+
+async def get_product_changes(
+    after_id: int, limit: int
+) -> tuple[list[dict], int, bool]:
+    """The net changes to products in the audit entries after `after_id`,
+    read over the primary key: at most `limit` entries, folded into one
+    change per product, in the order of each product's last entry.
+
+    Returns the changes, the id of the last entry read (the next cursor) and
+    whether more entries are waiting.
+
+    Audit ids are taken before the transaction that writes them commits, so
+    on Postgres an entry can show up after one with a higher id. Entries
+    newer than PRODUCT_CHANGES_SETTLE_SECONDS are left for the next call:
+    the scan stops at the first one, so that the cursor never moves past an
+    entry that could still be missing."""
+    settled = settled_before()
+    query = (
+        select(
+            audit_log_table.c.id,
+            audit_log_table.c.product_id,
+            audit_log_table.c.action,
+            audit_log_table.c.new_data,
+            audit_log_table.c.timestamp,
+        )
+        .where(audit_log_table.c.id > after_id)
+        .order_by(audit_log_table.c.id)
+        .limit(limit + 1)
+    )
+    entries = await database.fetch_all(query)
+    has_more = len(entries) > limit
+
+    changes = {}
+    last_id = after_id
+    for entry in entries[:limit]:
+        if entry["timestamp"] >= settled:
+            has_more = False
+            break
+        # The latest entry of a product replaces the earlier ones, and moves
+        # it to the end
+        changes.pop(entry["product_id"], None)
+        if entry["action"] == "DELETED":
+            changes[entry["product_id"]] = {
+                "product_id": entry["product_id"],
+                "action": "delete",
+                "product": None,
+            }
+        else:
+            changes[entry["product_id"]] = {
+                "product_id": entry["product_id"],
+                "action": "upsert",
+                "product": json.loads(entry["new_data"]),
+            }
+        last_id = entry["id"]
+    return list(changes.values()), last_id, has_more
@@ -0,0 +1,264 @@
+import codecs
+import csv
+import datetime
+import json
+from typing import AsyncIterator
+
+from pydantic import ValidationError
+from sqlalchemy import and_, or_
+
+from catalog_api.database import database, product_imports_table
+from catalog_api.models.products import ProductCreate
+from catalog_api.utils.bulk_products import publish_products, write_products
+from catalog_api.utils.catalog_export import CatalogFormat
+
+RESULT_COUNTERS = {"created": "created", "updated": "updated", "conflict": "conflicts"}
+JOB_FIELDS = [
+    "rows_committed",
+    "created",
+    "updated",
+    "conflicts",
+    "invalid",
+    "last_error",
+]
+
+
+# Every committed chunk refreshes updated_at, a running import that hasn't for
+# this long is taken for dead
+IMPORT_CLAIM_TIMEOUT = datetime.timedelta(minutes=10)
+# Records spanning lines are buffered until their quoted field ends, this
+# keeps an unterminated one from buffering the rest of the file
+MAX_RECORD_SIZE = 64 * 1024
+# What bytes that aren't valid UTF-8 are decoded to
+REPLACEMENT_CHARACTER = "\ufffd"
+
+
+class InvalidRow(Exception):
+    pass
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    # Invalid bytes are replaced rather than failing the whole import, the
+    # rows they are in are then rejected by validate()
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+def in_quoted_field(line: str, quoted: bool) -> bool:
+    """Whether a CSV record is still inside a quoted field at the end of
+    `line`, given whether it was at its start. As for the csv module, a field
+    is quoted only when it starts with a quote, so 12" TV isn't."""
+    if not quoted and '"' not in line:
+        return False
+    field_start = not quoted
+    i = 0
+    while i < len(line):
+        char = line[i]
+        if quoted:
+            if char == '"':
+                if line[i + 1 : i + 2] == '"':
+                    i += 1
+                else:
+                    quoted = False
+        elif char == ",":
+            field_start = True
+            i += 1
+            continue
+        elif char == '"' and field_start:
+            quoted = True
+        field_start = False
+        i += 1
+    return quoted
+
+
+async def iter_csv_rows(lines: AsyncIterator[str]) -> AsyncIterator:
+    """Yields a dict per CSV record, or an InvalidRow for records that can't
+    be parsed. Quoted fields may span lines, up to MAX_RECORD_SIZE characters
+    per record."""
+    header = None
+    record = ""
+    quoted = False
+    async for line in lines:
+        record = f"{record}\n{line}" if record else line
+        quoted = in_quoted_field(line, quoted)
+        if quoted:
+            if len(record) <= MAX_RECORD_SIZE:
+                continue
+            values = InvalidRow(f"record longer than {MAX_RECORD_SIZE} characters")
+            quoted = False
+        elif not record.strip():
+            record = ""
+            continue
+        else:
+            try:
+                values = next(csv.reader([record]))
+            except csv.Error as e:
+                values = InvalidRow(str(e))
+        record = ""
+
+        if header is None:
+            header = values
+        elif isinstance(values, InvalidRow):
+            yield values
+        elif len(values) != len(header):
+            yield InvalidRow(f"expected {len(header)} fields, got {len(values)}")
+        else:
+            yield dict(zip(header, values))
+
+    if record:
+        yield InvalidRow("unterminated quoted field")
+
+
+async def iter_ndjson_rows(lines: AsyncIterator[str]) -> AsyncIterator:
+    async for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield InvalidRow(str(e))
+            continue
+        yield row if isinstance(row, dict) else InvalidRow("expected a JSON object")
+
+
+async def create_import(started_by: int) -> dict:
+    query = product_imports_table.insert().values(
+        status="pending",
+        rows_committed=0,
+        created=0,
+        updated=0,
+        conflicts=0,
+        invalid=0,
+        started_by=started_by,
+        updated_at=datetime.datetime.utcnow(),
+    )
+    import_id = await database.execute(query)
+    return await get_import(import_id)
+
+
+async def get_import(import_id: int):
+    query = product_imports_table.select().where(
+        product_imports_table.c.id == import_id
+    )
+    return await database.fetch_one(query)
+
+
+async def claim_import(import_id: int) -> bool:
+    """Mark the import as running, unless it already is or is completed, in a
+    single UPDATE so that two uploads of the same import can't both go ahead.
+    An import left running for longer than IMPORT_CLAIM_TIMEOUT, e.g. by a
+    worker that died, can be claimed again."""
+    table = product_imports_table
+    now = datetime.datetime.utcnow()
+    query = (
+        table.update()
+        .where(
+            table.c.id == import_id,
+            or_(
+                table.c.status.in_(["pending", "failed"]),
+                and_(
+                    table.c.status == "running",
+                    table.c.updated_at < now - IMPORT_CLAIM_TIMEOUT,
+                ),
+            ),
+        )
+        .values(status="running", updated_at=now)
+        .returning(table.c.id)
+    )
+    return await database.fetch_val(query) is not None
+
+
+async def update_import(import_id: int, **values):
+    query = (
+        product_imports_table.update()
+        .where(product_imports_table.c.id == import_id)
+        .values(**values, updated_at=datetime.datetime.utcnow())
+    )
+    await database.execute(query)
+
+
+async def commit_chunk(job: dict, chunk: list, changed_by: int):
+    valid = []
+    for row in chunk:
+        if isinstance(row, InvalidRow):
+            job["invalid"] += 1
+            job["last_error"] = f"row {job['rows_committed'] + 1}: {row}"
+        else:
+            valid.append(row)
+        job["rows_committed"] += 1
+
+    # The checkpoint is saved in the same transaction as the products, so a
+    # resumed import starts exactly after the last committed row.
+    async with database.transaction():
+        results, saved, versions = await write_products(valid, changed_by)
+        for result in results:
+            job[RESULT_COUNTERS[result["status"]]] += 1
+        await update_import(job["id"], **{field: job[field] for field in JOB_FIELDS})
+    publish_products(saved, versions)
+
+
+def validate(row):
+    if isinstance(row, InvalidRow):
+        return row
+    if any(
+        isinstance(text, str) and REPLACEMENT_CHARACTER in text
+        for item in row.items()
+        for text in item
+    ):
+        return InvalidRow("not valid UTF-8")
+    try:
+        return ProductCreate(**row).dict()
+    except ValidationError as e:
+        error = e.errors()[0]
+        field = ".".join(str(part) for part in error["loc"])
+        return InvalidRow(f"{field}: {error['msg']}")
+
+
+async def import_products(
+    import_id: int,
+    chunks: AsyncIterator[bytes],
+    file_format: CatalogFormat,
+    chunk_size: int,
+    changed_by: int,
+):
+    """Import products from a CSV or NDJSON byte stream, committing every
+    `chunk_size` rows. Rows already committed by an earlier attempt of the
+    same import are skipped, so an interrupted import is resumed by sending
+    the same file again. The import must have been claimed with claim_import
+    first."""
+    record = await get_import(import_id)
+    job = {field: record[field] for field in JOB_FIELDS}
+    job["id"] = import_id
+
+    lines = iter_lines(chunks)
+    if file_format == CatalogFormat.csv:
+        rows = iter_csv_rows(lines)
+    else:
+        rows = iter_ndjson_rows(lines)
+
+    skip = job["rows_committed"]
+    chunk = []
+    try:
+        async for row in rows:
+            if skip:
+                skip -= 1
+                continue
+            chunk.append(validate(row))
+            if len(chunk) >= chunk_size:
+                await commit_chunk(job, chunk, changed_by)
+                chunk = []
+        if chunk:
+            await commit_chunk(job, chunk, changed_by)
+    except Exception as e:
+        await update_import(import_id, status="failed", last_error=str(e))
+        raise
+
+    await update_import(import_id, status="completed")
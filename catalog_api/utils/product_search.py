@@ -0,0 +1,64 @@
+import re
+from typing import Optional
+
+from catalog_api.database import PRODUCTS_SEARCH_VECTOR, database, engine
+
+# bm25 weights for the name, brand and sku columns of products_fts
+SEARCH_QUERY = """
+    SELECT * FROM (
+        SELECT products.id, products.name, products.sku, products.price,
+            products.brand, bm25(products_fts, 10.0, 5.0, 1.0) AS score
+        FROM products_fts JOIN products ON products.id = products_fts.rowid
+        WHERE products_fts MATCH :match
+    ) AS matches
+    {after}
+    ORDER BY score, id
+    LIMIT :limit
+"""
+# On Postgres: ts_rank weights are for D, C (sku), B (brand) and A (name), and
+# negated so that, as with bm25, lower scores are better matches.
+POSTGRES_SEARCH_QUERY = f"""
+    SELECT * FROM (
+        SELECT id, name, sku, price, brand,
+            -ts_rank(
+                CAST(ARRAY[0.1, 0.1, 0.5, 1.0] AS float4[]),
+                {PRODUCTS_SEARCH_VECTOR},
+                query
+            )::float8 AS score
+        FROM products, to_tsquery('simple', :match) AS query
+        WHERE ({PRODUCTS_SEARCH_VECTOR}) @@ query
+    ) AS matches
+    {{after}}
+    ORDER BY score, id
+    LIMIT :limit
+"""
+AFTER_CLAUSE = "WHERE score > :score OR (score = :score AND id > :id)"
+
+
+def build_match_expression(search: str) -> Optional[str]:
+    """Turn free text into an FTS5 (or Postgres tsquery) query where every word
+    must match as a prefix. Only word characters are kept, so query syntax in
+    the input is never parsed."""
+    words = re.findall(r"\w+", search)
+    if not words:
+        return None
+    if engine.dialect.name == "postgresql":
+        return " & ".join(f"{word}:*" for word in words)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+async def search_products(
+    match: str, limit: int, after: Optional[tuple[float, int]] = None
+):
+    """Best matches first, ordered by (score, id) so pages can continue
+    from the last row of the previous page."""
+    values = {"match": match, "limit": limit}
+    after_clause = ""
+    if after is not None:
+        after_clause = AFTER_CLAUSE
+        values["score"], values["id"] = after
+    if engine.dialect.name == "postgresql":
+        query = POSTGRES_SEARCH_QUERY.format(after=after_clause)
+    else:
+        query = SEARCH_QUERY.format(after=after_clause)
+    return await database.fetch_all(query, values)
@@ -0,0 +1,149 @@
+import functools
+import inspect
+from typing import Any, Callable, Optional, get_args, get_origin
+
+import orjson
+from fastapi import Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
+
+# Added to endpoints that don't take the Response themselves, to pass on the
+# headers and status code their dependencies set on it
+RESPONSE_PARAM = "_rows_response"
+_MISSING = object()
+
+
+class RowsJSONResponse(Response):
+    media_type = "application/json"
+
+
+def row_model(response_model) -> tuple[Optional[type[BaseModel]], bool]:
+    """The model of each row, and whether there are many, for a response model
+    of Model or List[Model]. (None, False) for anything else."""
+    many = get_origin(response_model) is list
+    model = get_args(response_model)[0] if many else response_model
+    if isinstance(model, type) and issubclass(model, BaseModel):
+        return model, many
+    return None, False
+
+
+class RowEncoder:
+    """Turns rows into dicts with the fields of a model, for orjson.
+
+    Rows are dicts or Records. Reading a Record by name goes through several
+    layers of databases and SQLAlchemy per value, so the values are read by
+    position from the driver's row instead: the positions of the fields are
+    looked up in the first Record, all rows of a result having the same
+    columns. Columns the model doesn't have are left out, missing ones take
+    the model's default."""
+
+    def __init__(self, model: type[BaseModel]):
+        self.fields = [
+            (name, _MISSING if field.default is PydanticUndefined else field.default)
+            for name, field in model.model_fields.items()
+        ]
+
+    def positions(self, record) -> list:
+        keys = list(record._mapping.keys())
+        return [
+            (name, keys.index(name) if name in keys else None, default)
+            for name, default in self.fields
+        ]
+
+    def encode_dict(self, row: dict) -> dict:
+        encoded = {}
+        for name, default in self.fields:
+            value = row.get(name, default)
+            if value is _MISSING:
+                raise KeyError(name)
+            encoded[name] = value
+        return encoded
+
+    def encode_record(self, record, positions: list) -> dict:
+        values = tuple(record._mapping)
+        encoded = {}
+        for name, position, default in positions:
+            value = default if position is None else values[position]
+            if value is _MISSING:
+                raise KeyError(name)
+            encoded[name] = value
+        return encoded
+
+    def encode(self, rows: list) -> list[dict]:
+        encoded = []
+        positions = None
+        for row in rows:
+            if isinstance(row, dict):
+                encoded.append(self.encode_dict(row))
+                continue
+            if positions is None:
+                positions = self.positions(row)
+            encoded.append(self.encode_record(row, positions))
+        return encoded
+
+    def dumps(self, content, many: bool) -> bytes:
+        if many:
+            return orjson.dumps(self.encode(content))
+        return orjson.dumps(self.encode([content])[0])
+
+
+class TrustedRowsRoute(APIRoute):
+    """Route class for routers whose endpoints return rows read from the
+    database (Records or dicts), e.g. APIRouter(route_class=TrustedRowsRoute).
+
+    The response model still documents the response in OpenAPI, but the rows
+    aren't validated against it: they are trusted to have the right types,
+    and dumped to JSON with orjson keeping only the fields of the model.
+    Validating a page of Records costs more than the query that read it.
+
+    Endpoints can still return a Response, which is sent as is. Sync endpoints
+    are left to FastAPI."""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        model, many = row_model(kwargs.get("response_model"))
+        if model is not None and inspect.iscoroutinefunction(endpoint):
+            endpoint = self.returning_rows(endpoint, RowEncoder(model), many)
+        super().__init__(path, endpoint, **kwargs)
+
+    def returning_rows(self, endpoint: Callable, encoder: RowEncoder, many: bool):
+        signature = inspect.signature(endpoint)
+        response_param = next(
+            (
+                param.name
+                for param in signature.parameters.values()
+                if inspect.isclass(param.annotation)
+                and issubclass(param.annotation, Response)
+            ),
+            None,
+        )
+        if response_param is None:
+            signature = signature.replace(
+                parameters=[
+                    *signature.parameters.values(),
+                    inspect.Parameter(
+                        RESPONSE_PARAM,
+                        inspect.Parameter.KEYWORD_ONLY,
+                        annotation=Response,
+                    ),
+                ]
+            )
+
+        @functools.wraps(endpoint)
+        async def run(**kwargs) -> Any:
+            response = kwargs[response_param or RESPONSE_PARAM]
+            if response_param is None:
+                del kwargs[RESPONSE_PARAM]
+            content = await endpoint(**kwargs)
+            if isinstance(content, Response):
+                return content
+
+            rows_response = RowsJSONResponse(
+                encoder.dumps(content, many),
+                status_code=response.status_code or self.status_code or 200,
+            )
+            rows_response.headers.raw.extend(response.headers.raw)
+            return rows_response
+
+        run.__signature__ = signature
+        return run
@@ -1,22 +1,285 @@
+import asyncio
+import datetime
+import logging
 import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
+from typing import Optional
 
-from catalog_api.database import database
+from sqlalchemy import select
+
+from catalog_api.config import config
+from catalog_api.database import database, outbound_emails_table, users_table
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPConnection:
+    """One SMTP connection reused for every message. smtplib blocks and isn't
+    thread safe, so it must only be used from a single thread (see MailSender).
+
+    A connection idle for longer than `keepalive_interval` is checked with a
+    NOOP before it's used again, and reopened if the server dropped it."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        starttls: bool = False,
+        timeout: float = 10.0,
+        keepalive_interval: float = 30.0,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.keepalive_interval = keepalive_interval
+        self.opened = 0
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+
+    def open(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        self._smtp = smtp
+        self._last_used = time.monotonic()
+        self.opened += 1
+
+    def close(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+        self._smtp = None
+
+    def keepalive(self):
+        if self._smtp is None:
+            return
+        if time.monotonic() - self._last_used < self.keepalive_interval:
+            return
+        try:
+            self._smtp.noop()
+            self._last_used = time.monotonic()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+            self._smtp = None
+
+    def send(self, message: MIMEText):
+        self.keepalive()
+        if self._smtp is None:
+            self.open()
+        try:
+            self._smtp.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # Dropped since the last check, try once on a new connection
+            self._smtp = None
+            self.open()
+            self._smtp.send_message(message)
+        self._last_used = time.monotonic()
+
+
+class MailSender:
+    """Delivers the mail queued in outbound_emails from a background task.
+
+    Every worker can run a sender: each message is claimed right before it's
+    sent, with a single UPDATE that pushes next_attempt_at forward by
+    `claim_timeout`, so it's only picked by one of them and is retried if the
+    worker sending it dies. Claiming the whole batch at once would let the
+    claims of the last messages run out while a slow server takes the first
+    ones, and another worker send them again. Failed messages are retried
+    with exponential backoff up to `max_attempts` times."""
+
+    def __init__(
+        self,
+        connection: SMTPConnection,
+        batch_size: int,
+        poll_interval: float,
+        retry_base_delay: float,
+        retry_max_delay: float,
+        max_attempts: int,
+    ):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.max_attempts = max_attempts
+        # Enough for a NOOP, reconnecting and sending one message
+        self.claim_timeout = datetime.timedelta(seconds=connection.timeout * 3)
+        self.sent = 0
+        self.failed = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smtp")
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self):
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self._in_smtp_thread(self.connection.close)
+
+    def notify(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _in_smtp_thread(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def retry_delay(self, attempts: int) -> datetime.timedelta:
+        delay = self.retry_base_delay * 2 ** (attempts - 1)
+        return datetime.timedelta(seconds=min(delay, self.retry_max_delay))
+
+    async def claim_next(self):
+        """Claim the oldest message that is due, None if there is none."""
+        table = outbound_emails_table
+        now = datetime.datetime.utcnow()
+        due = (
+            select(table.c.id)
+            .where(table.c.status == "pending", table.c.next_attempt_at <= now)
+            .order_by(table.c.id)
+            .limit(1)
+        )
+        query = (
+            table.update()
+            .where(table.c.id.in_(due), table.c.next_attempt_at <= now)
+            .values(
+                next_attempt_at=now + self.claim_timeout, attempts=table.c.attempts + 1
+            )
+            .returning(*table.c)
+        )
+        return await database.fetch_one(query)
+
+    async def deliver_due(self) -> int:
+        """Send up to `batch_size` messages that are due. Returns how many
+        were sent."""
+        sent = 0
+        for _ in range(self.batch_size):
+            email = await self.claim_next()
+            if email is None:
+                break
+            message = MIMEText(email["body"])
+            message["Subject"] = email["subject"]
+            message["From"] = email["sender"]
+            message["To"] = email["recipients"]
+            query = outbound_emails_table.update().where(
+                outbound_emails_table.c.id == email["id"]
+            )
+            try:
+                await self._in_smtp_thread(self.connection.send, message)
+            except Exception as e:
+                logger.warning("Could not send email %s: %s", email["id"], e)
+                if email["attempts"] >= self.max_attempts:
+                    self.failed += 1
+                    query = query.values(status="failed", last_error=str(e))
+                else:
+                    next_attempt_at = datetime.datetime.utcnow() + self.retry_delay(
+                        email["attempts"]
+                    )
+                    query = query.values(
+                        next_attempt_at=next_attempt_at, last_error=str(e)
+                    )
+            else:
+                sent += 1
+                query = query.values(
+                    status="sent", sent_at=datetime.datetime.utcnow(), last_error=None
+                )
+            await database.execute(query)
+        self.sent += sent
+        return sent
+
+    async def _run(self):
+        while True:
+            try:
+                await self.deliver_due()
+                await self._in_smtp_thread(self.connection.keepalive)
+            except Exception:
+                logger.exception("Mail delivery failed")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "connections_opened": self.connection.opened,
+        }
+
+
+mail_sender = MailSender(
+    SMTPConnection(
+        config.SMTP_HOST,
+        config.SMTP_PORT,
+        username=config.SMTP_USERNAME,
+        password=config.SMTP_PASSWORD,
+        starttls=config.SMTP_STARTTLS,
+        timeout=config.SMTP_TIMEOUT,
+        keepalive_interval=config.SMTP_KEEPALIVE_INTERVAL,
+    ),
+    batch_size=config.MAIL_BATCH_SIZE,
+    poll_interval=config.MAIL_POLL_INTERVAL,
+    retry_base_delay=config.MAIL_RETRY_BASE_DELAY,
+    retry_max_delay=config.MAIL_RETRY_MAX_DELAY,
+    max_attempts=config.MAIL_MAX_ATTEMPTS,
+)
+
+
+async def queue_email(recipients: list[str], subject: str, body: str):
+    now = datetime.datetime.utcnow()
+    query = outbound_emails_table.insert().values(
+        sender=config.MAIL_SENDER,
+        recipients=", ".join(recipients),
+        subject=subject,
+        body=body,
+        status="pending",
+        attempts=0,
+        next_attempt_at=now,
+        created_at=now,
+    )
+    await database.execute(query)
+    mail_sender.notify()
 
 
 async def send_email(content):
-    msg = MIMEText(content)
+    """Queue the report for the admins, mail_sender delivers it."""
     recipients = await get_admin_mails()
-    msg["Subject"] = "Daily Product Changes Report"
-    msg["From"] = "sender@example.com"
-    msg["To"] = ", ".join(recipients)
-
-    with smtplib.SMTP("mailhog", 1025) as server:  # Use MailHog's SMTP server
-        # No login required for MailHog
-        server.send_message(msg)
+    if not recipients:
+        logger.warning("No admins to send the report to")
+        return
+    await queue_email(recipients, "Daily Product Changes Report", content)
 
 
 async def get_admin_mails():
-    query = "SELECT email FROM users WHERE is_admin == True"
+    query = select(users_table.c.email).where(users_table.c.is_admin.is_(True))
     result = await database.fetch_all(query)
     return [item[0] for item in result]
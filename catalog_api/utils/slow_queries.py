@@ -0,0 +1,155 @@
+import datetime
+import functools
+import logging
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from catalog_api.utils.cache import LRUCache
+from catalog_api.utils.metrics import statement_shape
+from catalog_api.utils.sqlite_pool import in_transaction
+
+logger = logging.getLogger(__name__)
+
+# The same statement is explained at most this often, in seconds
+PLAN_TTL = 60.0
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN of another statement, compiled with it so its bound parameters
+    are passed on by the backend like for the statement itself."""
+
+    inherit_cache = False
+    # Read by the compiler when the explained statement is an INSERT or UPDATE
+    _inline = False
+
+    def __init__(self, statement, prefix: str):
+        self.statement = statement
+        self.prefix = prefix
+
+
+@compiles(Explain)
+def compile_explain(element: Explain, compiler, **kw) -> str:
+    sql = f"{element.prefix} {compiler.process(element.statement, **kw)}"
+    # The rows are the plan's, not the explained statement's: they are read
+    # by the names the driver gives, without the statement's type processing
+    compiler._result_columns = []
+    compiler._ordered_columns = False
+    return sql
+
+
+def bound_parameters(query, values: Optional[dict]) -> dict:
+    if isinstance(query, str):
+        return dict(values or {})
+    return dict(query.compile().params)
+
+
+class SlowQueryLog:
+    """The last `size` statements that took `threshold_ms` or longer, with
+    their parameters and the query plan the backend picked for them."""
+
+    def __init__(self, threshold_ms: float, size: int):
+        self.threshold = threshold_ms / 1000
+        self.entries = deque(maxlen=size)
+        self.recorded = 0
+        self._plans = LRUCache(max_size=size, ttl=PLAN_TTL)
+
+    async def explain(self, database, dialect: str, query, values):
+        """The query plan as a list of lines, or None if it can't be had.
+
+        Run through the class's fetch_all, so not through the wrappers of
+        record_slow_queries and instrument_database on the instance."""
+        prefix = "EXPLAIN QUERY PLAN" if dialect == "sqlite" else "EXPLAIN"
+        explain = (
+            (f"{prefix} {query}", values)
+            if isinstance(query, str)
+            else (Explain(query, prefix), None)
+        )
+        try:
+            if in_transaction(database):
+                # In a savepoint, so a failed EXPLAIN doesn't abort the
+                # transaction on Postgres
+                async with database.transaction():
+                    rows = await type(database).fetch_all(database, *explain)
+            else:
+                # Not in a transaction of its own either: on SQLite that's
+                # BEGIN IMMEDIATE, so waiting for the write lock
+                reader = getattr(database, "reader", database)
+                rows = await type(reader).fetch_all(reader, *explain)
+        except Exception as e:
+            logger.warning("Could not explain slow query: %s", e)
+            return None
+        if dialect == "sqlite":
+            return [row["detail"] for row in rows]
+        return [row[0] for row in rows]
+
+    async def record(
+        self,
+        database,
+        dialect: str,
+        operation: str,
+        query,
+        values: Optional[dict],
+        duration: float,
+    ):
+        shape = statement_shape(query)
+        plan = self._plans.get(shape)
+        if plan is None:
+            plan = await self.explain(database, dialect, query, values)
+            self._plans.set(shape, plan)
+        self.entries.append(
+            {
+                "timestamp": datetime.datetime.utcnow(),
+                "operation": operation,
+                "statement": shape,
+                "parameters": bound_parameters(query, values),
+                "duration_ms": round(duration * 1000, 3),
+                "plan": plan,
+            }
+        )
+        self.recorded += 1
+
+    def clear(self):
+        self.entries.clear()
+        self._plans.clear()
+
+    def stats(self) -> dict:
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "size": self.entries.maxlen,
+            "recorded": self.recorded,
+        }
+
+
+def record_slow_queries(
+    database,
+    slow_query_log: SlowQueryLog,
+    dialect: str,
+    operations=("fetch_all", "fetch_one", "fetch_val", "execute"),
+):
+    """Record the statements run through `database` that are slower than the
+    log's threshold, by wrapping its query methods on the instance. The plan
+    is captured in the same task, so in the same transaction, right after.
+
+    Apply after instrument_database, so the EXPLAIN runs outside of the
+    statement's timing."""
+
+    def recorded(operation: str, method: Callable) -> Callable:
+        @functools.wraps(method)
+        async def run(query, values=None, *args, **kwargs):
+            started = time.perf_counter()
+            result = await method(query, values, *args, **kwargs)
+            duration = time.perf_counter() - started
+            if duration >= slow_query_log.threshold:
+                await slow_query_log.record(
+                    database, dialect, operation, query, values, duration
+                )
+            return result
+
+        return run
+
+    for operation in operations:
+        setattr(database, operation, recorded(operation, getattr(database, operation)))
@@ -0,0 +1,207 @@
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+import aiosqlite
+import databases
+from databases.backends.sqlite import (
+    SQLiteBackend,
+    SQLiteConnection,
+    SQLiteTransaction,
+)
+
+# Set while the current task is inside RoutedDatabase.transaction(), so every
+# statement of the transaction, reads included, runs on the writer connection.
+_in_transaction: ContextVar[bool] = ContextVar("in_transaction", default=False)
+
+
+def production_pragmas(
+    cache_size_kb: int, mmap_size: int, busy_timeout_ms: int
+) -> list[str]:
+    return [
+        "journal_mode = WAL",
+        "synchronous = NORMAL",
+        f"cache_size = -{cache_size_kb}",
+        f"mmap_size = {mmap_size}",
+        f"busy_timeout = {busy_timeout_ms}",
+        "temp_store = MEMORY",
+    ]
+
+
+class ImmediateSQLiteTransaction(SQLiteTransaction):
+    """Starts with BEGIN IMMEDIATE, which takes the write lock up front and
+    waits for it under the busy timeout. With a plain BEGIN, a transaction
+    that reads before it writes fails at once with "database is locked" when
+    another one is writing, since SQLite can't upgrade its read lock."""
+
+    async def start(self, is_root: bool, extra_options: dict):
+        if not is_root:
+            return await super().start(is_root, extra_options)
+        self._is_root = True
+        async with self._connection._connection.execute("BEGIN IMMEDIATE") as cursor:
+            await cursor.close()
+
+
+class ImmediateSQLiteConnection(SQLiteConnection):
+    def transaction(self) -> ImmediateSQLiteTransaction:
+        return ImmediateSQLiteTransaction(self)
+
+
+class ImmediateSQLiteBackend(SQLiteBackend):
+    def connection(self) -> ImmediateSQLiteConnection:
+        return ImmediateSQLiteConnection(self._pool, self._dialect)
+
+
+class ImmediateTransactionDatabase(databases.Database):
+    """databases.Database for any backend, whose SQLite transactions start with
+    BEGIN IMMEDIATE; the other backends are the stock ones."""
+
+    SUPPORTED_BACKENDS = {
+        **databases.Database.SUPPORTED_BACKENDS,
+        "sqlite": "catalog_api.utils.sqlite_pool:ImmediateSQLiteBackend",
+    }
+
+
+class SQLiteConnectionPool:
+    """A fixed number of long-lived aiosqlite connections, set up with the
+    given pragmas once when opened instead of on every query."""
+
+    def __init__(self, url: databases.DatabaseURL, size: int, pragmas: list[str]):
+        self._database = url.database
+        self.size = size
+        self.pragmas = pragmas
+        self._connections = []
+        self._idle = asyncio.Queue()
+
+    async def open(self):
+        for _ in range(self.size):
+            connection = await aiosqlite.connect(self._database, isolation_level=None)
+            for pragma in self.pragmas:
+                await connection.execute(f"PRAGMA {pragma}")
+            self._connections.append(connection)
+            self._idle.put_nowait(connection)
+
+    async def close(self):
+        for connection in self._connections:
+            await connection.close()
+        self._connections = []
+        self._idle = asyncio.Queue()
+
+    async def acquire(self) -> aiosqlite.Connection:
+        return await self._idle.get()
+
+    async def release(self, connection: aiosqlite.Connection):
+        self._idle.put_nowait(connection)
+
+
+class PooledSQLiteBackend(ImmediateSQLiteBackend):
+    """With `read_only`, the connections are query_only and their transactions
+    start with a plain BEGIN: a consistent snapshot to read from, without the
+    write lock they couldn't take anyway."""
+
+    def __init__(
+        self,
+        database_url,
+        pool_size: int = 1,
+        pragmas=(),
+        read_only: bool = False,
+        **options,
+    ):
+        super().__init__(database_url, **options)
+        self._read_only = read_only
+        if read_only:
+            pragmas = [*pragmas, "query_only = ON"]
+        self._pool = SQLiteConnectionPool(self._database_url, pool_size, list(pragmas))
+
+    def connection(self) -> SQLiteConnection:
+        if self._read_only:
+            return SQLiteConnection(self._pool, self._dialect)
+        return super().connection()
+
+    async def connect(self):
+        await self._pool.open()
+
+    async def disconnect(self):
+        await self._pool.close()
+
+
+class PooledSQLiteDatabase(databases.Database):
+    SUPPORTED_BACKENDS = {
+        **databases.Database.SUPPORTED_BACKENDS,
+        "sqlite": "catalog_api.utils.sqlite_pool:PooledSQLiteBackend",
+    }
+
+
+def is_read(query) -> bool:
+    if isinstance(query, str):
+        return query.lstrip().upper().startswith(("SELECT", "WITH"))
+    return getattr(query, "is_select", False)
+
+
+class RoutedDatabase:
+    """Drop-in for databases.Database on SQLite in WAL mode.
+
+    SQLite allows one writer at a time but, in WAL mode, any number of readers
+    alongside it. Reads outside a transaction go to a pool of read-only
+    connections; writes and whole transactions queue for the single writer
+    connection instead of failing with "database is locked"."""
+
+    def __init__(self, url: str, read_pool_size: int, pragmas: list[str]):
+        self.url = databases.DatabaseURL(url)
+        self.writer = PooledSQLiteDatabase(url, pool_size=1, pragmas=pragmas)
+        self.reader = PooledSQLiteDatabase(
+            url, pool_size=read_pool_size, pragmas=pragmas, read_only=True
+        )
+
+    @property
+    def is_connected(self) -> bool:
+        return self.writer.is_connected
+
+    async def connect(self):
+        # The writer switches the file to WAL before the readers open it
+        await self.writer.connect()
+        await self.reader.connect()
+
+    async def disconnect(self):
+        await self.reader.disconnect()
+        await self.writer.disconnect()
+
+    def route(self, query) -> databases.Database:
+        if not _in_transaction.get() and is_read(query):
+            return self.reader
+        return self.writer
+
+    async def fetch_all(self, query, values=None):
+        return await self.route(query).fetch_all(query, values)
+
+    async def fetch_one(self, query, values=None):
+        return await self.route(query).fetch_one(query, values)
+
+    async def fetch_val(self, query, values=None, column=0):
+        return await self.route(query).fetch_val(query, values, column=column)
+
+    async def execute(self, query, values=None):
+        return await self.writer.execute(query, values)
+
+    async def execute_many(self, query, values: list):
+        return await self.writer.execute_many(query, values)
+
+    async def iterate(self, query, values=None):
+        async for record in self.route(query).iterate(query, values):
+            yield record
+
+    @asynccontextmanager
+    async def transaction(self, **kwargs):
+        token = _in_transaction.set(True)
+        try:
+            async with self.writer.transaction(**kwargs) as transaction:
+                yield transaction
+        finally:
+            _in_transaction.reset(token)
+
+
+def in_transaction(database) -> bool:
+    """Whether the current task is inside a transaction of `database`."""
+    if isinstance(database, RoutedDatabase):
+        return _in_transaction.get()
+    return bool(database.connection()._transaction_stack)
@@ -0,0 +1,83 @@
+import hashlib
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select
+
+from catalog_api.database import (
+    catalog_state_table,
+    database,
+    dialect_insert,
+    product_versions_table,
+)
+
+CATALOG_STATE_ID = 1
+
+
+def increment_versions(table, key_column, keys: list[int]):
+    query = dialect_insert(table).values(
+        [{key_column.name: key, "version": 1} for key in keys]
+    )
+    return query.on_conflict_do_update(
+        index_elements=[key_column], set_={"version": table.c.version + 1}
+    )
+
+
+class Versions(NamedTuple):
+    # None when no product was bumped
+    catalog: Optional[int]
+    products: dict[int, int]
+
+
+async def bump_product_versions(product_ids: list[int]) -> Versions:
+    """Bump the versions of the products and of the catalog, returning the new
+    ones."""
+    if not product_ids:
+        return Versions(None, {})
+    query = increment_versions(
+        product_versions_table, product_versions_table.c.product_id, product_ids
+    ).returning(product_versions_table.c.product_id, product_versions_table.c.version)
+    products = {
+        row["product_id"]: row["version"] for row in await database.fetch_all(query)
+    }
+    query = increment_versions(
+        catalog_state_table, catalog_state_table.c.id, [CATALOG_STATE_ID]
+    )
+    catalog = await database.fetch_val(query.returning(catalog_state_table.c.version))
+    return Versions(catalog, products)
+
+
+async def bump_product_version(product_id: int) -> Versions:
+    return await bump_product_versions([product_id])
+
+
+async def get_catalog_version() -> int:
+    query = select(catalog_state_table.c.version).where(
+        catalog_state_table.c.id == CATALOG_STATE_ID
+    )
+    return await database.fetch_val(query) or 0
+
+
+async def get_product_version(product_id: int) -> int:
+    query = select(product_versions_table.c.version).where(
+        product_versions_table.c.product_id == product_id
+    )
+    return await database.fetch_val(query) or 0
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha256("|".join(str(part) for part in parts).encode())
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(
+    if_none_match: Optional[str], etag: str, wildcard: bool = True
+) -> bool:
+    """Whether If-None-Match lists the ETag, or * unless `wildcard` is False,
+    for when the resource may not exist."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (wildcard and candidate == "*") or candidate.removeprefix("W/") == etag:
+            return True
+    return False
@@ -0,0 +1,111 @@
+import asyncio
+import datetime
+import logging
+from typing import Optional
+
+from catalog_api.config import config
+from catalog_api.utils.db_utils import (
+    add_product_anonymous_view,
+    add_product_anonymous_views,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ViewEventBuffer:
+    """Collects anonymous product views in memory and writes them with
+    multi-row inserts from a background task, so the request that produced
+    the view doesn't wait for the write.
+
+    A batch is written as soon as `batch_size` views are waiting or every
+    `flush_interval` seconds, whichever comes first. When `max_size` views are
+    waiting, new views are dropped or the caller waits for room, depending on
+    `full_policy`."""
+
+    def __init__(
+        self,
+        max_size: int,
+        batch_size: int,
+        flush_interval: float,
+        full_policy: str = "drop",
+    ):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.full_policy = full_policy
+        self.dropped = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._batch_ready: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._batch_ready = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._stopping = True
+        self._batch_ready.set()
+        await self._task
+        self._task = None
+        await self.flush()
+
+    async def add(self, product_id: int):
+        view = {"product_id": product_id, "view_date": datetime.datetime.utcnow()}
+        if not self.running:
+            # Nothing would flush the buffer (e.g. scripts), so write it directly
+            await add_product_anonymous_view(product_id)
+            return
+
+        if self.full_policy == "block":
+            await self._queue.put(view)
+        else:
+            try:
+                self._queue.put_nowait(view)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                return
+
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+
+    async def flush(self):
+        while not self._queue.empty():
+            batch = []
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await add_product_anonymous_views(batch)
+            except Exception:
+                logger.exception("Could not write %s product views", len(batch))
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "dropped": self.dropped,
+        }
+
+
+view_buffer = ViewEventBuffer(
+    max_size=config.VIEW_BUFFER_MAX_SIZE,
+    batch_size=config.VIEW_BUFFER_BATCH_SIZE,
+    flush_interval=config.VIEW_BUFFER_FLUSH_INTERVAL,
+    full_policy=config.VIEW_BUFFER_FULL_POLICY,
+)
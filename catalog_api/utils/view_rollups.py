@@ -0,0 +1,195 @@
+import datetime
+from collections import Counter
+from typing import Optional
+
+from sqlalchemy import Date, cast, exists, func, literal_column, select
+
+from catalog_api.database import (
+    database,
+    dialect_insert,
+    engine,
+    product_analytics_table,
+    product_views_daily_table,
+    product_views_hourly_table,
+)
+
+UPSERT_BATCH_SIZE = 500
+
+
+def hour_bucket(view_date: datetime.datetime) -> datetime.datetime:
+    return view_date.replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(view_date: datetime.datetime) -> datetime.datetime:
+    return view_date.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def split_range(start, end, floor, step):
+    """Split [start, end) into the part made of whole buckets and the pieces
+    left over at either edge. A missing start or end means unbounded."""
+    inner_start = start
+    if start is not None:
+        inner_start = floor(start)
+        if inner_start < start:
+            inner_start += step
+    inner_end = floor(end) if end is not None else None
+
+    if inner_start is not None and inner_end is not None and inner_start >= inner_end:
+        return None, [(start, end)]
+
+    edges = []
+    if start is not None and start < inner_start:
+        edges.append((start, inner_start))
+    if end is not None and inner_end < end:
+        edges.append((inner_end, end))
+    return (inner_start, inner_end), edges
+
+
+def count_view(hourly: Counter, daily: Counter, view):
+    hourly[(view["product_id"], hour_bucket(view["view_date"]))] += 1
+    daily[(view["product_id"], view["view_date"].date())] += 1
+
+
+async def increment_rollup(table, counts: Counter):
+    rows = [
+        {"product_id": product_id, "bucket": bucket, "count": count}
+        for (product_id, bucket), count in counts.items()
+    ]
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        query = dialect_insert(table).values(rows[start : start + UPSERT_BATCH_SIZE])
+        query = query.on_conflict_do_update(
+            index_elements=[table.c.product_id, table.c.bucket],
+            set_={"count": table.c.count + query.excluded.count},
+        )
+        await database.execute(query)
+
+
+async def increment_view_rollups(views: list[dict]):
+    hourly = Counter()
+    daily = Counter()
+    for view in views:
+        count_view(hourly, daily, view)
+    await increment_rollup(product_views_hourly_table, hourly)
+    await increment_rollup(product_views_daily_table, daily)
+
+
+def view_buckets():
+    """SQL expressions for the hourly and daily buckets of a raw view, giving
+    the same values as hour_bucket and day_bucket."""
+    view_date = product_analytics_table.c.view_date
+    if engine.dialect.name == "postgresql":
+        # Not a bound parameter, which Postgres would take for a different
+        # expression in the GROUP BY
+        hour = func.date_trunc(literal_column("'hour'"), view_date)
+        return hour, cast(view_date, Date)
+    # As SQLAlchemy stores DATETIME values in SQLite
+    return func.strftime("%Y-%m-%d %H:00:00.000000", view_date), func.date(view_date)
+
+
+def backfill_rollup_query(table, bucket):
+    views = product_analytics_table
+    counts = (
+        select(views.c.product_id, bucket, func.count())
+        .where(~exists(select(table.c.product_id)))
+        .group_by(views.c.product_id, bucket)
+    )
+    query = dialect_insert(table).from_select(
+        [table.c.product_id, table.c.bucket, table.c.count], counts
+    )
+    return query.on_conflict_do_nothing()
+
+
+async def backfill_view_rollups():
+    """Build the rollups from product_analytics when they are still empty,
+    e.g. the first time the app runs against a database created before the
+    rollup tables existed.
+
+    Every worker runs this on startup, so each rollup is filled by a single
+    INSERT ... SELECT that only inserts while the table is empty, rather than
+    by incrementing the counts, which would add the history once per worker."""
+    rollup_row = await database.fetch_one(select(product_views_daily_table).limit(1))
+    view_row = await database.fetch_one(select(product_analytics_table).limit(1))
+    if rollup_row or not view_row:
+        return
+
+    hourly_bucket, daily_bucket = view_buckets()
+    async with database.transaction():
+        await database.execute(
+            backfill_rollup_query(product_views_hourly_table, hourly_bucket)
+        )
+        await database.execute(
+            backfill_rollup_query(product_views_daily_table, daily_bucket)
+        )
+
+
+def views_in_range_query(table, column, count, start, end, product_id):
+    query = select(table.c.product_id, count.label("count")).group_by(
+        table.c.product_id
+    )
+    if start is not None:
+        query = query.where(column >= start)
+    if end is not None:
+        query = query.where(column < end)
+    if product_id is not None:
+        query = query.where(table.c.product_id == product_id)
+    return query
+
+
+async def count_views_between(
+    start: Optional[datetime.datetime],
+    end: Optional[datetime.datetime],
+    product_id: Optional[int] = None,
+) -> Counter:
+    """Count views in [start, end) reading whole days from the daily rollup,
+    whole hours from the hourly rollup and only the sub-hour edges from the
+    raw events."""
+    queries = []
+    days, rest = split_range(start, end, day_bucket, datetime.timedelta(days=1))
+    if days:
+        daily = product_views_daily_table
+        day_start, day_end = (day.date() if day else None for day in days)
+        queries.append(
+            views_in_range_query(
+                daily,
+                daily.c.bucket,
+                func.sum(daily.c.count),
+                day_start,
+                day_end,
+                product_id,
+            )
+        )
+    for edge_start, edge_end in rest:
+        hours, edges = split_range(
+            edge_start, edge_end, hour_bucket, datetime.timedelta(hours=1)
+        )
+        if hours:
+            hourly = product_views_hourly_table
+            queries.append(
+                views_in_range_query(
+                    hourly,
+                    hourly.c.bucket,
+                    func.sum(hourly.c.count),
+                    *hours,
+                    product_id
+                )
+            )
+        for raw_start, raw_end in edges:
+            raw = product_analytics_table
+            queries.append(
+                views_in_range_query(
+                    raw, raw.c.view_date, func.count(), raw_start, raw_end, product_id
+                )
+            )
+
+    views = Counter()
+    for query in queries:
+        for row in await database.fetch_all(query):
+            views[row["product_id"]] += row["count"]
+    return views
+
+
+def total_views_query():
+    return select(
+        product_views_daily_table.c.product_id,
+        func.sum(product_views_daily_table.c.count).label("count"),
+    ).group_by(product_views_daily_table.c.product_id)